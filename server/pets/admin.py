@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Pet, MedicalRecord, Reminder, Partner, ProductOrService, PetDocument
+from .models import Pet, MedicalRecord, Reminder, ReminderRule, Partner, ProductOrService, PetDocument, DocumentBlob
+from .search import IndexedSearchAdminMixin
 
 @admin.register(Pet)
 class PetAdmin(admin.ModelAdmin):
@@ -26,10 +27,11 @@ class PetAdmin(admin.ModelAdmin):
     )
 
 @admin.register(MedicalRecord)
-class MedicalRecordAdmin(admin.ModelAdmin):
+class MedicalRecordAdmin(IndexedSearchAdminMixin, admin.ModelAdmin):
     list_display = ['pet', 'record_type', 'title', 'date', 'veterinarian']
     list_filter = ['record_type', 'date', 'pet__species']
-    search_fields = ['pet__name', 'title', 'veterinarian']
+    search_fields = ['pet__name', 'title', 'veterinarian', 'description']
+    search_kind = 'record'
     readonly_fields = ['created_at']
     date_hierarchy = 'date'
 
@@ -42,14 +44,28 @@ class ReminderAdmin(admin.ModelAdmin):
     date_hierarchy = 'due_date'
     list_editable = ['is_completed']
 
+@admin.register(ReminderRule)
+class ReminderRuleAdmin(admin.ModelAdmin):
+    list_display = ['pet', 'reminder_type', 'title', 'start_date', 'interval', 'unit', 'end_date', 'materialized_until']
+    list_filter = ['reminder_type', 'unit']
+    search_fields = ['pet__name', 'title']
+    readonly_fields = ['materialized_until', 'created_at']
+
 @admin.register(PetDocument)
-class PetDocumentAdmin(admin.ModelAdmin):
+class PetDocumentAdmin(IndexedSearchAdminMixin, admin.ModelAdmin):
     list_display = ['pet', 'document_type', 'title', 'file_size', 'uploaded_at']
     list_filter = ['document_type', 'uploaded_at', 'pet__species']
     search_fields = ['pet__name', 'title', 'description']
-    readonly_fields = ['file_size', 'uploaded_at']
+    search_kind = 'document'
+    readonly_fields = ['file_size', 'blob', 'uploaded_at']
     date_hierarchy = 'uploaded_at'
 
+@admin.register(DocumentBlob)
+class DocumentBlobAdmin(admin.ModelAdmin):
+    list_display = ['sha256', 'size', 'ref_count', 'created_at']
+    search_fields = ['sha256']
+    readonly_fields = ['sha256', 'file', 'size', 'ref_count', 'created_at']
+
 @admin.register(Partner)
 class PartnerAdmin(admin.ModelAdmin):
     list_display = ['name', 'partner_type', 'phone', 'rating', 'created_at']
@@ -0,0 +1,120 @@
+from datetime import date, timedelta
+
+from django.db.models import Case, DateField, F, Func, IntegerField, Q, Value, When
+from django.db.models.functions import ExtractYear
+from rest_framework.exceptions import ValidationError
+
+TRUE_VALUES = ('1', 'true', 'yes')
+FALSE_VALUES = ('0', 'false', 'no')
+MAX_WINDOW_DAYS = 3660
+MAX_AGE_YEARS = 200
+
+
+class DaysUntil(Func):
+    """Число дней от today до даты expression (отрицательное — дата прошла)"""
+    arg_joiner = ' - '
+    template = '(%(expressions)s)'
+    output_field = IntegerField()
+
+    def __init__(self, expression, today, **extra):
+        super().__init__(expression, Value(today, output_field=DateField()), **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, template='CAST(julianday(%(expressions)s) AS integer)',
+            arg_joiner=') - julianday(', **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='DATEDIFF(%(expressions)s)', arg_joiner=', ', **extra_context)
+
+
+def years_ago(years, today):
+    """Дата, когда исполнилось years лет родившимся today - years; 29 февраля -> 28-е"""
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:
+        return today.replace(year=today.year - years, day=28)
+
+
+def age_expression(today):
+    """Полных лет на today — то же, что serializers.pet_age, но в SQL"""
+    birthday_passed = (
+        Q(birth_date__month__lt=today.month)
+        | Q(birth_date__month=today.month, birth_date__day__lte=today.day)
+    )
+    return Case(
+        When(birthday_passed, then=Value(today.year) - ExtractYear('birth_date')),
+        default=Value(today.year - 1) - ExtractYear('birth_date'),
+        output_field=IntegerField(),
+    )
+
+
+def with_age(queryset, today=None):
+    return queryset.annotate(age=age_expression(today or date.today()))
+
+
+def with_days_until_due(queryset, today=None):
+    return queryset.annotate(days_until_due=DaysUntil(F('due_date'), today or date.today()))
+
+
+def parse_bool(params, name):
+    value = params.get(name)
+    if value is None or value == '':
+        return None
+    if value.lower() in TRUE_VALUES:
+        return True
+    if value.lower() in FALSE_VALUES:
+        return False
+    raise ValidationError({name: ['Must be true or false.']})
+
+
+def parse_int(params, name, maximum):
+    value = params.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValidationError({name: ['A valid integer is required.']})
+    if not 0 <= value <= maximum:
+        raise ValidationError({name: [f'Must be between 0 and {maximum}.']})
+    return value
+
+
+def filter_pets(queryset, params, today=None):
+    """
+    ?age_min=N&age_max=M: возраст в полных годах. Условие на возраст
+    переводится в диапазон birth_date, поэтому работает индекс
+    (owner, birth_date); питомцы без даты рождения под фильтр не попадают.
+    """
+    today = today or date.today()
+    age_min = parse_int(params, 'age_min', MAX_AGE_YEARS)
+    age_max = parse_int(params, 'age_max', MAX_AGE_YEARS)
+    if age_min is not None:
+        queryset = queryset.filter(birth_date__lte=years_ago(age_min, today))
+    if age_max is not None:
+        queryset = queryset.filter(birth_date__gt=years_ago(age_max + 1, today))
+    return queryset
+
+
+def filter_reminders(queryset, params, today=None):
+    """
+    ?completed=true|false, ?overdue=true|false (не выполнено и срок прошел),
+    ?due_within=N (срок от сегодня до сегодня + N дней). Условия — сравнения
+    due_date с константами и покрываются индексами (pet, is_completed, due_date)
+    и (pet, due_date).
+    """
+    today = today or date.today()
+    completed = parse_bool(params, 'completed')
+    overdue = parse_bool(params, 'overdue')
+    due_within = parse_int(params, 'due_within', MAX_WINDOW_DAYS)
+    if completed is not None:
+        queryset = queryset.filter(is_completed=completed)
+    if overdue is True:
+        queryset = queryset.filter(is_completed=False, due_date__lt=today)
+    elif overdue is False:
+        queryset = queryset.exclude(is_completed=False, due_date__lt=today)
+    if due_within is not None:
+        queryset = queryset.filter(due_date__gte=today, due_date__lte=today + timedelta(days=due_within))
+    return queryset
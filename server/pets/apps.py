@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class PetsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pets'
+
+    def ready(self):
+        from . import checks, metrics, signals  # noqa: F401
+        metrics.install()
+        checks.report_on_startup()
@@ -0,0 +1,12 @@
+from django.urls import path
+
+from .async_views import PetListView, PetDetailView, ReminderListView, PartnerListView, ProductListView
+
+# Асинхронные двойники эндпоинтов чтения для ASGI (server/asgi.py)
+urlpatterns = [
+    path('pets/', PetListView.as_view(), name='async-pet-list'),
+    path('pets/<int:pk>/', PetDetailView.as_view(), name='async-pet-detail'),
+    path('reminders/', ReminderListView.as_view(), name='async-reminder-list'),
+    path('partners/', PartnerListView.as_view(), name='async-partner-list'),
+    path('products-services/', ProductListView.as_view(), name='async-product-list'),
+]
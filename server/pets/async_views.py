@@ -0,0 +1,204 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.http import http_date
+from django.views import View
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .annotations import filter_pets, filter_reminders, with_age, with_days_until_due
+from .authentication import CachedJWTAuthentication, check_user, token_user_id, user_cache
+from .cache import get_cache, get_timeout, is_shared, record, response_cache_key
+from .catalog import aget_snapshot, parse_id
+from .conditional import is_not_modified, queryset_validators, user_validators, validator_headers
+from .models import Pet, Reminder
+from .reminders import aensure_window
+from .renderers import CompactJSONRenderer
+from .serializers import PetSerializer, ReminderSerializer
+
+
+renderer = CompactJSONRenderer()
+
+
+def json_response(data, status=200, headers=None):
+    return HttpResponse(renderer.render(data), status=status, content_type='application/json', headers=headers)
+
+
+def page_size():
+    return settings.REST_FRAMEWORK.get('PAGE_SIZE') or 20
+
+
+class NotFound(Exception):
+    pass
+
+
+class AsyncAPIView(View):
+    """
+    Асинхронный view для нагруженных чтений. Под ASGI запрос не занимает
+    поток: запросы к базе идут через асинхронный интерфейс ORM, ожидание
+    медленного клиента не держит поток. Аутентификация — JWT, формат
+    ответов совпадает с эндпоинтами DRF. Подклассы определяют async respond().
+    """
+    http_method_names = ['get', 'head', 'options']
+    jwt = CachedJWTAuthentication()
+
+    async def authenticate(self, request):
+        """Пользователь из кэша процесса; в базу — только при промахе"""
+        header = self.jwt.get_header(request)
+        raw_token = self.jwt.get_raw_token(header) if header else None
+        if raw_token is None:
+            return None
+        try:
+            token = self.jwt.get_validated_token(raw_token)
+            user_id = token_user_id(token)
+            user = await sync_to_async(user_cache.peek)(user_id)
+            if user is None:
+                user = await sync_to_async(user_cache.get)(user_id)
+            return check_user(user, token)
+        except (InvalidToken, TokenError, AuthenticationFailed):
+            return None
+
+    async def get(self, request, *args, **kwargs):
+        user = await self.authenticate(request)
+        if user is None:
+            return json_response(
+                {'detail': 'Authentication credentials were not provided.'}, status=401,
+                headers={'WWW-Authenticate': 'Bearer realm="api"'},
+            )
+        request.user = user
+        try:
+            return await self.respond(request, *args, **kwargs)
+        except NotFound as exc:
+            return json_response({'detail': str(exc) or 'Not found.'}, status=404)
+        except ValidationError as exc:
+            return json_response(exc.detail, status=400)
+
+    async def paginate(self, request, queryset, count=None):
+        """PageNumberPagination: count и страница запрашиваются асинхронно"""
+        size = page_size()
+        page = parse_id(request.GET.get('page', 1)) or 0
+        if count is None:
+            count = await queryset.acount()
+        pages = max(1, -(-count // size))
+        if not 1 <= page <= pages:
+            raise NotFound('Invalid page.')
+        offset = (page - 1) * size
+        if isinstance(queryset, list):
+            items = queryset[offset:offset + size]
+        else:
+            items = [obj async for obj in queryset[offset:offset + size]]
+        url = request.build_absolute_uri()
+        previous = None
+        if page > 1:
+            previous = remove_query_param(url, 'page') if page == 2 else replace_query_param(url, 'page', page - 1)
+        return items, {
+            'count': count,
+            'next': replace_query_param(url, 'page', page + 1) if page < pages else None,
+            'previous': previous,
+        }
+
+
+class UserDataView(AsyncAPIView):
+    """
+    Данные пользователя: ETag/Last-Modified и кэш ответов по версии данных,
+    как в ConditionalGetMixin и CachedResponseMixin. Бэкенды кэша синхронные,
+    поэтому обращения к ним идут через sync_to_async и не блокируют цикл событий.
+    Поток по умолчанию (thread_sensitive): DatabaseCache ходит в базу, а
+    соединения в этом потоке закрываются как у остального синхронного кода.
+    Если кэш не общий для воркеров, ETag считается по строкам get_queryset
+    (queryset_validators), как в ConditionalGetMixin.
+    """
+    validator_fields = ('updated_at',)
+
+    async def prepare(self, request):
+        """Вызывается до проверки ETag и кэша, как в начале list у ViewSet"""
+
+    def cached(self, request):
+        key = response_cache_key(request.user.pk, f'async.{type(self).__name__}', request.build_absolute_uri())
+        return key, get_cache().get(key)
+
+    async def respond(self, request, *args, **kwargs):
+        await self.prepare(request)
+        key = f'async|{request.get_full_path()}'
+        if is_shared():
+            etag, last_modified = await sync_to_async(user_validators)(request.user.pk, key)
+        else:
+            queryset = self.get_queryset(request, *args, **kwargs)
+            etag, last_modified = await sync_to_async(queryset_validators)(queryset, key, self.validator_fields)
+        headers = validator_headers(etag, last_modified)
+        if is_not_modified(request, etag, last_modified, exists=False):
+            return HttpResponse(status=304, headers=headers)
+
+        if not is_shared():
+            data = await self.build(request, *args, **kwargs)
+        else:
+            key, data = await sync_to_async(self.cached)(request)
+            record(hit=data is not None)
+            headers['X-Cache'] = 'HIT' if data is not None else 'MISS'
+            if data is None:
+                data = await self.build(request, *args, **kwargs)
+                await get_cache().aset(key, data, get_timeout())
+        if is_not_modified(request, etag, last_modified):
+            # If-None-Match: * после того, как build не ответил 404
+            return HttpResponse(status=304, headers=headers)
+        return json_response(data, headers=headers)
+
+
+class PetListView(UserDataView):
+    def get_queryset(self, request):
+        return filter_pets(with_age(Pet.objects.filter(owner_id=request.user.pk)), request.GET)
+
+    async def build(self, request):
+        pets, page = await self.paginate(request, self.get_queryset(request))
+        return {**page, 'results': PetSerializer(pets, many=True, context={'request': request}).data}
+
+
+class PetDetailView(UserDataView):
+    def get_queryset(self, request, pk):
+        return with_age(Pet.objects.filter(owner_id=request.user.pk, pk=pk))
+
+    async def build(self, request, pk):
+        pet = await self.get_queryset(request, pk).afirst()
+        if pet is None:
+            raise NotFound('No Pet matches the given query.')
+        return PetSerializer(pet, context={'request': request}).data
+
+
+class ReminderListView(UserDataView):
+    validator_fields = ('updated_at', 'pet__updated_at')
+
+    async def prepare(self, request):
+        await aensure_window(request.user.pk)
+
+    def get_queryset(self, request):
+        queryset = with_days_until_due(Reminder.objects.filter(owner_id=request.user.pk).select_related('pet'))
+        return filter_reminders(queryset, request.GET)
+
+    async def build(self, request):
+        reminders, page = await self.paginate(request, self.get_queryset(request))
+        return {**page, 'results': ReminderSerializer(reminders, many=True, context={'request': request}).data}
+
+
+class CatalogView(AsyncAPIView):
+    """Каталог из снимка в памяти: актуальный снимок не требует запросов к базе"""
+
+    async def respond(self, request, *args, **kwargs):
+        snapshot = await aget_snapshot()
+        etag = snapshot.etag('async', request.get_full_path())
+        headers = {'ETag': etag, 'Last-Modified': http_date(snapshot.last_modified)}
+        if is_not_modified(request, etag, snapshot.last_modified):
+            return HttpResponse(status=304, headers=headers)
+        items = self.items(request, snapshot)
+        results, page = await self.paginate(request, items, count=len(items))
+        return json_response({**page, 'results': results}, headers=headers)
+
+
+class PartnerListView(CatalogView):
+    def items(self, request, snapshot):
+        return snapshot.filter_partners(request.GET.get('category'))
+
+
+class ProductListView(CatalogView):
+    def items(self, request, snapshot):
+        return snapshot.filter_products(category=request.GET.get('category'), partner=request.GET.get('partner'))
@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .cache import get_cache, is_shared
+
+
+USER_VERSION_KEY = 'pets:user-version:{user_id}'
+
+
+def get_user_version(user_id):
+    cache = get_cache()
+    key = USER_VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_version(user_id):
+    """Сбрасывает закэшированное состояние пользователя во всех процессах с общим кэшем"""
+    cache = get_cache()
+    key = USER_VERSION_KEY.format(user_id=user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+class UserStateCache:
+    """
+    LRU-кэш строк пользователей в памяти процесса с TTL. Запись действует,
+    пока не истек TTL и не изменилась версия пользователя в общем кэше;
+    версию повышает сигнал при сохранении или удалении пользователя.
+    На каждый запрос собирается новый экземпляр User, общих объектов между
+    запросами нет. Если кэш не общий для воркеров (cache.is_shared), версия из
+    другого процесса сюда не дойдет: записи не хранятся, пользователь каждый
+    раз читается из базы, как в JWTAuthentication.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def max_size(self):
+        return getattr(settings, 'AUTH_USER_CACHE_SIZE', 10000)
+
+    def ttl(self):
+        return getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+
+    @property
+    def field_names(self):
+        return [field.attname for field in get_user_model()._meta.concrete_fields]
+
+    def peek(self, user_id):
+        """Пользователь из кэша или None, без обращения к базе"""
+        if not is_shared():
+            return None
+        version = get_user_version(user_id)
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, entry_version, values = entry
+            if expires_at < time.monotonic() or entry_version != version:
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+        return get_user_model().from_db(DEFAULT_DB_ALIAS, self.field_names, values)
+
+    def get(self, user_id):
+        """Пользователь по значению USER_ID_FIELD или None, если его нет"""
+        user = self.peek(user_id)
+        if user is not None:
+            return user
+        # Версия читается до запроса: изменение во время загрузки сбросит запись
+        version = get_user_version(user_id)
+        values = get_user_model().objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).values_list(*self.field_names).first()
+        if values is None:
+            return None
+        if is_shared():
+            with self.lock:
+                self.entries[user_id] = (time.monotonic() + self.ttl(), version, values)
+                self.entries.move_to_end(user_id)
+                while len(self.entries) > self.max_size():
+                    self.entries.popitem(last=False)
+        return get_user_model().from_db(DEFAULT_DB_ALIAS, self.field_names, values)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserStateCache()
+
+
+def check_user(user, validated_token):
+    """Те же проверки, что в JWTAuthentication.get_user"""
+    if user is None:
+        raise AuthenticationFailed(_('User not found'), code='user_not_found')
+    if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+        raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+    if api_settings.CHECK_REVOKE_TOKEN:
+        if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+    return user
+
+
+def token_user_id(validated_token):
+    try:
+        return validated_token[api_settings.USER_ID_CLAIM]
+    except KeyError as exc:
+        raise InvalidToken(_('Token contained no recognizable user identification')) from exc
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication без запроса пользователя на каждый запрос: строка
+    пользователя берется из UserStateCache. Деактивация и смена данных
+    видны сразу (сигнал повышает версию), изменения в обход сигналов
+    (queryset.update) — не позже AUTH_USER_CACHE_TTL.
+    """
+
+    def get_user(self, validated_token):
+        return check_user(user_cache.get(token_user_id(validated_token)), validated_token)
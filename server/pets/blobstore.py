@@ -0,0 +1,82 @@
+import hashlib
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import DocumentBlob, blob_upload_path
+from .uploads import save_upload
+
+
+def hash_upload(upload):
+    """Считает SHA-256 и размер загруженного файла, читая его чанками"""
+    digest = hashlib.sha256()
+    size = 0
+    upload.seek(0)
+    for chunk in upload.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    upload.seek(0)
+    return digest.hexdigest(), size
+
+
+def add_reference(sha256):
+    """Увеличивает счетчик ссылок существующего blob; None, если его нет"""
+    blob = DocumentBlob.objects.select_for_update().filter(sha256=sha256).first()
+    if blob is not None:
+        DocumentBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+        blob.refresh_from_db(fields=['ref_count'])
+    return blob
+
+
+def acquire_blob(upload, storage=default_storage):
+    """
+    Возвращает (DocumentBlob, created) для содержимого файла и увеличивает
+    счетчик ссылок. Если такие байты уже хранятся, запись не выполняется.
+    """
+    sha256, size = hash_upload(upload)
+    with transaction.atomic():
+        blob = add_reference(sha256)
+        if blob is not None:
+            return blob, False
+
+        blob = DocumentBlob(sha256=sha256, size=size, ref_count=1)
+        path = blob_upload_path(blob, upload.name)
+        saved = None
+        if not storage.exists(path):
+            saved = path = save_upload(upload, path, storage=storage).name
+        blob.file.name = path
+        try:
+            with transaction.atomic():
+                blob.save()
+        except IntegrityError:
+            # Тот же файл параллельно загрузил другой запрос и создал запись первым
+            existing = add_reference(sha256)
+            if existing is None:
+                raise
+            if saved is not None and saved != existing.file.name:
+                storage.delete(saved)
+            return existing, False
+        return blob, True
+
+
+def release_blob(blob_id, storage=default_storage):
+    """
+    Уменьшает счетчик ссылок; файл удаляется из хранилища только после
+    того, как исчезла последняя ссылка и транзакция зафиксирована.
+    """
+    with transaction.atomic():
+        blob = DocumentBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            DocumentBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+            return
+        if blob.documents.exists():
+            # Счетчик разошелся со ссылками: не удаляем то, что еще используется
+            DocumentBlob.objects.filter(pk=blob.pk).update(ref_count=blob.documents.count())
+            return
+        name = blob.file.name
+        blob.delete()
+        transaction.on_commit(lambda: storage.delete(name) if storage.exists(name) else None)
+
@@ -0,0 +1,157 @@
+import hashlib
+import threading
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+
+VERSION_KEY = 'pets:data-version:{user_id}'
+CHANGED_KEY = 'pets:data-changed:{user_id}'
+RESPONSE_KEY = 'pets:response:{user_id}:{version}:{name}:{digest}'
+
+# Бэкенды, у которых каждый процесс держит свой отдельный кэш
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def get_cache():
+    return caches[getattr(settings, 'PETS_RESPONSE_CACHE', 'default')]
+
+
+def is_shared():
+    """
+    Видят ли все воркеры одни и те же версии данных. Кэш процесса годится,
+    только если явно указано PETS_SINGLE_PROCESS (runserver, тесты).
+    """
+    if getattr(settings, 'PETS_SINGLE_PROCESS', False):
+        return True
+    alias = getattr(settings, 'PETS_RESPONSE_CACHE', 'default')
+    return settings.CACHES.get(alias, {}).get('BACKEND') not in PROCESS_LOCAL_CACHES
+
+
+def get_timeout():
+    return getattr(settings, 'PETS_RESPONSE_CACHE_TIMEOUT', 300)
+
+
+def get_data_version(user_id):
+    """
+    Текущая версия данных пользователя. Начальное значение берется от часов,
+    а не с 1, чтобы после вытеснения ключа версии не вернуться к номеру, под
+    которым в кэше еще лежат старые ответы.
+    """
+    cache = get_cache()
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_data_changed_at(user_id):
+    """
+    Время последнего изменения данных пользователя (unix time). Если отметки
+    нет в кэше, считаем, что данные изменились сейчас: так клиент получит
+    лишний полный ответ, но никогда не получит 304 на устаревшие данные.
+    """
+    cache = get_cache()
+    key = CHANGED_KEY.format(user_id=user_id)
+    changed_at = cache.get(key)
+    if changed_at is None:
+        cache.add(key, time.time(), timeout=None)
+        changed_at = cache.get(key)
+    return changed_at
+
+
+def bump_data_version(user_id):
+    """Делает все закэшированные ответы пользователя недействительными за O(1)"""
+    cache = get_cache()
+    key = VERSION_KEY.format(user_id=user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+    cache.set(CHANGED_KEY.format(user_id=user_id), time.time(), timeout=None)
+
+
+def bump_now_and_on_commit(bump, *args):
+    """
+    Версия повышается сразу и еще раз после фиксации: иначе параллельный
+    запрос мог бы закэшировать незафиксированное старое состояние под новой
+    версией.
+    """
+    bump(*args)
+    transaction.on_commit(lambda: bump(*args))
+
+
+def response_cache_key(user_id, name, uri):
+    """Ключ ответа: версия данных пользователя и дата входят в ключ"""
+    digest = hashlib.sha1(f'{date.today().isoformat()}|{uri}'.encode('utf-8')).hexdigest()
+    return RESPONSE_KEY.format(user_id=user_id, version=get_data_version(user_id), name=name, digest=digest)
+
+
+def record(hit):
+    with _stats_lock:
+        _stats['hits' if hit else 'misses'] += 1
+
+
+def cache_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
+
+
+class CachedResponseMixin:
+    """
+    Кэширует ответы list/retrieve по пользователю и версии его данных.
+    Версию повышают сигналы при изменении питомцев и связанных записей,
+    поэтому устаревший ответ никогда не отдается. Ответы зависят от текущей
+    даты (возраст, дни до напоминания), поэтому дата входит в ключ.
+
+    Повышение версии в одном воркере должно быть видно остальным, поэтому
+    с кэшем процесса (LocMemCache) без PETS_SINGLE_PROCESS ответы не
+    кэшируются вовсе (см. is_shared и проверку pets.E001). Вытеснение — LRU бэкенда.
+    """
+    cached_actions = ('list', 'retrieve')
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs))
+
+    def get_response_cache_key(self, request):
+        return response_cache_key(request.user.pk, f'{self.basename}.{self.action}', request.build_absolute_uri())
+
+    def cached_response(self, request, build):
+        if self.action not in self.cached_actions or not request.user.is_authenticated or not is_shared():
+            return build()
+
+        cache = get_cache()
+        key = self.get_response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            record(hit=True)
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        record(hit=False)
+        response = build()
+        if response.status_code == 200:
+            cache.set(key, response.data, get_timeout())
+        response['X-Cache'] = 'MISS'
+        return response
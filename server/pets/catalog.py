@@ -0,0 +1,365 @@
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from .cache import get_cache
+from .conditional import is_not_modified, not_modified_response
+
+
+VERSION_KEY = 'pets:catalog-version'
+CHANGE_KEY = 'pets:catalog-change:{version}'
+CHANGE_TIMEOUT = 24 * 60 * 60
+# Дальше этого числа изменений снимок проще собрать заново
+MAX_REPLAY = 200
+
+FACETS = ('category', 'partner_type', 'price')
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def get_catalog_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version(change=None):
+    """
+    Повышает версию каталога. change — ('product', id) для изменения одного
+    товара: по журналу изменений процессы обновляют свои снимки точечно.
+    Без записи в журнале снимок собирается заново.
+    """
+    cache = get_cache()
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        return
+    if change is not None:
+        cache.set(CHANGE_KEY.format(version=version), change, CHANGE_TIMEOUT)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+
+def parse_price(value):
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def price_buckets():
+    return getattr(settings, 'CATALOG_PRICE_BUCKETS', (500, 1000, 2500, 5000))
+
+
+def price_bucket(price):
+    lower = 0
+    for upper in price_buckets():
+        if price < upper:
+            return f'{lower}-{upper}'
+        lower = upper
+    return f'{lower}+'
+
+
+def item_hash(item):
+    payload = json.dumps(item, cls=DjangoJSONEncoder, sort_keys=True)
+    return int.from_bytes(hashlib.sha256(payload.encode('utf-8')).digest()[:16], 'big')
+
+
+class CatalogSnapshot:
+    """
+    Снимок каталога партнеров и товаров в памяти процесса: сериализованные
+    записи и индексы по категории, партнеру и доступности. Фильтры и
+    категории отвечаются без обращения к базе.
+
+    Для поиска снимок держит обратный индекс токенов названия и описания и
+    счетчики фасетов доступных товаров. При изменении товара они
+    пересчитываются только для этого товара (см. advance).
+    """
+
+    def __init__(self, version, partners, products):
+        self.version = version
+        self.partners_by_id = {item['id']: item for item in partners}
+        self.products_by_id = {}
+        self.tokens = {}
+        self.facets = {name: Counter() for name in FACETS}
+        self.partners_hash = 0
+        for item in partners:
+            self.partners_hash ^= item_hash(item)
+        self.products_hash = 0
+        for item in products:
+            self.add_product(item)
+        self.finish()
+
+    @classmethod
+    def build(cls, version):
+        from .models import Partner
+        from .serializers import PartnerSerializer
+
+        partners = PartnerSerializer(Partner.objects.all(), many=True).data
+        return cls(version, [dict(item) for item in partners], load_products())
+
+    def finish(self):
+        """Пересобирает производные списки после изменения товаров"""
+        # Время сборки — верхняя граница последнего изменения, включая удаления
+        self.last_modified = math.ceil(time.time())
+        key = lambda item: (item['name'], item['id'])
+        self.partners = sorted(self.partners_by_id.values(), key=key)
+        self.products = sorted(self.products_by_id.values(), key=key)
+
+        self.partners_by_type = {}
+        for item in self.partners:
+            self.partners_by_type.setdefault(item['partner_type'], []).append(item)
+
+        self.products_by_category = {}
+        self.products_by_partner = {}
+        for item in self.products:
+            self.products_by_category.setdefault(item['category'], []).append(item)
+            self.products_by_partner.setdefault(item['partner'], []).append(item)
+        self.categories = sorted(self.products_by_category)
+        self.vocabulary = sorted(self.tokens)
+
+        # Хэш множества записей: XOR хэшей, поддерживается при точечных изменениях
+        self.digest = f'{self.partners_hash ^ self.products_hash:032x}'
+
+    def facet_values(self, item):
+        partner = self.partners_by_id.get(item['partner'])
+        price = parse_price(item['price'])
+        return {
+            'category': item['category'],
+            'partner_type': partner['partner_type'] if partner else None,
+            'price': price_bucket(price) if price is not None else None,
+        }
+
+    def add_product(self, item, sign=1):
+        """Добавляет (sign=1) или убирает (sign=-1) товар из индексов"""
+        if sign > 0:
+            self.products_by_id[item['id']] = item
+        else:
+            self.products_by_id.pop(item['id'], None)
+        self.products_hash ^= item_hash(item)
+
+        # Множества заменяются, а не меняются: старый снимок остается целым
+        for token in set(tokenize(item['name']) + tokenize(item['description'])):
+            ids = self.tokens.get(token, frozenset())
+            ids = ids | {item['id']} if sign > 0 else ids - {item['id']}
+            if ids:
+                self.tokens[token] = ids
+            else:
+                self.tokens.pop(token, None)
+
+        if item['is_available']:
+            for name, value in self.facet_values(item).items():
+                self.facets[name][value] += sign
+                if not self.facets[name][value]:
+                    del self.facets[name][value]
+
+    def advance(self, version):
+        """
+        Новый снимок версии version, полученный из текущего применением
+        журнала изменений. None, если журнал неполон или в нем есть
+        изменения партнеров — тогда нужна полная сборка.
+        """
+        if not 0 < version - self.version <= MAX_REPLAY:
+            return None
+        cache = get_cache()
+        keys = [CHANGE_KEY.format(version=v) for v in range(self.version + 1, version + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            return None
+        product_ids = set()
+        for kind, object_id in changes.values():
+            if kind != 'product':
+                return None
+            product_ids.add(object_id)
+
+        snapshot = object.__new__(CatalogSnapshot)
+        snapshot.version = version
+        snapshot.partners_by_id = self.partners_by_id
+        snapshot.partners_hash = self.partners_hash
+        snapshot.products_by_id = dict(self.products_by_id)
+        snapshot.tokens = dict(self.tokens)
+        snapshot.facets = {name: Counter(counts) for name, counts in self.facets.items()}
+        snapshot.products_hash = self.products_hash
+        for product_id in product_ids:
+            old = snapshot.products_by_id.get(product_id)
+            if old is not None:
+                snapshot.add_product(old, sign=-1)
+        for item in load_products(product_ids):
+            snapshot.add_product(item)
+        snapshot.finish()
+        return snapshot
+
+    def filter_partners(self, partner_type=None):
+        if partner_type:
+            return self.partners_by_type.get(partner_type, [])
+        return self.partners
+
+    def filter_products(self, category=None, partner=None, available=True):
+        if category:
+            items = self.products_by_category.get(category, [])
+        elif partner:
+            items = self.products_by_partner.get(parse_id(partner), [])
+        else:
+            items = self.products
+        if category and partner:
+            partner_id = parse_id(partner)
+            items = [item for item in items if item['partner'] == partner_id]
+        if available is not None:
+            items = [item for item in items if item['is_available'] == available]
+        return items
+
+    def match_term(self, term):
+        """id товаров, в которых есть слово, начинающееся с term"""
+        start = bisect_left(self.vocabulary, term)
+        ids = set()
+        for token in self.vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            ids |= self.tokens[token]
+        return ids
+
+    def search_products(self, query='', filters=None, min_price=None, max_price=None):
+        """
+        Поиск доступных товаров по словам названия и описания с фильтром по
+        цене и фасетам. Возвращает (товары, счетчики фасетов). Счетчик фасета
+        считается с учетом всех фильтров, кроме его собственного, чтобы
+        клиент видел альтернативы выбранному значению.
+        """
+        filters = {name: value for name, value in (filters or {}).items() if value}
+        terms = tokenize(query)
+        if not terms and not filters and min_price is None and max_price is None:
+            return self.filter_products(), {name: dict(counts) for name, counts in self.facets.items()}
+
+        candidates = None
+        for term in terms:
+            ids = self.match_term(term)
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                break
+        if candidates is None:
+            items = self.products
+        else:
+            # Только найденные по индексу товары, в порядке self.products; фасеты — по ним же
+            items = sorted((self.products_by_id[product_id] for product_id in candidates),
+                           key=lambda item: (item['name'], item['id']))
+
+        rows = []
+        for item in items:
+            if not item['is_available']:
+                continue
+            price = parse_price(item['price'])
+            if min_price is not None and price < min_price:
+                continue
+            if max_price is not None and price > max_price:
+                continue
+            rows.append((item, self.facet_values(item)))
+
+        facets = {name: Counter() for name in FACETS}
+        results = []
+        for item, values in rows:
+            failed = [name for name, value in filters.items() if values[name] != value]
+            if not failed:
+                results.append(item)
+            if len(failed) <= 1:
+                for name in FACETS:
+                    if not failed or failed == [name]:
+                        facets[name][values[name]] += 1
+
+        if terms:
+            # Совпадения в названии выше совпадений только в описании
+            def score(item):
+                names = tokenize(item['name'])
+                return -sum(any(token.startswith(term) for token in names) for term in terms)
+            results.sort(key=score)
+        return results, {name: dict(counts) for name, counts in facets.items()}
+
+    def etag(self, *parts):
+        """Сильный ETag представления: снимок + параметры запроса"""
+        suffix = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:12]
+        return quote_etag(f'{self.digest}-{suffix}')
+
+
+def load_products(ids=None):
+    from .models import ProductOrService
+    from .serializers import ProductOrServiceSerializer
+
+    queryset = ProductOrService.objects.select_related('partner')
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    return [dict(item) for item in ProductOrServiceSerializer(queryset, many=True).data]
+
+
+def parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def get_snapshot():
+    """
+    Возвращает актуальный снимок. Проверка свежести — одно чтение версии из
+    кэша; после изменения товаров снимок обновляется точечно, полная сборка
+    нужна только при изменении партнеров или потере журнала.
+    """
+    global _snapshot
+    version = get_catalog_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            advanced = _snapshot.advance(version) if _snapshot is not None else None
+            _snapshot = advanced or CatalogSnapshot.build(version)
+        return _snapshot
+
+
+async def aget_snapshot():
+    """
+    Асинхронный вариант get_snapshot. Даже проверка версии — чтение из
+    синхронного бэкенда кэша, поэтому вся функция идет в потоке sync_to_async.
+    """
+    return await sync_to_async(get_snapshot)()
+
+
+class CatalogSnapshotMixin:
+    """Ответы каталога из снимка с ETag и поддержкой If-None-Match"""
+
+    def snapshot_response(self, request, snapshot, items=None, data=None, extra=None):
+        etag = snapshot.etag(request.get_full_path())
+        if is_not_modified(request, etag, snapshot.last_modified):
+            return not_modified_response(etag, snapshot.last_modified)
+        if data is not None:
+            response = Response(data)
+        else:
+            page = self.paginate_queryset(items)
+            if page is not None:
+                response = self.get_paginated_response(page)
+                if extra:
+                    response.data.update(extra)
+            else:
+                response = Response({'results': items, **extra} if extra else items)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(snapshot.last_modified)
+        return response
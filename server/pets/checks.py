@@ -0,0 +1,35 @@
+import logging
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from .cache import is_shared
+
+logger = logging.getLogger('pets')
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs=None, **kwargs):
+    """
+    Версии данных пользователей, валидаторы ETag и состояние JWT-пользователей
+    хранятся в кэше PETS_RESPONSE_CACHE. С кэшем процесса при нескольких
+    воркерах они расходятся, поэтому кэш ответов, условные запросы и кэш
+    пользователей в таком режиме выключены; это ошибка конфигурации.
+    """
+    if is_shared():
+        return []
+    alias = getattr(settings, 'PETS_RESPONSE_CACHE', 'default')
+    backend = settings.CACHES[alias]['BACKEND'].rsplit('.', 1)[-1]
+    return [Error(
+        f'CACHES[{alias!r}] uses {backend}, which is not shared between worker processes; '
+        'response caching, conditional GET and the JWT user cache are disabled.',
+        hint='Use a shared cache (Redis, Memcached or DatabaseCache), or set PETS_SINGLE_PROCESS = True '
+             'if the site runs in exactly one process.',
+        id='pets.E001',
+    )]
+
+
+def report_on_startup():
+    """Под WSGI/ASGI-сервером системные проверки не запускаются: ошибка пишется в лог"""
+    for message in check_shared_cache():
+        logger.error('%s %s', message.msg, message.hint)
@@ -0,0 +1,118 @@
+import hashlib
+import math
+from datetime import date, datetime, time as dt_time
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import get_data_changed_at, get_data_version, is_shared
+
+
+def start_of_today():
+    """Начало текущих суток в unix time: ответы с возрастом и днями до срока меняются каждый день"""
+    midnight = timezone.make_aware(datetime.combine(date.today(), dt_time.min))
+    return midnight.timestamp()
+
+
+def is_not_modified(request, etag, last_modified, exists=True):
+    """
+    Проверка условного запроса по RFC 9110: If-None-Match имеет приоритет,
+    If-Modified-Since учитывается только без него. If-None-Match: * совпадает
+    только с существующим ресурсом: пока это не проверено, передается exists=False.
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        # Для If-None-Match используется слабое сравнение
+        etags = [tag.removeprefix('W/') for tag in parse_etags(if_none_match)]
+        return ('*' in etags and exists) or etag.removeprefix('W/') in etags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    if if_modified_since is not None and last_modified is not None:
+        return last_modified <= if_modified_since
+    return False
+
+
+def user_validators(user_id, key):
+    """ETag и Last-Modified ответа по версии данных пользователя; key — вариант представления"""
+    version = get_data_version(user_id)
+    last_modified = math.ceil(max(get_data_changed_at(user_id), start_of_today()))
+    digest = hashlib.sha1(f'{version}|{date.today().isoformat()}|{key}'.encode('utf-8')).hexdigest()
+    return f'W/"{digest}"', last_modified
+
+
+def queryset_validators(queryset, key, fields=('updated_at',)):
+    """
+    Валидаторы по самим строкам, когда версии в кэше не общие для воркеров
+    (cache.is_shared): число строк и MAX по полям fields одним запросом.
+    Создание и изменение сдвигают MAX, удаление меняет число строк. Время
+    удаления из базы не узнать, поэтому Last-Modified не отдается (None).
+    """
+    stats = queryset.order_by().aggregate(
+        count=Count('pk'), **{f'max_{i}': Max(field) for i, field in enumerate(fields)},
+    )
+    changed = ','.join(str(stats[f'max_{i}']) for i in range(len(fields)))
+    digest = hashlib.sha1(f'{stats["count"]}|{changed}|{date.today().isoformat()}|{key}'.encode('utf-8')).hexdigest()
+    return f'W/"{digest}"', None
+
+
+def validator_headers(etag, last_modified):
+    headers = {'ETag': etag}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+    return headers
+
+
+def not_modified_response(etag, last_modified):
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag, last_modified))
+
+
+class ConditionalGetMixin:
+    """
+    Поддержка If-None-Match / If-Modified-Since для list и retrieve.
+
+    Валидаторы строятся по версии и времени изменения данных пользователя,
+    которые повышают сигналы post_save/post_delete (в том числе при
+    удалениях, которые не видны по MAX(updated_at)). Проверка не обращается
+    к базе и не сериализует ничего; 304 отдается сразу.
+
+    Если кэш не общий для воркеров, версия одного процесса не видит изменений,
+    сделанных другим; тогда ETag считается по строкам queryset одним запросом
+    COUNT/MAX (queryset_validators). validator_fields — поля времени изменения,
+    от которых зависит ответ (включая связанные, например имя питомца).
+    """
+    conditional_actions = ('list', 'retrieve')
+    validator_fields = ('updated_at',)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
+
+    def get_validators(self, request):
+        accepted = getattr(request, 'accepted_media_type', '')
+        key = f'{accepted}|{request.get_full_path()}'
+        if is_shared():
+            return user_validators(request.user.pk, key)
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == 'retrieve':
+            lookup = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup]})
+        return queryset_validators(queryset, key, self.validator_fields)
+
+    def conditional_response(self, request, build):
+        if self.action not in self.conditional_actions or not request.user.is_authenticated:
+            return build()
+        etag, last_modified = self.get_validators(request)
+        # Валидаторы общие для данных пользователя: существование объекта еще не проверено
+        if is_not_modified(request, etag, last_modified, exists=False):
+            return not_modified_response(etag, last_modified)
+        response = build()
+        if response.status_code == 200:
+            if is_not_modified(request, etag, last_modified):
+                return not_modified_response(etag, last_modified)
+            for name, value in validator_headers(etag, last_modified).items():
+                response[name] = value
+        return response
@@ -0,0 +1,193 @@
+import csv
+import json
+import os
+import zipfile
+
+from asgiref.sync import sync_to_async
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from .models import MedicalRecord, Reminder, PetDocument
+
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'zip')
+ROW_CHUNK_SIZE = 2000
+FILE_CHUNK_SIZE = 64 * 1024
+# Колонки совпадают с форматом manage.py import_medical_history
+CSV_COLUMNS = [
+    'kind', 'owner', 'pet', 'species', 'breed', 'birth_date', 'type', 'title',
+    'description', 'date', 'veterinarian', 'cost', 'is_completed',
+]
+END = object()
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+    'zip': 'application/zip',
+}
+
+
+class Echo:
+    """Псевдо-файл для csv.writer: возвращает строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+class StreamBuffer:
+    """
+    Неперематываемый поток для zipfile: записанные байты забираются
+    генератором после каждой записи, в памяти держится один блок.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Отдает накопленные байты (ноль или один блок)"""
+        if self.chunks:
+            data = b''.join(self.chunks)
+            self.chunks = []
+            yield data
+
+
+def batched(lines, size=FILE_CHUNK_SIZE):
+    """
+    Склеивает мелкие строки в блоки, чтобы не отдавать ответ по строке.
+    Первая строка (заголовок) уходит сразу, до чтения данных из базы.
+    """
+    buffer, length = [], 0
+    for index, line in enumerate(lines):
+        buffer.append(line)
+        length += len(line)
+        if length >= size or index == 0:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def history_rows(pet):
+    """Записи и напоминания питомца в порядке дат, порциями через iterator()"""
+    base = {
+        'owner': pet.owner.username, 'pet': pet.name, 'species': pet.species,
+        'breed': pet.breed, 'birth_date': pet.birth_date.isoformat() if pet.birth_date else '',
+    }
+    records = MedicalRecord.objects.filter(pet=pet).order_by('date', 'id').values_list(
+        'record_type', 'title', 'description', 'date', 'veterinarian', 'cost',
+    )
+    for record_type, title, description, date_, veterinarian, cost in records.iterator(chunk_size=ROW_CHUNK_SIZE):
+        yield {
+            **base, 'kind': 'record', 'type': record_type, 'title': title, 'description': description,
+            'date': date_.isoformat(), 'veterinarian': veterinarian,
+            'cost': '' if cost is None else str(cost), 'is_completed': '',
+        }
+    reminders = Reminder.objects.filter(pet=pet).order_by('due_date', 'id').values_list(
+        'reminder_type', 'title', 'description', 'due_date', 'is_completed',
+    )
+    for reminder_type, title, description, due_date, is_completed in reminders.iterator(chunk_size=ROW_CHUNK_SIZE):
+        yield {
+            **base, 'kind': 'reminder', 'type': reminder_type, 'title': title, 'description': description,
+            'date': due_date.isoformat(), 'veterinarian': '', 'cost': '',
+            'is_completed': 'true' if is_completed else 'false',
+        }
+
+
+def csv_lines(pet):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for row in history_rows(pet):
+        yield writer.writerow([row[column] for column in CSV_COLUMNS])
+
+
+def documents_of(pet):
+    return PetDocument.objects.filter(pet=pet).order_by('uploaded_at', 'id').values(
+        'id', 'document_type', 'title', 'description', 'file', 'file_size', 'uploaded_at',
+    ).iterator(chunk_size=ROW_CHUNK_SIZE)
+
+
+def jsonl_lines(pet):
+    dumps = lambda data: json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+    yield dumps({
+        'kind': 'pet', 'id': pet.id, 'name': pet.name, 'species': pet.species, 'breed': pet.breed,
+        'birth_date': pet.birth_date, 'weight_kg': pet.weight_kg, 'notes': pet.notes,
+    })
+    for row in history_rows(pet):
+        yield dumps({column: row[column] for column in CSV_COLUMNS if column not in ('owner', 'pet', 'species', 'breed', 'birth_date')})
+    for document in documents_of(pet):
+        yield dumps({'kind': 'document', **document})
+
+
+def archive_name(document):
+    return f"documents/{document['id']}_{os.path.basename(document['file'])}"
+
+
+def zip_chunks(pet):
+    """
+    ZIP с историей (CSV в формате импорта, JSONL) и файлами документов.
+    Файлы читаются и сжимаются блоками; архив пишется без перемотки
+    (data descriptor), поэтому первые байты уходят сразу.
+    """
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, lines in (('history.csv', csv_lines(pet)), ('history.jsonl', jsonl_lines(pet))):
+            with archive.open(name, mode='w', force_zip64=True) as entry:
+                for block in batched(lines):
+                    entry.write(block.encode('utf-8'))
+                    yield from buffer.drain()
+        for document in documents_of(pet):
+            if not document['file'] or not default_storage.exists(document['file']):
+                continue
+            info = zipfile.ZipInfo(archive_name(document), date_time=document['uploaded_at'].timetuple()[:6])
+            # PDF и изображения уже сжаты
+            info.compress_type = zipfile.ZIP_STORED
+            with default_storage.open(document['file'], 'rb') as source, \
+                    archive.open(info, mode='w', force_zip64=True) as entry:
+                for block in iter(lambda: source.read(FILE_CHUNK_SIZE), b''):
+                    entry.write(block)
+                    yield from buffer.drain()
+    yield from buffer.drain()
+
+
+async def aiterate(iterator):
+    """
+    Асинхронная обертка синхронного потока для ASGI. Синхронный итератор
+    StreamingHttpResponse под ASGI Django собирает целиком (sync_to_async(list)),
+    а здесь каждый блок считается отдельным шагом в потоке sync_to_async:
+    первый байт уходит сразу, в памяти один блок. Шаги идут в одном потоке,
+    поэтому курсор iterator() не переходит между потоками.
+    """
+    iterator = iter(iterator)
+    step = sync_to_async(next)
+    try:
+        while (block := await step(iterator, END)) is not END:
+            yield block
+    finally:
+        # Клиент мог отключиться раньше: генератор закрывается в том же потоке
+        await sync_to_async(iterator.close)()
+
+
+def export_response(pet, export_format, request=None):
+    if export_format == 'zip':
+        body = zip_chunks(pet)
+    else:
+        lines = csv_lines(pet) if export_format == 'csv' else jsonl_lines(pet)
+        body = (block.encode('utf-8') for block in batched(lines))
+    if isinstance(request, ASGIRequest):
+        body = aiterate(body)
+    response = StreamingHttpResponse(body, content_type=CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="pet-{pet.id}-history.{export_format}"'
+    return response
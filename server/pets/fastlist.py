@@ -0,0 +1,176 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.functional import cached_property
+from rest_framework import fields, relations, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .metrics import timed_serialization
+from .serializers import (
+    PetSerializer, MedicalRecordSerializer, ReminderSerializer, PetDocumentSerializer,
+    image_variant_urls, size_in_mb,
+)
+
+
+def is_enabled():
+    return getattr(settings, 'PETS_FAST_LIST', False)
+
+
+def absolute_url(request, url):
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+# Поля, у которых значение из базы уже совпадает с выводом to_representation
+IDENTITY_FIELDS = (fields.CharField, fields.IntegerField, fields.BooleanField)
+
+
+class FastSerializer:
+    """
+    Сериализация списков только для чтения без экземпляров моделей: строки
+    берутся из values_list, а поля сериализатора DRF заранее превращаются
+    в кодировщики колонок. Ключи, порядок и значения совпадают с выводом
+    serializer_class; SerializerMethodField задаются в methods как
+    (колонки, функция(значения..., request, today)).
+    """
+
+    def __init__(self, serializer_class, methods=None):
+        self.serializer_class = serializer_class
+        self.methods = methods or {}
+
+    @cached_property
+    def plan(self):
+        """[(ключ, индексы колонок, кодировщик или None, тип)] и список колонок"""
+        model = self.serializer_class.Meta.model
+        columns = []
+
+        def column(name):
+            if name not in columns:
+                columns.append(name)
+            return columns.index(name)
+
+        plan = []
+        for key, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                if key not in self.methods:
+                    raise ImproperlyConfigured(f'{self.serializer_class.__name__}.{key}: нет быстрой реализации')
+                names, function = self.methods[key]
+                plan.append((key, tuple(column(name) for name in names), function, 'method'))
+            elif isinstance(field, relations.PrimaryKeyRelatedField):
+                plan.append((key, column(model._meta.get_field(field.source).attname), None, 'value'))
+            elif isinstance(field, relations.RelatedField) or isinstance(field, serializers.BaseSerializer):
+                raise ImproperlyConfigured(f'{self.serializer_class.__name__}.{key}: вложенные поля не поддерживаются')
+            elif isinstance(field, fields.FileField) and getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+                storage = model._meta.get_field(field.source).storage
+                plan.append((key, column(field.source), storage.url, 'file'))
+            else:
+                index = column('__'.join(field.source_attrs))
+                if type(field) in IDENTITY_FIELDS:
+                    encoder = None
+                elif type(field) is fields.DateField and getattr(field, 'format', api_settings.DATE_FORMAT) == 'iso-8601':
+                    encoder = date.isoformat
+                elif type(field) is fields.DateTimeField and getattr(field, 'format', api_settings.DATETIME_FORMAT) == 'iso-8601':
+                    plan.append((key, index, field, 'datetime'))
+                    continue
+                else:
+                    encoder = field.to_representation
+                plan.append((key, index, encoder, 'value'))
+
+        # Колонки ключа сортировки нужны KeysetPagination для курсора
+        for name in list(model._meta.ordering) + ['id']:
+            column(model._meta.get_field(name.lstrip('-')).attname)
+        return plan, columns
+
+    def values(self, queryset):
+        return queryset.values_list(*self.plan[1], named=True)
+
+    def encode(self, rows, request=None):
+        with timed_serialization():
+            return self.encode_rows(rows, request)
+
+    def encode_rows(self, rows, request):
+        plan, _ = self.plan
+        today = date.today()
+        # Часовой пояс DateTimeField определяется один раз, а не на каждое значение
+        timezones = {
+            field: field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+            for _, _, field, kind in plan if kind == 'datetime'
+        }
+        data = []
+        for row in rows:
+            item = {}
+            for key, index, encoder, kind in plan:
+                if kind == 'value':
+                    value = row[index]
+                    item[key] = value if encoder is None or value is None else encoder(value)
+                elif kind == 'datetime':
+                    value = row[index]
+                    tz = timezones[encoder]
+                    if value is None or tz is None or value.tzinfo is None:
+                        item[key] = encoder.to_representation(value) if value is not None else None
+                    else:
+                        # DateTimeField.to_representation для aware-значений и формата ISO 8601
+                        value = value.astimezone(tz).isoformat()
+                        item[key] = value[:-6] + 'Z' if value.endswith('+00:00') else value
+                elif kind == 'file':
+                    value = row[index]
+                    # FileField.to_representation: пустое имя — None, иначе (абсолютный) URL
+                    item[key] = absolute_url(request, encoder(value)) if value else None
+                else:
+                    item[key] = encoder(*(row[i] for i in index), request, today)
+            data.append(item)
+        return data
+
+
+def pet_image_url(image, image_url, request, today):
+    if image:
+        return absolute_url(request, PET_IMAGE_STORAGE.url(image))
+    return image_url
+
+
+def document_file_url(file, request, today):
+    if file:
+        return absolute_url(request, DOCUMENT_FILE_STORAGE.url(file))
+    return None
+
+
+PET_IMAGE_STORAGE = PetSerializer.Meta.model._meta.get_field('image').storage
+DOCUMENT_FILE_STORAGE = PetDocumentSerializer.Meta.model._meta.get_field('file').storage
+
+PET = FastSerializer(PetSerializer, methods={
+    'image_url': (('image', 'image_url'), pet_image_url),
+    'image_variants': (('image_variants',), lambda variants, request, today: image_variant_urls(variants, request)),
+    # Возраст и дни до срока считает база (annotations), вьюсеты аннотируют queryset
+    'age': (('age',), lambda age, request, today: age),
+})
+MEDICAL_RECORD = FastSerializer(MedicalRecordSerializer)
+REMINDER = FastSerializer(ReminderSerializer, methods={
+    'days_until_due': (('days_until_due',), lambda days, request, today: days),
+})
+PET_DOCUMENT = FastSerializer(PetDocumentSerializer, methods={
+    'file_url': (('file',), document_file_url),
+    'file_size_mb': (('file_size',), lambda file_size, request, today: size_in_mb(file_size)),
+})
+
+
+class FastListMixin:
+    """
+    Быстрый путь для list: values_list вместо экземпляров и FastSerializer
+    вместо сериализатора DRF. Включается настройкой PETS_FAST_LIST для
+    вьюсетов с fast_serializer; пагинация (номер страницы и курсор) та же.
+    Ставится в базах после CachedResponseMixin, чтобы кэш видел обычный ответ.
+    """
+    fast_serializer = None
+    fast_list_actions = ('list',)
+
+    def list(self, request, *args, **kwargs):
+        if self.fast_serializer is None or self.action not in self.fast_list_actions or not is_enabled():
+            return super().list(request, *args, **kwargs)
+        rows = self.fast_serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.fast_serializer.encode(page, request))
+        return Response(self.fast_serializer.encode(rows, request))
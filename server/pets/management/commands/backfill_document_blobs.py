@@ -0,0 +1,57 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from pets.blobstore import acquire_blob
+from pets.models import PetDocument
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит документы, загруженные до хранения файлов по содержимому, в '
+        'DocumentBlob: одинаковые файлы сводятся к одной копии со счетчиком '
+        'ссылок, прежний файл удаляется после фиксации транзакции. Документы '
+        'обрабатываются по одному, повторный запуск продолжает с оставшихся.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Сколько документов читать за запрос')
+        parser.add_argument('--keep-files', action='store_true', help='Не удалять прежние файлы документов')
+
+    def handle(self, *args, **options):
+        moved = skipped = 0
+        last_id = 0
+        while True:
+            ids = list(
+                PetDocument.objects.filter(blob=None, pk__gt=last_id).exclude(file='')
+                .order_by('pk').values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            for pk in ids:
+                if self.move(pk, options['keep_files']):
+                    moved += 1
+                else:
+                    skipped += 1
+            last_id = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f'Перенесено документов: {moved}, пропущено: {skipped}'))
+
+    def move(self, pk, keep_files):
+        with transaction.atomic():
+            document = PetDocument.objects.select_for_update().filter(pk=pk, blob=None).first()
+            if document is None:
+                # Файл уже заменили через API
+                return False
+            name = document.file.name
+            if not default_storage.exists(name):
+                self.stderr.write(f'Документ {pk}: нет файла {name}')
+                return False
+            with default_storage.open(name, 'rb') as source:
+                blob, _ = acquire_blob(source)
+            document.blob = blob
+            document.file = blob.file.name
+            # save() с сигналами: у владельца меняется file_url, это попадает в синхронизацию
+            document.save()
+            if not keep_files and name != blob.file.name and not PetDocument.objects.filter(file=name).exists():
+                transaction.on_commit(lambda: default_storage.delete(name))
+        return True
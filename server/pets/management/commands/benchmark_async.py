@@ -0,0 +1,143 @@
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from pets.models import Pet, Reminder
+
+
+BENCH_USERNAME = 'bench_async_owner'
+
+MODES = [
+    ('WSGI, синхронный DRF', 'wsgi', '/api/{name}/'),
+    ('ASGI, синхронный DRF', 'asgi', '/api/{name}/'),
+    ('ASGI, асинхронный путь', 'asgi', '/api/async/{name}/'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность чтения под WSGI (пул потоков) и '
+        'ASGI (синхронный DRF и асинхронные обработчики) при медленных '
+        'клиентах. Запросы идут в обработчики Django напрямую, без сети; '
+        'медленный клиент имитируется задержкой при получении ответа.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', default='pets', choices=['pets', 'reminders', 'partners', 'products-services'])
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=200, help='Одновременных клиентов')
+        parser.add_argument('--threads', type=int, default=8, help='Потоков у WSGI-сервера')
+        parser.add_argument('--client-delay', type=float, default=0.05, help='Сколько клиент получает ответ, сек')
+
+    def handle(self, *args, **options):
+        user = self.bench_user()
+        token = str(AccessToken.for_user(user))
+        self.stdout.write(
+            f"{options['requests']} запросов к /{options['endpoint']}/, {options['concurrency']} клиентов, "
+            f"задержка клиента {options['client_delay'] * 1000:.0f} мс, потоков WSGI: {options['threads']}"
+        )
+        for label, server, template in MODES:
+            path = template.format(name=options['endpoint'])
+            run = self.run_wsgi if server == 'wsgi' else self.run_asgi
+            elapsed, latencies, errors = run(path, token, options)
+            self.stdout.write(
+                f'{label:<26} {options["requests"] / elapsed:8.1f} запр/с  '
+                f'p50 {statistics.median(latencies) * 1000:7.1f} мс  '
+                f'p95 {statistics.quantiles(latencies, n=20)[18] * 1000:7.1f} мс  '
+                f'ошибок: {errors}'
+            )
+
+    def bench_user(self):
+        user, created = User.objects.get_or_create(username=BENCH_USERNAME)
+        if created:
+            pets = Pet.objects.bulk_create([Pet(name=f'Питомец {i}', owner=user) for i in range(50)])
+            Reminder.objects.bulk_create([
+                Reminder(pet=pet, reminder_type='other', title=f'Напоминание {i}',
+                         due_date=date.today() + timedelta(days=i))
+                for pet in pets for i in range(5)
+            ])
+        return user
+
+    def run_wsgi(self, path, token, options):
+        handler = WSGIHandler()
+        delay = options['client_delay']
+
+        def request():
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+                'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_AUTHORIZATION': f'Bearer {token}', 'wsgi.input': io.BytesIO(b''),
+                'wsgi.url_scheme': 'http', 'wsgi.errors': io.StringIO(),
+            }
+            status = []
+            started = time.perf_counter()
+            result = handler(environ, lambda code, headers: status.append(code))
+            for _ in result:
+                pass
+            # Синхронный воркер держит поток, пока клиент читает ответ
+            time.sleep(delay)
+            result.close()
+            return time.perf_counter() - started, status[0].startswith('200')
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            results = list(pool.map(lambda _: request(), range(options['requests'])))
+        return self.summarize(started, results)
+
+    def run_asgi(self, path, token, options):
+        handler = ASGIHandler()
+        delay = options['client_delay']
+
+        async def request(semaphore):
+            async with semaphore:
+                scope = {
+                    'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                    'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+                    'query_string': b'', 'root_path': '', 'server': ('localhost', 80),
+                    'client': ('127.0.0.1', 50000),
+                    'headers': [(b'host', b'localhost'), (b'authorization', f'Bearer {token}'.encode())],
+                }
+                received = False
+                status = []
+
+                async def receive():
+                    nonlocal received
+                    if not received:
+                        received = True
+                        return {'type': 'http.request', 'body': b'', 'more_body': False}
+                    # Клиент не отключается: ждем, пока обработчик не отменит ожидание
+                    await asyncio.Future()
+
+                async def send(message):
+                    if message['type'] == 'http.response.start':
+                        status.append(message['status'])
+                    elif not message.get('more_body'):
+                        # Медленный клиент ждет в цикле событий, поток не занят
+                        await asyncio.sleep(delay)
+
+                started = time.perf_counter()
+                await handler(scope, receive, send)
+                return time.perf_counter() - started, status == [200]
+
+        async def main():
+            semaphore = asyncio.Semaphore(options['concurrency'])
+            return await asyncio.gather(*(request(semaphore) for _ in range(options['requests'])))
+
+        started = time.perf_counter()
+        results = asyncio.run(main())
+        return self.summarize(started, results)
+
+    def summarize(self, started, results):
+        elapsed = time.perf_counter() - started
+        latencies = [latency for latency, _ in results]
+        errors = sum(not ok for _, ok in results)
+        return elapsed, latencies, errors
@@ -0,0 +1,154 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from pets.cache import bump_data_version
+from pets.models import Pet, MedicalRecord, Reminder, PetDocument
+from pets.views import PetViewSet, MedicalRecordViewSet, ReminderViewSet, PetDocumentViewSet
+
+
+BENCH_USER_PREFIX = 'bench_owner_'
+
+ENDPOINTS = [
+    ('pets', PetViewSet),
+    ('medical-records', MedicalRecordViewSet),
+    ('reminders', ReminderViewSet),
+    ('documents', PetDocumentViewSet),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время list-эндпоинтов с составными индексами моделей и без них. '
+        'Команда создает отдельную временную базу (как тестовый раннер), заполняет '
+        'ее через seed_data и удаляет после замера; рабочая база не затрагивается. '
+        'По умолчанию ~100 тыс. питомцев и ~5 млн медицинских записей. Кэш ответов '
+        'обходится: перед каждым запросом повышается версия данных. Списки записей '
+        'и напоминаний фильтруются по копии владельца и идут по индексам (owner, ...) '
+        '(--explain показывает планы).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database-name',
+            help='Имя временной базы (для sqlite — файл); по умолчанию benchmark_lists[.sqlite3]',
+        )
+        parser.add_argument('--keepdb', action='store_true', help='Не удалять временную базу и данные после замера')
+        parser.add_argument('--seed', action='store_true', help='Пересоздать данные, даже если они уже есть в базе')
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--pets-per-user', type=int, default=5)
+        parser.add_argument('--records-per-pet', type=int, default=50)
+        parser.add_argument('--reminders-per-pet', type=int, default=5)
+        parser.add_argument('--documents-per-pet', type=int, default=2)
+        parser.add_argument('--repeat', type=int, default=20, help='Сколько раз запрашивать каждый эндпоинт')
+        parser.add_argument('--pages', type=int, default=5, help='Сколько первых страниц запрашивать')
+        parser.add_argument('--no-compare', action='store_true', help='Не замерять вариант без индексов')
+        parser.add_argument('--explain', action='store_true', help='Показать планы запросов списков')
+
+    def handle(self, *args, **options):
+        old_name, old_test_name = connection.settings_dict['NAME'], connection.settings_dict['TEST']['NAME']
+        connection.settings_dict['TEST']['NAME'] = options['database_name'] or (
+            'benchmark_lists.sqlite3' if connection.vendor == 'sqlite' else 'benchmark_lists'
+        )
+        # Индексы снимаются и возвращаются только во временной базе
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'],
+        )
+        try:
+            self.benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            connection.settings_dict['TEST']['NAME'] = old_test_name
+
+    def benchmark(self, options):
+        seeded = User.objects.filter(username__startswith=BENCH_USER_PREFIX).exists()
+        if options['seed'] or not seeded:
+            call_command(
+                'seed_data', prefix=BENCH_USER_PREFIX, reset=True, users=options['users'],
+                pets_per_user=options['pets_per_user'], records_per_pet=options['records_per_pet'],
+                reminders_per_pet=options['reminders_per_pet'], documents_per_pet=options['documents_per_pet'],
+                partners=0, stdout=self.stdout,
+            )
+
+        # Самый «тяжелый» аккаунт: у него больше всего питомцев
+        owner = User.objects.filter(username__startswith=BENCH_USER_PREFIX).annotate(
+            pet_count=Count('pet'),
+        ).order_by('-pet_count', 'id').first()
+        if owner is None:
+            raise CommandError('Нет данных для замера, проверьте --users')
+
+        self.stdout.write(
+            f'Питомцев: {Pet.objects.count()}, записей: {MedicalRecord.objects.count()}; '
+            f'владелец для замера: {owner.username}, питомцев: {owner.pet_count}'
+        )
+        if options['explain']:
+            self.explain(owner)
+        with_indexes = self.measure(owner, options)
+        self.report('С индексами', with_indexes)
+
+        if not options['no_compare']:
+            indexes = self.composite_indexes()
+            with connection.schema_editor() as editor:
+                for model, index in indexes:
+                    editor.remove_index(model, index)
+            try:
+                without_indexes = self.measure(owner, options)
+            finally:
+                with connection.schema_editor() as editor:
+                    for model, index in indexes:
+                        editor.add_index(model, index)
+            self.report('Без составных индексов', without_indexes)
+
+    def composite_indexes(self):
+        return [
+            (model, index)
+            for model in (Pet, MedicalRecord, Reminder, PetDocument)
+            for index in model._meta.indexes
+        ]
+
+    def explain(self, owner):
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        for name, viewset in ENDPOINTS:
+            request = Request(factory.get(f'/api/{name}/'))
+            request.user = owner
+            view = viewset(action='list', request=request, format_kwarg=None)
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(view.filter_queryset(view.get_queryset()).explain())
+
+    def measure(self, owner, options):
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        results = {}
+        for name, viewset in ENDPOINTS:
+            view = viewset.as_view({'get': 'list'})
+            timings = []
+            for _ in range(options['repeat']):
+                for page in range(1, options['pages'] + 1):
+                    # Иначе после первого прохода замерялись бы попадания в кэш ответов
+                    bump_data_version(owner.pk)
+                    request = factory.get(f'/api/{name}/', {'page': page})
+                    force_authenticate(request, user=owner)
+                    started = time.perf_counter()
+                    response = view(request)
+                    response.render()
+                    timings.append((time.perf_counter() - started) * 1000)
+                    if response.status_code != 200:
+                        break
+            results[name] = timings
+        return results
+
+    def report(self, title, results):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, timings in results.items():
+            timings = sorted(timings)
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(
+                f'  {name:<16} median {statistics.median(timings):8.2f} ms   '
+                f'p95 {p95:8.2f} ms   n={len(timings)}'
+            )
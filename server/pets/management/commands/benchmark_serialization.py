@@ -0,0 +1,105 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from pets import fastlist
+from pets.annotations import with_age, with_days_until_due
+from pets.models import Pet, MedicalRecord, Reminder, PetDocument
+from pets.renderers import CompactJSONRenderer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает CPU на строку у сериализаторов DRF с JSONRenderer и у быстрого '
+        'пути списков (pets.fastlist) с CompactJSONRenderer. Данные создаются во '
+        'временной транзакции и откатываются; вывод обоих путей сверяется побайтно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='Строк каждого типа')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                owner = self.seed(options['rows'])
+                request = APIRequestFactory().get('/api/', SERVER_NAME='localhost')
+                cases = [
+                    ('pets', fastlist.PET, with_age(Pet.objects.filter(owner=owner))),
+                    ('medical-records', fastlist.MEDICAL_RECORD,
+                     MedicalRecord.objects.filter(owner=owner).select_related('pet')),
+                    ('reminders', fastlist.REMINDER,
+                     with_days_until_due(Reminder.objects.filter(owner=owner).select_related('pet'))),
+                    ('documents', fastlist.PET_DOCUMENT, PetDocument.objects.filter(owner=owner).select_related('pet')),
+                ]
+                for name, fast, queryset in cases:
+                    self.compare(name, fast, queryset, request, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def compare(self, name, fast, queryset, request, repeat):
+        def drf():
+            data = fast.serializer_class(queryset.all(), many=True, context={'request': request}).data
+            return JSONRenderer().render(data)
+
+        def fast_path():
+            return CompactJSONRenderer().render(fast.encode(fast.values(queryset.all()), request))
+
+        slow_output, fast_output = drf(), fast_path()
+        if slow_output != fast_output:
+            raise CommandError(f'{name}: вывод быстрого пути отличается от сериализатора')
+        rows = queryset.count()
+        slow_cpu = self.cpu(drf, repeat) / rows * 1e6
+        fast_cpu = self.cpu(fast_path, repeat) / rows * 1e6
+        self.stdout.write(
+            f'{name:<16} DRF {slow_cpu:7.1f} мкс/строка   быстрый путь {fast_cpu:6.1f} мкс/строка   '
+            f'x{slow_cpu / fast_cpu:.1f}   ({rows} строк, {len(fast_output) // rows} байт/строка)'
+        )
+
+    def cpu(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.process_time()
+            run()
+            timings.append(time.process_time() - started)
+        return min(timings)
+
+    def seed(self, rows):
+        rng = random.Random(7)
+        today = date.today()
+        owner = User.objects.create(username='bench_serialization_owner')
+        pets = Pet.objects.bulk_create([
+            Pet(owner=owner, name=f'Питомец {i}', breed='Беспородная', notes='Особых пометок нет',
+                birth_date=today - timedelta(days=rng.randint(100, 5000)), weight_kg=Decimal('4.20'),
+                image=f'pets/{i}.jpg' if i % 2 else '', image_variants={'thumb': f'pets/{i}_thumb.webp'} if i % 2 else {})
+            for i in range(rows)
+        ], batch_size=1000)
+        MedicalRecord.objects.bulk_create([
+            MedicalRecord(pet=pets[i % len(pets)], record_type='examination', title=f'Осмотр {i}',
+                          description='Плановый осмотр, без замечаний', date=today - timedelta(days=i % 900),
+                          veterinarian='Иванова А. С.', cost=Decimal('1500.00'))
+            for i in range(rows)
+        ], batch_size=1000)
+        Reminder.objects.bulk_create([
+            Reminder(pet=pets[i % len(pets)], reminder_type='vaccination', title=f'Прививка {i}',
+                     due_date=today + timedelta(days=i % 365))
+            for i in range(rows)
+        ], batch_size=1000)
+        PetDocument.objects.bulk_create([
+            PetDocument(pet=pets[i % len(pets)], owner=owner, document_type='medical', title=f'Документ {i}',
+                        file=f'documents/{i}.pdf', file_size=250_000)
+            for i in range(rows)
+        ], batch_size=1000)
+        return owner
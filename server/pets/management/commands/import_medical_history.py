@@ -0,0 +1,322 @@
+import csv
+import io
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from pets.cache import bump_data_version, bump_now_and_on_commit
+from pets.models import Pet, MedicalRecord, Reminder, ImportCheckpoint
+from pets.sync import record_changes
+
+
+# Колонки, значения которых должны быть строками (или отсутствовать)
+TEXT_FIELDS = ('kind', 'owner', 'pet', 'species', 'breed', 'type', 'title', 'description', 'veterinarian')
+PET_NAME_LENGTH = Pet._meta.get_field('name').max_length
+
+
+class RowError(ValueError):
+    pass
+
+
+class PetCache:
+    """Ограниченный LRU-кэш (владелец, имя питомца) -> id питомца"""
+
+    def __init__(self, limit=100_000):
+        self.limit = limit
+        self.items = OrderedDict()
+
+    def get(self, key):
+        value = self.items.get(key)
+        if value is not None:
+            self.items.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.limit:
+            self.items.popitem(last=False)
+
+
+def read_records(stream, fmt, header=None):
+    """
+    Читает файл построчно и возвращает (строка-словарь, смещение после нее).
+    Смещение указывает на начало следующей записи, с него можно продолжить.
+    """
+    position = stream.tell()
+
+    def lines():
+        nonlocal position
+        for raw in iter(stream.readline, b''):
+            position += len(raw)
+            yield raw.decode('utf-8-sig')
+
+    if fmt == 'jsonl':
+        for line in lines():
+            line = line.strip()
+            if line:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    yield RowError(f'invalid JSON: {exc}'), position
+                    continue
+                if not isinstance(row, dict):
+                    yield RowError(f'expected a JSON object, got {type(row).__name__}'), position
+                    continue
+                yield row, position
+        return
+
+    for values in csv.reader(lines()):
+        if not values:
+            continue
+        if len(values) != len(header):
+            yield RowError(f'expected {len(header)} columns, got {len(values)}'), position
+            continue
+        yield dict(zip(header, values)), position
+
+
+def parse_date(value, field):
+    try:
+        return date.fromisoformat(str(value).strip())
+    except ValueError:
+        raise RowError(f'{field}: invalid date {value!r}')
+
+
+def parse_bool(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'да')
+
+
+def parse_cost(value):
+    if value in (None, ''):
+        return None
+    try:
+        cost = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise RowError(f'cost: invalid number {value!r}')
+    if not cost.is_finite():
+        raise RowError(f'cost: invalid number {value!r}')
+    field = MedicalRecord._meta.get_field('cost')
+    try:
+        # Округление как при сохранении; ограничения колонки проверяются здесь, а не падением bulk_create
+        cost = cost.quantize(Decimal(1).scaleb(-field.decimal_places))
+        field.run_validators(cost)
+    except (InvalidOperation, ValidationError):
+        raise RowError(f'cost: {value!r} does not fit {field.max_digits} digits')
+    return cost
+
+
+def check_row(row):
+    """Строка-словарь с текстовыми полями-строками, иначе RowError вместо строки"""
+    if isinstance(row, RowError):
+        return row
+    if not isinstance(row, dict):
+        return RowError(f'expected an object, got {type(row).__name__}')
+    for field in TEXT_FIELDS:
+        value = row.get(field)
+        if value is not None and not isinstance(value, str):
+            return RowError(f'{field}: expected a string, got {type(value).__name__}')
+    return row
+
+
+def pet_name(row):
+    """Имя питомца так, как оно будет сохранено: ключ кэша совпадает с именем в базе"""
+    return (row.get('pet') or '').strip()[:PET_NAME_LENGTH]
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковый импорт медицинской истории из CSV/JSONL. Колонки: kind '
+        '(record|reminder), owner (username), pet, species, breed, birth_date, '
+        'type, title, description, date, veterinarian, cost, is_completed. '
+        'Данные фиксируются порциями; после прерывания импорт продолжается '
+        'с сохраненного смещения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='По умолчанию — по расширению файла')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--source', help='Имя контрольной точки (по умолчанию — абсолютный путь)')
+        parser.add_argument('--restart', action='store_true', help='Игнорировать контрольную точку и начать сначала')
+        parser.add_argument('--create-pets', action='store_true', help='Создавать питомцев, которых нет в базе')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'Файл не найден: {path}')
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        source = options['source'] or os.path.abspath(path)
+        chunk_size = options['chunk_size']
+        self.create_pets = options['create_pets']
+        self.pet_cache = PetCache()
+        self.owner_cache = {}
+
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=source[:255])
+        if options['restart']:
+            checkpoint.offset = checkpoint.rows_imported = checkpoint.rows_skipped = 0
+            checkpoint.save()
+
+        started = time.monotonic()
+        imported_now = 0
+        with open(path, 'rb') as stream:
+            header = None
+            if fmt == 'csv':
+                header_line = stream.readline().decode('utf-8-sig')
+                header = next(csv.reader(io.StringIO(header_line)), None)
+                if not header:
+                    raise CommandError(f'Пустой CSV-файл, нет строки заголовка: {path}')
+                header = [name.strip() for name in header]
+                if checkpoint.offset < stream.tell():
+                    checkpoint.offset = stream.tell()
+            if checkpoint.offset:
+                self.stdout.write(f'Продолжаем с байта {checkpoint.offset} ({checkpoint.rows_imported} строк уже импортировано)')
+            stream.seek(checkpoint.offset)
+
+            chunk = []
+            for row, offset in read_records(stream, fmt, header):
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    imported_now += self.commit_chunk(checkpoint, chunk, offset)
+                    chunk = []
+                    self.report(checkpoint, imported_now, started)
+            if chunk:
+                imported_now += self.commit_chunk(checkpoint, chunk, offset)
+        self.report(checkpoint, imported_now, started, final=True)
+
+    def report(self, checkpoint, imported_now, started, final=False):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        message = (
+            f'{checkpoint.rows_imported} строк импортировано, {checkpoint.rows_skipped} пропущено, '
+            f'{imported_now / elapsed:.0f} строк/с'
+        )
+        self.stdout.write(self.style.SUCCESS(message) if final else message)
+
+    def commit_chunk(self, checkpoint, rows, offset):
+        """Записывает порцию и смещение в одной транзакции: ни дублей, ни потерь при повторе"""
+        with transaction.atomic():
+            records, reminders, skipped, owners = self.build_objects(rows)
+            MedicalRecord.objects.bulk_create(records)
+            Reminder.objects.bulk_create(reminders)
+            # bulk_create не отправляет сигналов: журнал синхронизации пишется здесь
+            for owner_id, objects in owners.items():
+                record_changes(owner_id, [obj for obj in objects if isinstance(obj, MedicalRecord)], created=True)
+                record_changes(owner_id, [obj for obj in objects if isinstance(obj, Reminder)], created=True)
+            checkpoint.offset = offset
+            checkpoint.rows_imported += len(records) + len(reminders)
+            checkpoint.rows_skipped += skipped
+            checkpoint.save()
+            for owner_id in owners:
+                bump_now_and_on_commit(bump_data_version, owner_id)
+        return len(records) + len(reminders)
+
+    def resolve_owners(self, usernames):
+        missing = [name for name in usernames if name not in self.owner_cache]
+        if missing:
+            found = dict(User.objects.filter(username__in=missing).values_list('username', 'id'))
+            for name in missing:
+                self.owner_cache[name] = found.get(name)
+        return {name: self.owner_cache[name] for name in usernames}
+
+    def resolve_pets(self, rows, owners):
+        keys = set()
+        for row in rows:
+            if isinstance(row, dict) and owners.get(row.get('owner')) and pet_name(row):
+                keys.add((owners[row['owner']], pet_name(row)))
+        missing = {key for key in keys if self.pet_cache.get(key) is None}
+        if missing:
+            existing = Pet.objects.filter(
+                owner_id__in={owner_id for owner_id, _ in missing},
+                name__in={name for _, name in missing},
+            ).order_by('-id').values_list('owner_id', 'name', 'id')
+            for owner_id, name, pet_id in existing:
+                if (owner_id, name) in missing:
+                    self.pet_cache.set((owner_id, name), pet_id)
+            missing = {key for key in missing if self.pet_cache.get(key) is None}
+        if missing and self.create_pets:
+            first_rows = {}
+            for row in rows:
+                if isinstance(row, dict) and owners.get(row.get('owner')):
+                    first_rows.setdefault((owners[row['owner']], pet_name(row)), row)
+            new_pets = []
+            for owner_id, name in missing:
+                row = first_rows[(owner_id, name)]
+                try:
+                    birth_date = parse_date(row['birth_date'], 'birth_date') if row.get('birth_date') else None
+                except RowError:
+                    birth_date = None
+                species = row.get('species')
+                new_pets.append(Pet(
+                    owner_id=owner_id, name=name,
+                    species=species if species in dict(Pet.SPECIES_CHOICES) else 'other',
+                    breed=(row.get('breed') or '')[:100],
+                    birth_date=birth_date,
+                ))
+            created = Pet.objects.bulk_create(new_pets)
+            for pet in created:
+                self.pet_cache.set((pet.owner_id, pet.name), pet.id)
+            for owner_id in {pet.owner_id for pet in created}:
+                record_changes(owner_id, [pet for pet in created if pet.owner_id == owner_id], created=True)
+
+    def build_objects(self, rows):
+        rows = [check_row(row) for row in rows]
+        owners = self.resolve_owners({row.get('owner') for row in rows if isinstance(row, dict)})
+        self.resolve_pets(rows, owners)
+
+        records, reminders, touched = [], [], {}
+        skipped = 0
+        for row in rows:
+            try:
+                obj = self.build_object(row, owners)
+            except RowError as exc:
+                skipped += 1
+                self.stderr.write(f'Строка пропущена: {exc}')
+                continue
+            (records if isinstance(obj, MedicalRecord) else reminders).append(obj)
+            touched.setdefault(owners[row['owner']], []).append(obj)
+        return records, reminders, skipped, touched
+
+    def build_object(self, row, owners):
+        if isinstance(row, RowError):
+            raise row
+        owner_id = owners.get(row.get('owner'))
+        if owner_id is None:
+            raise RowError(f'unknown owner {row.get("owner")!r}')
+        pet_id = self.pet_cache.get((owner_id, pet_name(row)))
+        if pet_id is None:
+            raise RowError(f'unknown pet {row.get("pet")!r} for owner {row.get("owner")!r}')
+        title = (row.get('title') or '').strip()
+        if not title:
+            raise RowError('title is required')
+
+        kind = (row.get('kind') or 'record').strip()
+        if kind == 'record':
+            record_type = row.get('type') or 'other'
+            if record_type not in dict(MedicalRecord.RECORD_TYPES):
+                raise RowError(f'unknown record type {record_type!r}')
+            cost = parse_cost(row.get('cost'))
+            return MedicalRecord(
+                pet_id=pet_id, owner_id=owner_id, record_type=record_type, title=title[:200],
+                description=row.get('description') or '',
+                date=parse_date(row.get('date'), 'date'),
+                veterinarian=(row.get('veterinarian') or '')[:100],
+                cost=cost,
+            )
+        if kind == 'reminder':
+            reminder_type = row.get('type') or 'other'
+            if reminder_type not in dict(Reminder.REMINDER_TYPES):
+                raise RowError(f'unknown reminder type {reminder_type!r}')
+            return Reminder(
+                pet_id=pet_id, owner_id=owner_id, reminder_type=reminder_type, title=title[:200],
+                description=row.get('description') or '',
+                due_date=parse_date(row.get('date'), 'date'),
+                is_completed=parse_bool(row.get('is_completed', False)),
+            )
+        raise RowError(f'unknown kind {kind!r}')
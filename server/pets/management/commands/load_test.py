@@ -0,0 +1,242 @@
+import json
+import math
+import os
+import statistics
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import URLResolver, get_resolver, reverse
+
+from .seed_data import SEED_USER_PREFIX
+
+
+Route = namedtuple('Route', 'name basename viewset action detail')
+
+# Параметры для эндпоинтов, которым они обязательны: (viewset, действие) -> query
+QUERY = {
+    ('SearchViewSet', 'list'): {'q': 'осмотр'},
+    ('ProductOrServiceViewSet', 'search'): {'q': 'корм'},
+    ('PetViewSet', 'export'): {'type': 'jsonl'},
+}
+# Рост p95 меньше этого порога — шум, а не регрессия
+NOISE_FLOOR_MS = 2.0
+
+
+def router_routes(resolver=None):
+    """Все GET-маршруты роутеров DRF текущего urlconf, без вариантов с суффиксом формата"""
+    routes = []
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+                continue
+            actions = getattr(pattern.callback, 'actions', None)
+            if not actions or 'get' not in actions or 'format' in pattern.pattern.regex.groupindex:
+                continue
+            initkwargs = pattern.callback.initkwargs
+            routes.append(Route(
+                name=pattern.name,
+                basename=initkwargs.get('basename'),
+                viewset=pattern.callback.cls.__name__,
+                action=actions['get'],
+                detail='pk' in pattern.pattern.regex.groupindex,
+            ))
+
+    walk((resolver or get_resolver()).url_patterns)
+    return routes
+
+
+def percentile(ordered, p):
+    """Перцентиль по методу ближайшего ранга"""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+def summarize(samples, elapsed):
+    """samples — список (задержка в сек, статус, байт); статус 0 — ошибка соединения"""
+    latencies = sorted(latency * 1000 for latency, _, _ in samples)
+    statuses = Counter(str(status) for _, status, _ in samples)
+    return {
+        'requests': len(samples),
+        'errors': sum(count for status, count in statuses.items() if status == '0' or int(status) >= 400),
+        'statuses': dict(sorted(statuses.items())),
+        'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        'mean_ms': round(statistics.fmean(latencies), 2),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(latencies[-1], 2),
+        'mean_bytes': round(statistics.fmean(size for _, _, size in samples)),
+    }
+
+
+def find_regressions(current, baseline, tolerance):
+    """Эндпоинты, у которых p95 вырос больше допуска или появились ошибки"""
+    regressions = []
+    for name, result in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if before is None:
+            continue
+        growth = result['p95_ms'] - before['p95_ms']
+        if growth > NOISE_FLOOR_MS and result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{name}: p95 {before["p95_ms"]} -> {result["p95_ms"]} мс')
+        if result['errors'] > before['errors']:
+            regressions.append(f'{name}: ошибок {before["errors"]} -> {result["errors"]}')
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест API по HTTP (только стандартная библиотека). Входит '
+        'через /api/token/ пользователями из seed_data, проходит все GET-маршруты '
+        'роутеров с заданной параллельностью и пишет p50/p95/p99 и пропускную '
+        'способность в JSON. С --compare сравнивает с прошлым прогоном и '
+        'завершается ошибкой при регрессии.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--prefix', default=SEED_USER_PREFIX, help='Префикс пользователей seed_data')
+        parser.add_argument('--password', default='seed-password')
+        parser.add_argument('--users', type=int, default=10, help='Сколько пользователей войдет в систему')
+        parser.add_argument('--requests', type=int, default=200, help='Запросов на эндпоинт')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--warmup', type=int, default=5, help='Неучитываемых запросов на эндпоинт')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--only', nargs='*', help='Имена маршрутов (pet-list, pet-detail...)')
+        parser.add_argument('--output', default='load-results.json')
+        parser.add_argument('--compare', help='JSON прошлого прогона для сравнения')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Допустимый рост p95, доля')
+
+    def handle(self, *args, **options):
+        self.base_url = options['base_url'].rstrip('/')
+        self.timeout = options['timeout']
+        self.ids = {}
+        routes = [route for route in router_routes() if not options['only'] or route.name in options['only']]
+        if not routes:
+            raise CommandError('Нет маршрутов для теста')
+
+        tokens = self.login(options)
+        targets = self.targets(routes, tokens)
+        results = {}
+        for route in routes:
+            candidates = targets.get(route.name)
+            if not candidates:
+                self.stdout.write(f'{route.name:<34} пропущен: нет объектов')
+                continue
+            results[route.name] = self.run(candidates, options)
+            self.report(route.name, results[route.name])
+
+        output = {
+            'meta': {
+                'base_url': self.base_url,
+                'finished_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'users': len(tokens),
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+            },
+            'endpoints': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as stream:
+            json.dump(output, stream, ensure_ascii=False, indent=2, sort_keys=True)
+            stream.write('\n')
+        self.stdout.write(f'Результаты: {os.path.abspath(options["output"])}')
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as stream:
+                baseline = json.load(stream)
+            regressions = find_regressions(output, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Регрессии производительности:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS(f'Регрессий относительно {options["compare"]} нет'))
+
+    def request(self, path, token=None, data=None):
+        """(статус, тело, секунды); статус 0 — соединение не удалось"""
+        headers = {'Accept': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        body = None
+        if data is not None:
+            body = json.dumps(data).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers)
+        started = time.perf_counter()
+        status, content = self.send(request)
+        return status, content, time.perf_counter() - started
+
+    def send(self, request):
+        """Отправляет urllib.request.Request: (статус, тело); статус 0 — соединение не удалось"""
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read()
+        except (urllib.error.URLError, OSError):
+            return 0, b''
+
+    def login(self, options):
+        tokens = []
+        for i in range(options['users']):
+            status, content, _ = self.request(reverse('token_obtain_pair'), data={
+                'username': f'{options["prefix"]}{i}', 'password': options['password'],
+            })
+            if status == 200:
+                tokens.append(json.loads(content)['access'])
+        if not tokens:
+            raise CommandError('Не удалось войти ни одним пользователем: запустите manage.py seed_data')
+        return tokens
+
+    def targets(self, routes, tokens):
+        """Для каждого маршрута — список (токен, путь); id для detail берутся из list того же пользователя"""
+        targets = {}
+        for route in routes:
+            query = QUERY.get((route.viewset, route.action))
+            suffix = f'?{urllib.parse.urlencode(query)}' if query else ''
+            if not route.detail:
+                targets[route.name] = [(token, reverse(route.name) + suffix) for token in tokens]
+                continue
+            targets[route.name] = [
+                (token, reverse(route.name, kwargs={'pk': pk}) + suffix)
+                for token in tokens
+                for pk in [self.first_id(route.basename, token)] if pk is not None
+            ]
+        return targets
+
+    def first_id(self, basename, token):
+        key = (basename, token)
+        if key not in self.ids:
+            status, content, _ = self.request(reverse(f'{basename}-list'), token)
+            results = json.loads(content).get('results', []) if status == 200 else []
+            self.ids[key] = results[0]['id'] if results else None
+        return self.ids[key]
+
+    def run(self, candidates, options):
+        for i in range(options['warmup']):
+            self.request(candidates[i % len(candidates)][1], candidates[i % len(candidates)][0])
+
+        def call(i):
+            token, path = candidates[i % len(candidates)]
+            status, content, seconds = self.request(path, token)
+            return seconds, status, len(content)
+
+        started = time.perf_counter()
+        if options['concurrency'] == 1:
+            samples = [call(i) for i in range(options['requests'])]
+        else:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                samples = list(pool.map(call, range(options['requests'])))
+        return summarize(samples, time.perf_counter() - started)
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<34} {result["throughput_rps"]:8.1f} запр/с  p50 {result["p50_ms"]:7.1f}  '
+            f'p95 {result["p95_ms"]:7.1f}  p99 {result["p99_ms"]:7.1f} мс  ошибок: {result["errors"]}'
+        )
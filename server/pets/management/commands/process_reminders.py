@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pets.reminders import ReminderScanner, extend_windows, get_sender
+
+
+class Command(BaseCommand):
+    help = 'Отправляет владельцам дайджесты напоминаний, срок которых наступает'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', default='default', help='Имя обработчика (своя отметка прогресса)')
+        parser.add_argument('--horizon-days', type=int, default=1, help='За сколько дней до срока напоминать')
+        parser.add_argument('--lookback-days', type=int, default=7, help='Насколько старые просроченные сроки еще рассылать')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--flush-size', type=int, default=10000, help='Сколько напоминаний копить перед отправкой')
+        parser.add_argument('--sender', help='Путь к классу отправителя, например pets.reminders.FileSender')
+        parser.add_argument('--loop', action='store_true', help='Работать постоянно')
+        parser.add_argument('--interval', type=int, default=60, help='Пауза между проходами в режиме --loop, сек')
+        parser.add_argument('--reset', action='store_true', help='Сбросить отметку и начать сканирование заново')
+
+    def handle(self, *args, **options):
+        sender = get_sender(options['sender'])
+        while True:
+            scanner = ReminderScanner(
+                sender,
+                name=options['name'],
+                horizon_days=options['horizon_days'],
+                lookback_days=options['lookback_days'],
+                chunk_size=options['chunk_size'],
+                flush_size=options['flush_size'],
+            )
+            if options['reset']:
+                scanner.reset()
+                options['reset'] = False
+            # Повторяющиеся напоминания неактивных пользователей тоже попадают в скан
+            changed = extend_windows()
+            processed = scanner.run()
+            self.stdout.write(f'Создано и удалено повторений: {changed}, обработано напоминаний: {processed}')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from pets.sync import prune_tombstones, tombstone_days
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет отметки об удалении старше SYNC_TOMBSTONE_DAYS. Клиенты с '
+        'более старым токеном получают полную синхронизацию.'
+    )
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(f'Удалено отметок: {deleted} (хранятся {tombstone_days()} дн.)')
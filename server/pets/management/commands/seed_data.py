@@ -0,0 +1,214 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from pets.catalog import bump_catalog_version
+from pets.models import Pet, MedicalRecord, Reminder, PetDocument, Partner, ProductOrService
+from pets.sync import record_changes
+
+
+SEED_USER_PREFIX = 'seed_user_'
+SEED_PARTNER_PREFIX = 'Seed: '
+
+NAMES = ['Барсик', 'Мурка', 'Шарик', 'Рекс', 'Луна', 'Симба', 'Граф', 'Бусинка', 'Тайсон', 'Мотя', 'Жужа', 'Арчи']
+BREEDS = {
+    'cat': ['Британская', 'Мейн-кун', 'Сиамская', 'Сфинкс', 'Беспородная'],
+    'dog': ['Лабрадор', 'Овчарка', 'Такса', 'Корги', 'Хаски', 'Беспородная'],
+    'other': ['Хорек', 'Кролик', 'Попугай'],
+}
+RECORDS = {
+    'vaccination': ['Вакцинация от бешенства', 'Комплексная вакцинация'],
+    'examination': ['Плановый осмотр', 'Осмотр перед прививкой', 'Осмотр зубов'],
+    'treatment': ['Лечение отита', 'Лечение дерматита', 'Курс антибиотиков'],
+    'surgery': ['Кастрация', 'Удаление зуба'],
+    'other': ['Чипирование', 'Анализ крови'],
+}
+VETS = ['Иванова А. С.', 'Петров Д. В.', 'Смирнова Е. К.', 'Кузнецов И. Н.', '']
+REMINDER_TYPES = ['vaccination', 'deworming', 'examination', 'grooming', 'other']
+DOCUMENT_TYPES = ['medical', 'vaccination', 'pedigree', 'insurance', 'other']
+PARTNER_TYPES = ['clinic', 'pharmacy', 'grooming', 'hotel', 'other']
+PRODUCTS = {
+    'food': ['Сухой корм', 'Влажный корм', 'Лакомство'],
+    'medicine': ['Капли от блох', 'Таблетки от глистов', 'Витамины'],
+    'accessories': ['Ошейник', 'Поводок', 'Переноска'],
+    'toys': ['Мячик', 'Когтеточка', 'Дразнилка'],
+    'care': ['Шампунь', 'Расческа', 'Стрижка когтей'],
+    'other': ['Консультация', 'Передержка'],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу реалистичными синтетическими данными для нагрузочных '
+        'тестов (manage.py load_test): пользователи с общим паролем, питомцы, '
+        'записи, напоминания, документы, партнеры и товары. Вставка пакетами, '
+        'журнал синхронизации и поисковый индекс заполняются вместе с данными.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--pets-per-user', type=int, default=3, help='Среднее число питомцев на пользователя')
+        parser.add_argument('--records-per-pet', type=int, default=20)
+        parser.add_argument('--reminders-per-pet', type=int, default=5)
+        parser.add_argument('--documents-per-pet', type=int, default=2)
+        parser.add_argument('--partners', type=int, default=50)
+        parser.add_argument('--products-per-partner', type=int, default=40)
+        parser.add_argument('--password', default='seed-password', help='Пароль всех созданных пользователей')
+        parser.add_argument('--prefix', default=SEED_USER_PREFIX, help='Префикс имен пользователей')
+        parser.add_argument('--chunk-users', type=int, default=100, help='Пользователей в одной транзакции')
+        parser.add_argument('--random-seed', type=int, default=42)
+        parser.add_argument('--reset', action='store_true', help='Удалить ранее созданные этой командой данные')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['random_seed'])
+        self.today = date.today()
+        prefix = options['prefix']
+        existing = User.objects.filter(username__startswith=prefix)
+        if existing.exists():
+            if not options['reset']:
+                raise CommandError(f'Пользователи с префиксом {prefix!r} уже есть, запустите с --reset')
+            self.stdout.write('Удаление прежних данных...')
+            existing.delete()
+            Partner.objects.filter(name__startswith=SEED_PARTNER_PREFIX).delete()
+
+        # Хэш считается один раз: PBKDF2 на каждого пользователя занял бы минуты
+        password = make_password(options['password'])
+        totals = dict.fromkeys(('users', 'pets', 'records', 'reminders', 'documents'), 0)
+        for start in range(0, options['users'], options['chunk_users']):
+            count = min(options['chunk_users'], options['users'] - start)
+            with transaction.atomic():
+                for key, value in self.seed_users(prefix, start, count, password, options).items():
+                    totals[key] += value
+            self.stdout.write(f'  пользователей: {totals["users"]}/{options["users"]}', ending='\r')
+        self.stdout.write('')
+
+        with transaction.atomic():
+            partners, products = self.seed_catalog(options)
+        bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {totals["users"]}, питомцев {totals["pets"]}, записей {totals["records"]}, '
+            f'напоминаний {totals["reminders"]}, документов {totals["documents"]}, '
+            f'партнеров {partners}, товаров {products}. Пароль: {options["password"]}'
+        ))
+
+    def seed_users(self, prefix, start, count, password, options):
+        rng = self.rng
+        users = User.objects.bulk_create([
+            User(username=f'{prefix}{start + i}', email=f'{prefix}{start + i}@example.com', password=password)
+            for i in range(count)
+        ])
+        pets = Pet.objects.bulk_create([
+            self.build_pet(user)
+            for user in users
+            # Число питомцев разное: у большинства 1-3, у некоторых заметно больше
+            for _ in range(max(1, round(rng.expovariate(1 / options['pets_per_user']))))
+        ], batch_size=1000)
+        records = MedicalRecord.objects.bulk_create([
+            self.build_record(pet) for pet in pets for _ in range(rng.randint(0, 2 * options['records_per_pet']))
+        ], batch_size=1000)
+        reminders = Reminder.objects.bulk_create([
+            self.build_reminder(pet) for pet in pets for _ in range(rng.randint(0, 2 * options['reminders_per_pet']))
+        ], batch_size=1000)
+        documents = PetDocument.objects.bulk_create([
+            self.build_document(pet, i) for pet in pets for i in range(rng.randint(0, 2 * options['documents_per_pet']))
+        ], batch_size=1000)
+
+        by_owner = {}
+        for obj in pets + records + reminders + documents:
+            by_owner.setdefault((obj.owner_id, type(obj)), []).append(obj)
+        for (owner_id, _), objects in by_owner.items():
+            record_changes(owner_id, objects, created=True)
+        return {
+            'users': len(users), 'pets': len(pets), 'records': len(records),
+            'reminders': len(reminders), 'documents': len(documents),
+        }
+
+    def build_pet(self, user):
+        rng = self.rng
+        species = rng.choices(('cat', 'dog', 'other'), weights=(5, 4, 1))[0]
+        return Pet(
+            owner=user,
+            name=rng.choice(NAMES),
+            species=species,
+            breed=rng.choice(BREEDS[species]),
+            birth_date=self.today - timedelta(days=rng.randint(60, 6000)),
+            weight_kg=Decimal(rng.randint(50, 4000)) / 100,
+            notes=rng.choice(['', '', 'Аллергия на курицу', 'Боится громких звуков']),
+        )
+
+    def build_record(self, pet):
+        rng = self.rng
+        record_type = rng.choices(list(RECORDS), weights=(3, 5, 3, 1, 1))[0]
+        title = rng.choice(RECORDS[record_type])
+        return MedicalRecord(
+            pet=pet,
+            record_type=record_type,
+            title=title,
+            description=f'{title}. Состояние удовлетворительное, рекомендации выданы владельцу.',
+            date=self.today - timedelta(days=rng.randint(0, 3000)),
+            veterinarian=rng.choice(VETS),
+            cost=Decimal(rng.randint(5, 300) * 100) if rng.random() < 0.8 else None,
+        )
+
+    def build_reminder(self, pet):
+        rng = self.rng
+        reminder_type = rng.choice(REMINDER_TYPES)
+        due_date = self.today + timedelta(days=rng.randint(-180, 365))
+        return Reminder(
+            pet=pet,
+            reminder_type=reminder_type,
+            title=dict(Reminder.REMINDER_TYPES)[reminder_type],
+            due_date=due_date,
+            is_completed=due_date < self.today and rng.random() < 0.7,
+        )
+
+    def build_document(self, pet, number):
+        rng = self.rng
+        document_type = rng.choice(DOCUMENT_TYPES)
+        return PetDocument(
+            pet=pet,
+            owner_id=pet.owner_id,
+            document_type=document_type,
+            title=f'{dict(PetDocument.DOCUMENT_TYPES)[document_type]} {number + 1}',
+            # Файлов в хранилище нет: для чтения API достаточно пути и размера
+            file=f'documents/{pet.owner_id}/{pet.pk}/seed_{number}.pdf',
+            file_size=rng.randint(20_000, 3_000_000),
+        )
+
+    def seed_catalog(self, options):
+        rng = self.rng
+        partners = Partner.objects.bulk_create([
+            Partner(
+                name=f'{SEED_PARTNER_PREFIX}Партнер {i + 1}',
+                partner_type=rng.choice(PARTNER_TYPES),
+                address=f'г. Бишкек, ул. Синтетическая, {i + 1}',
+                phone=f'+996 555 {i:06d}',
+                rating=Decimal(rng.randint(30, 50)) / 10,
+            )
+            for i in range(options['partners'])
+        ])
+        products = ProductOrService.objects.bulk_create([
+            self.build_product(partner)
+            for partner in partners
+            for _ in range(rng.randint(0, 2 * options['products_per_partner']))
+        ], batch_size=1000)
+        return len(partners), len(products)
+
+    def build_product(self, partner):
+        rng = self.rng
+        category = rng.choice(list(PRODUCTS))
+        name = rng.choice(PRODUCTS[category])
+        return ProductOrService(
+            partner=partner,
+            category=category,
+            name=f'{name} {rng.choice(["для кошек", "для собак", "универсальный"])}',
+            description=f'{name}: синтетический товар для нагрузочного теста',
+            price=Decimal(rng.randint(10, 2000) * 10),
+            is_available=rng.random() < 0.9,
+        )
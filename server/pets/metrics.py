@@ -0,0 +1,327 @@
+import contextvars
+import hmac
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework.serializers import ListSerializer
+
+from .cache import cache_stats
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+# Сколько запросов SQL хранить для журнала медленных запросов
+MAX_CAPTURED_SQL = 50
+
+current = contextvars.ContextVar('pets_metrics_request', default=None)
+
+
+def is_enabled():
+    return getattr(settings, 'PETS_METRICS_ENABLED', True)
+
+
+def slow_request_ms():
+    return getattr(settings, 'PETS_SLOW_REQUEST_MS', None)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_seconds', 'serializer_seconds', 'serializing', 'render_seconds', 'sql')
+
+    def __init__(self, capture_sql):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializing = False
+        self.render_seconds = 0.0
+        self.sql = [] if capture_sql else None
+
+
+class Metric:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}
+
+    def format_labels(self, values, extra=()):
+        pairs = list(zip(self.labels, values)) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, value in pairs)
+        return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def lines(self):
+        for labels, value in sorted(self.values.items()):
+            yield f'{self.name}{self.format_labels(labels)} {value:g}'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels, buckets):
+        super().__init__(name, help_text, labels)
+        self.buckets = buckets
+
+    def observe(self, labels, value):
+        # Счетчики по корзинам без накопления, последний элемент — +Inf, затем сумма
+        row = self.values.get(labels)
+        if row is None:
+            row = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def lines(self):
+        for labels, row in sorted(self.values.items()):
+            total = 0
+            for bound, count in zip([f'{bound:g}' for bound in self.buckets] + ['+Inf'], row):
+                total += count
+                yield f'{self.name}_bucket{self.format_labels(labels, [("le", bound)])} {total}'
+            yield f'{self.name}_sum{self.format_labels(labels)} {row[-1]:g}'
+            yield f'{self.name}_count{self.format_labels(labels)} {total}'
+
+
+class Registry:
+    """
+    Метрики процесса. Каждый воркер считает свои: Prometheus опрашивает
+    воркеры по отдельности или суммирует их на своей стороне.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        route = ('route', 'method')
+        self.requests = Counter('pets_http_requests_total', 'Запросы по маршруту и статусу', route + ('status',))
+        self.latency = Histogram('pets_http_request_duration_seconds', 'Время ответа', route, LATENCY_BUCKETS)
+        self.queries = Histogram('pets_db_queries_per_request', 'Запросов SQL на запрос', route, QUERY_BUCKETS)
+        self.db_seconds = Counter('pets_db_query_seconds_total', 'Время в SQL', route)
+        self.serializer_seconds = Counter(
+            'pets_serializer_seconds_total', 'Время сериализаторов без SQL и рендеринга JSON', route,
+        )
+        self.render_seconds = Counter('pets_render_seconds_total', 'Время рендеринга тела ответа в JSON', route)
+        self.response_bytes = Histogram('pets_http_response_bytes', 'Размер тела ответа', route, SIZE_BUCKETS)
+        self.metrics = [
+            self.requests, self.latency, self.queries, self.db_seconds, self.serializer_seconds,
+            self.render_seconds, self.response_bytes,
+        ]
+
+    def observe(self, route, method, status, seconds, stats, size):
+        labels = (route, method)
+        with self.lock:
+            self.requests.inc(labels + (str(status),))
+            self.latency.observe(labels, seconds)
+            self.queries.observe(labels, stats.queries)
+            self.db_seconds.inc(labels, stats.db_seconds)
+            self.serializer_seconds.inc(labels, stats.serializer_seconds)
+            self.render_seconds.inc(labels, stats.render_seconds)
+            if size is not None:
+                self.response_bytes.observe(labels, size)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for metric in self.metrics:
+                lines.append(f'# HELP {metric.name} {metric.help_text}')
+                lines.append(f'# TYPE {metric.name} {metric.kind}')
+                lines.extend(metric.lines())
+        stats = cache_stats()
+        lines.append('# HELP pets_response_cache_requests_total Обращения к кэшу ответов')
+        lines.append('# TYPE pets_response_cache_requests_total counter')
+        lines.append(f'pets_response_cache_requests_total{{result="hit"}} {stats["hits"]}')
+        lines.append(f'pets_response_cache_requests_total{{result="miss"}} {stats["misses"]}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self.lock:
+            for metric in self.metrics:
+                metric.values.clear()
+
+
+registry = Registry()
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        if stats.sql is not None and len(stats.sql) < MAX_CAPTURED_SQL:
+            stats.sql.append((elapsed, sql))
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    # Обертка постоянная и общая для всех потоков: запросы из sync_to_async
+    # попадают в статистику того же HTTP-запроса через contextvar
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed_serialization():
+    """
+    Время сериализации в рамках HTTP-запроса. Считается только внешний вызов:
+    вложенные сериализаторы входят в его время. SQL из ленивых queryset
+    вычитается, он уже учтен в pets_db_query_seconds_total.
+    """
+    stats = current.get()
+    if stats is None or stats.serializing:
+        yield
+        return
+    stats.serializing = True
+    db_seconds = stats.db_seconds
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started - (stats.db_seconds - db_seconds)
+        stats.serializer_seconds += max(elapsed, 0.0)
+        stats.serializing = False
+
+
+class TimedListSerializer(ListSerializer):
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+class TimedSerializerMixin:
+    """
+    Замер .data для сериализаторов приложения, без подмены классов DRF.
+    Рендеринг JSON идет позже, в CompactJSONRenderer, и сюда не входит.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = getattr(cls, 'Meta', None)
+        if meta is not None and not hasattr(meta, 'list_serializer_class'):
+            meta.list_serializer_class = TimedListSerializer
+
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+def record_render(seconds):
+    """Время рендеринга ответа; вызывается из CompactJSONRenderer"""
+    stats = current.get()
+    if stats is not None:
+        stats.render_seconds += seconds
+
+
+def install():
+    """Подключает счетчик SQL; вызывается из PetsConfig.ready"""
+    if not is_enabled():
+        return
+    connection_created.connect(install_query_wrapper, dispatch_uid='pets.metrics')
+    for connection in connections.all(initialized_only=True):
+        install_query_wrapper(None, connection)
+
+
+def route_of(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match._func_path
+
+
+class MetricsMiddleware:
+    """
+    Время ответа, число и время запросов SQL, время сериализаторов и
+    рендеринга JSON и размер
+    ответа по имени маршрута (pet-list, pet-overview, async-pet-list...).
+    При PETS_SLOW_REQUEST_MS запросы дольше порога пишутся в журнал вместе
+    с их SQL.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not is_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        self.finish(request, response, stats, started)
+        return response
+
+    async def __acall__(self, request):
+        stats, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        self.finish(request, response, stats, started)
+        return response
+
+    def start(self):
+        stats = RequestStats(capture_sql=slow_request_ms() is not None)
+        return stats, current.set(stats), time.perf_counter()
+
+    def finish(self, request, response, stats, started):
+        seconds = time.perf_counter() - started
+        route = route_of(request)
+        size = None if response.streaming else len(response.content)
+        registry.observe(route, request.method, response.status_code, seconds, stats, size)
+        threshold = slow_request_ms()
+        if threshold is not None and seconds * 1000 >= threshold:
+            slowest = sorted(stats.sql or [], reverse=True)[:10]
+            logger.warning(
+                'Slow request %s %s (%s): %.0f ms, %d queries in %.0f ms, serializers %.0f ms, render %.0f ms\n%s',
+                request.method, request.get_full_path(), route, seconds * 1000, stats.queries,
+                stats.db_seconds * 1000, stats.serializer_seconds * 1000, stats.render_seconds * 1000,
+                '\n'.join(f'  {elapsed * 1000:.1f} ms  {sql}' for elapsed, sql in slowest),
+            )
+
+
+def metrics_allowed(request):
+    """
+    С PETS_METRICS_TOKEN — только с токеном, без него — только с адресов
+    PETS_METRICS_ALLOWED_IPS (по умолчанию локальные). За прокси REMOTE_ADDR —
+    адрес прокси, поэтому для внешнего сборщика нужен токен.
+    """
+    token = getattr(settings, 'PETS_METRICS_TOKEN', None)
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'PETS_METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+
+
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus"""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
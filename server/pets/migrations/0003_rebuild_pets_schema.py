@@ -0,0 +1,325 @@
+# Generated by Django 5.2.4 on 2025-08-12 10:00
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+import pets.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Приводит схему 0001_initial (UUID-ключи, партнер как профиль пользователя,
+    другие поля записей и напоминаний) к моделям обычными операциями над
+    полями, без удаления таблиц. SQLite меняет тип ключа пересозданием
+    таблицы с копированием строк: строка с UUID-ключом останавливает
+    миграцию ошибкой, транзакция откатывается, данные остаются на месте.
+    """
+
+    dependencies = [
+        ('pets', '0002_auto_20250805_2025'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='partner',
+            options={'ordering': ['name'], 'verbose_name': 'Партнер', 'verbose_name_plural': 'Партнеры'},
+        ),
+        migrations.AlterModelOptions(
+            name='productorservice',
+            options={'ordering': ['name'], 'verbose_name': 'Товар/Услуга', 'verbose_name_plural': 'Товары/Услуги'},
+        ),
+        migrations.AlterModelOptions(
+            name='reminder',
+            options={'ordering': ['due_date'], 'verbose_name': 'Напоминание', 'verbose_name_plural': 'Напоминания'},
+        ),
+        migrations.RenameField(
+            model_name='productorservice',
+            old_name='title',
+            new_name='name',
+        ),
+        migrations.RemoveField(
+            model_name='medicalrecord',
+            name='attachments',
+        ),
+        migrations.RemoveField(
+            model_name='medicalrecord',
+            name='clinic',
+        ),
+        migrations.RemoveField(
+            model_name='medicalrecord',
+            name='prescription',
+        ),
+        migrations.RemoveField(
+            model_name='medicalrecord',
+            name='recommendations',
+        ),
+        migrations.RemoveField(
+            model_name='medicalrecord',
+            name='symptoms',
+        ),
+        migrations.RemoveField(
+            model_name='partner',
+            name='city',
+        ),
+        migrations.RemoveField(
+            model_name='partner',
+            name='logo',
+        ),
+        migrations.RemoveField(
+            model_name='partner',
+            name='org_name',
+        ),
+        migrations.RemoveField(
+            model_name='partner',
+            name='type',
+        ),
+        migrations.RemoveField(
+            model_name='partner',
+            name='user',
+        ),
+        migrations.RemoveField(
+            model_name='productorservice',
+            name='location',
+        ),
+        migrations.RemoveField(
+            model_name='productorservice',
+            name='phone',
+        ),
+        migrations.RemoveField(
+            model_name='productorservice',
+            name='type',
+        ),
+        migrations.RemoveField(
+            model_name='reminder',
+            name='date',
+        ),
+        migrations.RemoveField(
+            model_name='reminder',
+            name='status',
+        ),
+        migrations.AddField(
+            model_name='medicalrecord',
+            name='cost',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Стоимость'),
+        ),
+        migrations.AddField(
+            model_name='medicalrecord',
+            name='description',
+            field=models.TextField(default='', verbose_name='Описание'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='medicalrecord',
+            name='record_type',
+            field=models.CharField(choices=[('vaccination', 'Вакцинация'), ('examination', 'Осмотр'), ('treatment', 'Лечение'), ('surgery', 'Операция'), ('other', 'Другое')], default='other', max_length=20, verbose_name='Тип записи'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='medicalrecord',
+            name='title',
+            field=models.CharField(default='', max_length=200, verbose_name='Название'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='medicalrecord',
+            name='veterinarian',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Ветеринар'),
+        ),
+        migrations.AddField(
+            model_name='partner',
+            name='email',
+            field=models.EmailField(blank=True, max_length=254, verbose_name='Email'),
+        ),
+        migrations.AddField(
+            model_name='partner',
+            name='name',
+            field=models.CharField(default='', max_length=200, verbose_name='Название'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='partner',
+            name='partner_type',
+            field=models.CharField(choices=[('clinic', 'Ветеринарная клиника'), ('pharmacy', 'Аптека'), ('grooming', 'Груминг'), ('hotel', 'Гостиница для животных'), ('other', 'Другое')], default='other', max_length=20, verbose_name='Тип партнера'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='partner',
+            name='rating',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=3, null=True, verbose_name='Рейтинг'),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='image',
+            field=models.ImageField(blank=True, null=True, upload_to=pets.models.pet_image_path, verbose_name='Фото'),
+        ),
+        migrations.AddField(
+            model_name='productorservice',
+            name='is_available',
+            field=models.BooleanField(default=True, verbose_name='Доступно'),
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='description',
+            field=models.TextField(blank=True, verbose_name='Описание'),
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='due_date',
+            field=models.DateField(default=django.utils.timezone.now, verbose_name='Дата напоминания'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='is_completed',
+            field=models.BooleanField(default=False, verbose_name='Выполнено'),
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='reminder_type',
+            field=models.CharField(choices=[('vaccination', 'Вакцинация'), ('deworming', 'Дегельминтизация'), ('examination', 'Осмотр'), ('grooming', 'Груминг'), ('other', 'Другое')], default='other', max_length=20, verbose_name='Тип напоминания'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='medicalrecord',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата создания'),
+        ),
+        migrations.AlterField(
+            model_name='medicalrecord',
+            name='date',
+            field=models.DateField(verbose_name='Дата'),
+        ),
+        migrations.AlterField(
+            model_name='medicalrecord',
+            name='id',
+            field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='medicalrecord',
+            name='pet',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='medical_records', to='pets.pet', verbose_name='Питомец'),
+        ),
+        migrations.AlterField(
+            model_name='partner',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата создания'),
+        ),
+        migrations.AlterField(
+            model_name='partner',
+            name='id',
+            field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='partner',
+            name='phone',
+            field=models.CharField(blank=True, max_length=20, verbose_name='Телефон'),
+        ),
+        migrations.AlterField(
+            model_name='partner',
+            name='website',
+            field=models.URLField(blank=True, verbose_name='Веб-сайт'),
+        ),
+        migrations.AlterField(
+            model_name='pet',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата создания'),
+        ),
+        migrations.AlterField(
+            model_name='pet',
+            name='id',
+            field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='pet',
+            name='image_url',
+            field=models.URLField(blank=True, verbose_name='URL фото'),
+        ),
+        migrations.AlterField(
+            model_name='pet',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Владелец'),
+        ),
+        migrations.AlterField(
+            model_name='pet',
+            name='species',
+            field=models.CharField(choices=[('cat', 'Кот'), ('dog', 'Собака'), ('other', 'Другое')], default='cat', max_length=10, verbose_name='Вид'),
+        ),
+        migrations.AlterField(
+            model_name='pet',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата обновления'),
+        ),
+        migrations.AlterField(
+            model_name='productorservice',
+            name='category',
+            field=models.CharField(choices=[('food', 'Корм'), ('medicine', 'Лекарства'), ('accessories', 'Аксессуары'), ('toys', 'Игрушки'), ('care', 'Уход'), ('other', 'Другое')], max_length=20, verbose_name='Категория'),
+        ),
+        migrations.AlterField(
+            model_name='productorservice',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата создания'),
+        ),
+        migrations.AlterField(
+            model_name='productorservice',
+            name='id',
+            field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='productorservice',
+            name='image_url',
+            field=models.URLField(blank=True, verbose_name='URL изображения'),
+        ),
+        migrations.AlterField(
+            model_name='productorservice',
+            name='partner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='products', to='pets.partner', verbose_name='Партнер'),
+        ),
+        migrations.AlterField(
+            model_name='productorservice',
+            name='price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Цена'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='reminder',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата создания'),
+        ),
+        migrations.AlterField(
+            model_name='reminder',
+            name='id',
+            field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='reminder',
+            name='pet',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='pets.pet', verbose_name='Питомец'),
+        ),
+        migrations.AlterField(
+            model_name='reminder',
+            name='title',
+            field=models.CharField(max_length=200, verbose_name='Название'),
+        ),
+        migrations.CreateModel(
+            name='PetDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_type', models.CharField(choices=[('medical', 'Медицинский документ'), ('vaccination', 'Сертификат вакцинации'), ('pedigree', 'Родословная'), ('insurance', 'Страховка'), ('other', 'Другое')], max_length=20, verbose_name='Тип документа')),
+                ('title', models.CharField(max_length=200, verbose_name='Название')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+                ('file', models.FileField(upload_to=pets.models.document_upload_path, validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['pdf', 'doc', 'docx', 'txt', 'jpg', 'jpeg', 'png'])], verbose_name='Файл')),
+                ('file_size', models.IntegerField(blank=True, null=True, verbose_name='Размер файла (байт)')),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата загрузки')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Владелец')),
+                ('pet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='documents', to='pets.pet', verbose_name='Питомец')),
+            ],
+            options={
+                'verbose_name': 'Документ питомца',
+                'verbose_name_plural': 'Документы питомцев',
+                'ordering': ['-uploaded_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0003_rebuild_pets_schema'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['pet', '-date'], name='medrec_pet_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(fields=['owner', '-created_at'], name='pet_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='petdocument',
+            index=models.Index(fields=['owner', '-uploaded_at'], name='petdoc_owner_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(fields=['pet', 'due_date'], name='reminder_pet_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(fields=['pet', 'is_completed', 'due_date'], name='reminder_pet_done_due_idx'),
+        ),
+    ]
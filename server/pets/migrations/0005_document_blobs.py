@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:07
+
+import django.db.models.deletion
+import pets.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0004_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('file', models.FileField(max_length=255, upload_to=pets.models.blob_upload_path, verbose_name='Файл')),
+                ('size', models.BigIntegerField(verbose_name='Размер (байт)')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='Число ссылок')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+            ],
+            options={
+                'verbose_name': 'Файл документа',
+                'verbose_name_plural': 'Файлы документов',
+            },
+        ),
+        migrations.AddField(
+            model_name='petdocument',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='documents', to='pets.documentblob', verbose_name='Содержимое'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0005_document_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pet',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Уменьшенные копии фото'),
+        ),
+    ]
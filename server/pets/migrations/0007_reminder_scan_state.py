@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0006_pet_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderScanState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Обработчик')),
+                ('last_due_date', models.DateField(blank=True, null=True, verbose_name='Последняя дата')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='Последний ID')),
+                ('processed', models.BigIntegerField(default=0, verbose_name='Обработано напоминаний')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Состояние обработки напоминаний',
+                'verbose_name_plural': 'Состояния обработки напоминаний',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(fields=['due_date', 'id'], name='reminder_due_id_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0007_reminder_scan_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicalrecord',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Дата обновления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Дата обновления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='petdocument',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Дата обновления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='partner',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Дата обновления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='productorservice',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Дата обновления'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0008_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True, verbose_name='Источник')),
+                ('offset', models.BigIntegerField(default=0, verbose_name='Смещение (байт)')),
+                ('rows_imported', models.BigIntegerField(default=0, verbose_name='Импортировано строк')),
+                ('rows_skipped', models.BigIntegerField(default=0, verbose_name='Пропущено строк')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Контрольная точка импорта',
+                'verbose_name_plural': 'Контрольные точки импорта',
+            },
+        ),
+    ]
@@ -0,0 +1,118 @@
+from django.db import migrations
+
+
+# Полнотекстовый индекс FTS5 по медицинским записям и документам.
+# rowid = id * 2 для записей и id * 2 + 1 для документов: так триггеры
+# обновляют и удаляют строку индекса по первичному ключу, без просмотра.
+# Колонка owner хранит токен u<id> владельца: поиск пересекает списки
+# вхождений терминов со списком владельца внутри самого индекса.
+FORWARD_SQL = [
+    """
+    CREATE VIRTUAL TABLE pets_search USING fts5(
+        owner, pet, title, body, veterinarian,
+        kind UNINDEXED, object_id UNINDEXED, pet_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER pets_search_record_ai AFTER INSERT ON pets_medicalrecord BEGIN
+        INSERT INTO pets_search (rowid, owner, pet, title, body, veterinarian, kind, object_id, pet_id)
+        SELECT new.id * 2, 'u' || p.owner_id, p.name, new.title, new.description, new.veterinarian,
+               'record', new.id, new.pet_id
+        FROM pets_pet p WHERE p.id = new.pet_id;
+    END
+    """,
+    """
+    CREATE TRIGGER pets_search_record_au AFTER UPDATE OF title, description, veterinarian, pet_id
+    ON pets_medicalrecord BEGIN
+        DELETE FROM pets_search WHERE rowid = old.id * 2;
+        INSERT INTO pets_search (rowid, owner, pet, title, body, veterinarian, kind, object_id, pet_id)
+        SELECT new.id * 2, 'u' || p.owner_id, p.name, new.title, new.description, new.veterinarian,
+               'record', new.id, new.pet_id
+        FROM pets_pet p WHERE p.id = new.pet_id;
+    END
+    """,
+    """
+    CREATE TRIGGER pets_search_record_ad AFTER DELETE ON pets_medicalrecord BEGIN
+        DELETE FROM pets_search WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER pets_search_document_ai AFTER INSERT ON pets_petdocument BEGIN
+        INSERT INTO pets_search (rowid, owner, pet, title, body, veterinarian, kind, object_id, pet_id)
+        SELECT new.id * 2 + 1, 'u' || new.owner_id, p.name, new.title, new.description, '',
+               'document', new.id, new.pet_id
+        FROM pets_pet p WHERE p.id = new.pet_id;
+    END
+    """,
+    """
+    CREATE TRIGGER pets_search_document_au AFTER UPDATE OF title, description, owner_id, pet_id
+    ON pets_petdocument BEGIN
+        DELETE FROM pets_search WHERE rowid = old.id * 2 + 1;
+        INSERT INTO pets_search (rowid, owner, pet, title, body, veterinarian, kind, object_id, pet_id)
+        SELECT new.id * 2 + 1, 'u' || new.owner_id, p.name, new.title, new.description, '',
+               'document', new.id, new.pet_id
+        FROM pets_pet p WHERE p.id = new.pet_id;
+    END
+    """,
+    """
+    CREATE TRIGGER pets_search_document_ad AFTER DELETE ON pets_petdocument BEGIN
+        DELETE FROM pets_search WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+    # Кличка и владелец питомца денормализованы в индекс
+    """
+    CREATE TRIGGER pets_search_pet_au AFTER UPDATE OF name, owner_id ON pets_pet
+    WHEN old.name IS NOT new.name OR old.owner_id IS NOT new.owner_id BEGIN
+        UPDATE pets_search SET owner = 'u' || new.owner_id, pet = new.name
+        WHERE rowid IN (SELECT id * 2 FROM pets_medicalrecord WHERE pet_id = new.id);
+        UPDATE pets_search SET pet = new.name
+        WHERE rowid IN (SELECT id * 2 + 1 FROM pets_petdocument WHERE pet_id = new.id);
+    END
+    """,
+    """
+    INSERT INTO pets_search (rowid, owner, pet, title, body, veterinarian, kind, object_id, pet_id)
+    SELECT r.id * 2, 'u' || p.owner_id, p.name, r.title, r.description, r.veterinarian,
+           'record', r.id, r.pet_id
+    FROM pets_medicalrecord r JOIN pets_pet p ON p.id = r.pet_id
+    """,
+    """
+    INSERT INTO pets_search (rowid, owner, pet, title, body, veterinarian, kind, object_id, pet_id)
+    SELECT d.id * 2 + 1, 'u' || d.owner_id, p.name, d.title, d.description, '',
+           'document', d.id, d.pet_id
+    FROM pets_petdocument d JOIN pets_pet p ON p.id = d.pet_id
+    """,
+]
+
+REVERSE_SQL = [
+    'DROP TRIGGER IF EXISTS pets_search_pet_au',
+    'DROP TRIGGER IF EXISTS pets_search_document_ad',
+    'DROP TRIGGER IF EXISTS pets_search_document_au',
+    'DROP TRIGGER IF EXISTS pets_search_document_ai',
+    'DROP TRIGGER IF EXISTS pets_search_record_ad',
+    'DROP TRIGGER IF EXISTS pets_search_record_au',
+    'DROP TRIGGER IF EXISTS pets_search_record_ai',
+    'DROP TABLE IF EXISTS pets_search',
+]
+
+
+def run_sql(statements):
+    def operation(apps, schema_editor):
+        # FTS5 есть только в SQLite; на других СУБД поиск работает через ORM
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0009_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(FORWARD_SQL), run_sql(REVERSE_SQL)),
+    ]
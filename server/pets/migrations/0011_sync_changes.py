@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    """Существующие объекты попадают в журнал, чтобы первая синхронизация их отдала"""
+    SyncChange = apps.get_model('pets', 'SyncChange')
+    sources = [
+        ('pet', apps.get_model('pets', 'Pet').objects.values_list('id', 'id', 'owner_id')),
+        ('record', apps.get_model('pets', 'MedicalRecord').objects.values_list('id', 'pet_id', 'pet__owner_id')),
+        ('reminder', apps.get_model('pets', 'Reminder').objects.values_list('id', 'pet_id', 'pet__owner_id')),
+        ('document', apps.get_model('pets', 'PetDocument').objects.values_list('id', 'pet_id', 'owner_id')),
+    ]
+    for kind, rows in sources:
+        SyncChange.objects.bulk_create(
+            (SyncChange(kind=kind, object_id=object_id, pet_id=pet_id, owner_id=owner_id)
+             for object_id, pet_id, owner_id in rows.iterator(chunk_size=2000)),
+            batch_size=2000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0010_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('pet', 'Питомец'), ('record', 'Медицинская запись'), ('reminder', 'Напоминание'), ('document', 'Документ')], max_length=10, verbose_name='Тип объекта')),
+                ('object_id', models.BigIntegerField(verbose_name='ID объекта')),
+                ('pet_id', models.BigIntegerField(verbose_name='ID питомца')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Удален')),
+                ('changed_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Владелец')),
+            ],
+            options={
+                'verbose_name': 'Изменение для синхронизации',
+                'verbose_name_plural': 'Изменения для синхронизации',
+                'indexes': [models.Index(fields=['owner', 'id'], name='syncchange_owner_seq_idx'), models.Index(fields=['pet_id'], name='syncchange_pet_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='syncchange_kind_object_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
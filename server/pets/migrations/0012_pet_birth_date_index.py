@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0011_sync_changes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(fields=['owner', 'birth_date'], name='pet_owner_birth_idx'),
+        ),
+    ]
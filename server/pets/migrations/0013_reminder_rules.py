@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0012_pet_birth_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reminder_type', models.CharField(choices=[('vaccination', 'Вакцинация'), ('deworming', 'Дегельминтизация'), ('examination', 'Осмотр'), ('grooming', 'Груминг'), ('other', 'Другое')], max_length=20, verbose_name='Тип напоминания')),
+                ('title', models.CharField(max_length=200, verbose_name='Название')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+                ('start_date', models.DateField(verbose_name='Первая дата')),
+                ('interval', models.PositiveIntegerField(default=1, verbose_name='Интервал')),
+                ('unit', models.CharField(choices=[('day', 'Дни'), ('month', 'Месяцы'), ('year', 'Годы')], max_length=10, verbose_name='Единица интервала')),
+                ('end_date', models.DateField(blank=True, null=True, verbose_name='Последняя дата')),
+                ('materialized_until', models.DateField(blank=True, null=True, verbose_name='Напоминания созданы до')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('pet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminder_rules', to='pets.pet', verbose_name='Питомец')),
+            ],
+            options={
+                'verbose_name': 'Правило повторения',
+                'verbose_name_plural': 'Правила повторения',
+                'ordering': ['start_date', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='rule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrences', to='pets.reminderrule', verbose_name='Правило повторения'),
+        ),
+        migrations.AddConstraint(
+            model_name='reminder',
+            constraint=models.UniqueConstraint(fields=('rule', 'due_date'), name='reminder_rule_due_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='reminderrule',
+            index=models.Index(fields=['materialized_until'], name='reminder_rule_window_idx'),
+        ),
+    ]
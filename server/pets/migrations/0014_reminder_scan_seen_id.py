@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:03
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def mark_existing_as_seen(apps, schema_editor):
+    """Прежние обработчики уже видели все существующие строки: не рассылать их повторно"""
+    ceiling = apps.get_model('pets', 'Reminder').objects.aggregate(ceiling=Max('id'))['ceiling'] or 0
+    apps.get_model('pets', 'ReminderScanState').objects.exclude(last_due_date=None).update(last_seen_id=ceiling)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0013_reminder_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reminderscanstate',
+            name='last_seen_id',
+            field=models.BigIntegerField(default=0, verbose_name='Наибольший просмотренный ID'),
+        ),
+        migrations.RunPython(mark_existing_as_seen, migrations.RunPython.noop),
+    ]
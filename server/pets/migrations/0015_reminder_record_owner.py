@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:40
+
+from importlib import import_module
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+# SQLite меняет NOT NULL пересозданием таблицы: триггеры поискового индекса
+# на pets_medicalrecord пропали бы, а триггер питомца не дал бы ее переименовать
+SEARCH_TRIGGERS = [
+    statement for statement in import_module('pets.migrations.0010_search_index').FORWARD_SQL
+    if 'CREATE TRIGGER pets_search_record' in statement or 'CREATE TRIGGER pets_search_pet' in statement
+]
+DROP_SEARCH_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS pets_search_pet_au',
+    'DROP TRIGGER IF EXISTS pets_search_record_ad',
+    'DROP TRIGGER IF EXISTS pets_search_record_au',
+    'DROP TRIGGER IF EXISTS pets_search_record_ai',
+]
+
+
+def run_sql(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+def copy_pet_owner(apps, schema_editor):
+    """Заполняет копию владельца у существующих строк одним UPDATE на таблицу"""
+    Pet = apps.get_model('pets', 'Pet')
+    owner = Subquery(Pet.objects.filter(pk=OuterRef('pet_id')).values('owner_id')[:1])
+    for name in ('MedicalRecord', 'Reminder'):
+        apps.get_model('pets', name).objects.update(owner_id=owner)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0014_reminder_scan_seen_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicalrecord',
+            name='owner',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Владелец'),
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='owner',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Владелец'),
+        ),
+        migrations.RunPython(copy_pet_owner, migrations.RunPython.noop),
+        migrations.RunPython(run_sql(DROP_SEARCH_TRIGGERS), run_sql(SEARCH_TRIGGERS)),
+        migrations.AlterField(
+            model_name='medicalrecord',
+            name='owner',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Владелец'),
+        ),
+        migrations.AlterField(
+            model_name='reminder',
+            name='owner',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Владелец'),
+        ),
+        migrations.RunPython(run_sql(SEARCH_TRIGGERS), run_sql(DROP_SEARCH_TRIGGERS)),
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['owner', '-date', '-id'], name='medrec_owner_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(fields=['owner', 'due_date', 'id'], name='reminder_owner_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(fields=['owner', 'is_completed', 'due_date'], name='reminder_owner_done_due_idx'),
+        ),
+    ]
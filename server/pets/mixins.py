@@ -0,0 +1,148 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .cache import bump_data_version, bump_now_and_on_commit
+from .models import Pet
+from .sync import record_changes
+
+
+class RelatedQuerySetMixin:
+    """
+    Формирует queryset под нужды сериализатора: вьюсет объявляет связанные
+    данные, которые читает его сериализатор (например, `pet_name` через
+    `pet.name`), а миксин добавляет select_related/prefetch_related.
+
+    Применяется в filter_queryset, который DRF вызывает и для list, и для
+    get_object, поэтому число запросов не зависит от размера страницы.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return self.shape_queryset(queryset)
+
+    def shape_queryset(self, queryset):
+        if self.select_related_fields:
+            queryset = queryset.select_related(*self.select_related_fields)
+        if self.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*self.prefetch_related_fields)
+        return queryset
+
+
+class BulkWriteMixin:
+    """
+    Массовое создание (POST) и обновление (PATCH) записей питомцев списком.
+
+    Все элементы проверяются за один проход, принадлежность питомцев
+    пользователю — одним запросом с IN. Запись идет через bulk_create /
+    bulk_update порциями в одной транзакции: либо сохраняется весь список,
+    либо возвращаются ошибки по каждому элементу.
+    """
+    bulk_batch_size = 500
+    bulk_max_items = 1000
+
+    @action(detail=False, methods=['post', 'patch'], url_path='bulk')
+    def bulk(self, request):
+        if request.method == 'PATCH':
+            return self.perform_bulk_update(request)
+        return self.perform_bulk_create(request)
+
+    def bulk_items(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError({'non_field_errors': ['Expected a non-empty list of items.']})
+        if len(items) > self.bulk_max_items:
+            raise ValidationError({'non_field_errors': [f'No more than {self.bulk_max_items} items per request.']})
+        if not all(isinstance(item, dict) for item in items):
+            raise ValidationError({'non_field_errors': ['Every item must be an object.']})
+        return items
+
+    def owned_pets(self, items):
+        pet_ids = set()
+        for item in items:
+            try:
+                pet_ids.add(int(item['pet']))
+            except (KeyError, TypeError, ValueError):
+                pass
+        pets = Pet.objects.filter(owner=self.request.user, id__in=pet_ids)
+        return {pet.id: pet for pet in pets}
+
+    def bulk_serializer_context(self, pets):
+        context = self.get_serializer_context()
+        context['pets'] = pets
+        return context
+
+    def validate_bulk(self, serializers_):
+        errors = [serializer.errors if not serializer.is_valid() else {} for serializer in serializers_]
+        if any(errors):
+            raise ValidationError({'errors': errors})
+
+    def perform_bulk_create(self, request):
+        items = self.bulk_items(request)
+        context = self.bulk_serializer_context(self.owned_pets(items))
+        serializer_class = self.get_serializer_class()
+        serializers_ = [serializer_class(data=item, context=context) for item in items]
+        self.validate_bulk(serializers_)
+
+        model = serializer_class.Meta.model
+        objects = [model(**serializer.validated_data) for serializer in serializers_]
+        with transaction.atomic():
+            model.objects.bulk_create(objects, batch_size=self.bulk_batch_size)
+            # bulk_create не отправляет post_save
+            record_changes(self.request.user.pk, objects, created=True)
+        bump_now_and_on_commit(bump_data_version, self.request.user.pk)
+        return Response(
+            serializer_class(objects, many=True, context=context).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    def perform_bulk_update(self, request):
+        items = self.bulk_items(request)
+        ids = []
+        for index, item in enumerate(items):
+            try:
+                ids.append(int(item['id']))
+            except (KeyError, TypeError, ValueError):
+                raise ValidationError({'errors': [
+                    {'id': ['A valid id is required.']} if i == index else {} for i in range(len(items))
+                ]})
+        if len(set(ids)) != len(ids):
+            raise ValidationError({'non_field_errors': ['Each id may appear only once.']})
+        instances = self.get_queryset().select_related('pet').in_bulk(ids)
+        context = self.bulk_serializer_context(self.owned_pets(items))
+        serializer_class = self.get_serializer_class()
+
+        errors, serializers_ = [], []
+        for item, pk in zip(items, ids):
+            instance = instances.get(pk)
+            if instance is None:
+                errors.append({'id': ['Not found.']})
+                serializers_.append(None)
+                continue
+            serializer = serializer_class(instance, data=item, partial=True, context=context)
+            errors.append({} if serializer.is_valid() else serializer.errors)
+            serializers_.append(serializer)
+        if any(errors):
+            raise ValidationError({'errors': errors})
+
+        now = timezone.now()
+        fields = {'updated_at'}
+        objects = []
+        for serializer in serializers_:
+            instance = serializer.instance
+            for name, value in serializer.validated_data.items():
+                setattr(instance, name, value)
+                fields.add(name)
+            instance.updated_at = now
+            objects.append(instance)
+        model = serializer_class.Meta.model
+        with transaction.atomic():
+            model.objects.bulk_update(objects, sorted(fields), batch_size=self.bulk_batch_size)
+            record_changes(self.request.user.pk, objects)
+        bump_now_and_on_commit(bump_data_version, self.request.user.pk)
+        return Response(serializer_class(objects, many=True, context=context).data)
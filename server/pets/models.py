@@ -12,6 +12,11 @@ def document_upload_path(instance, filename):
     """Генерирует путь для сохранения документов"""
     return f'documents/{instance.owner.id}/{instance.pet.id}/{filename}'
 
+def blob_upload_path(instance, filename):
+    """Путь файла в хранилище по содержимому: blobs/ab/cd/<sha256><ext>"""
+    ext = os.path.splitext(filename)[1].lower()
+    return f'blobs/{instance.sha256[:2]}/{instance.sha256[2:4]}/{instance.sha256}{ext}'
+
 class Pet(models.Model):
     SPECIES_CHOICES = [
         ('cat', 'Кот'),
@@ -27,6 +32,7 @@ class Pet(models.Model):
     notes = models.TextField(blank=True, verbose_name='Особые пометки')
     image = models.ImageField(upload_to=pet_image_path, null=True, blank=True, verbose_name='Фото')
     image_url = models.URLField(blank=True, verbose_name='URL фото')
+    image_variants = models.JSONField(default=dict, blank=True, verbose_name='Уменьшенные копии фото')
     owner = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Владелец')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
@@ -35,18 +41,96 @@ class Pet(models.Model):
         verbose_name = 'Питомец'
         verbose_name_plural = 'Питомцы'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', '-created_at'], name='pet_owner_created_idx'),
+            models.Index(fields=['owner', 'birth_date'], name='pet_owner_birth_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.get_species_display()})"
 
     def delete(self, *args, **kwargs):
-        # Удаляем изображение при удалении питомца
+        # Удаляем изображение и его уменьшенные копии при удалении питомца
         if self.image:
             if os.path.isfile(self.image.path):
                 os.remove(self.image.path)
+        if self.image_variants:
+            from .thumbnails import delete_variants
+            delete_variants(self.image_variants)
         super().delete(*args, **kwargs)
 
-class MedicalRecord(models.Model):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_owner_id = instance.__dict__.get('owner_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Владелец записей, напоминаний и документов хранится у них копией
+        loaded_owner_id = getattr(self, '_loaded_owner_id', None)
+        if loaded_owner_id is not None and loaded_owner_id != self.owner_id:
+            for model in (MedicalRecord, Reminder, PetDocument):
+                model.objects.filter(pet=self).update(owner_id=self.owner_id)
+        self._loaded_owner_id = self.owner_id
+
+
+def fill_owner(objects):
+    """
+    Копирует owner_id питомца в объекты MedicalRecord/Reminder: из уже
+    загруженного pet, для объектов без владельца — одним запросом к питомцам.
+    """
+    missing = []
+    for obj in objects:
+        if type(obj).pet.is_cached(obj):
+            obj.owner_id = obj.pet.owner_id
+        elif obj.owner_id is None:
+            missing.append(obj)
+    if missing:
+        owners = dict(Pet.objects.filter(pk__in={obj.pet_id for obj in missing}).values_list('id', 'owner_id'))
+        for obj in missing:
+            obj.owner_id = owners.get(obj.pet_id)
+
+
+class PetOwnedQuerySet(models.QuerySet):
+    """bulk_create/bulk_update сами проставляют копию владельца питомца"""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        fill_owner(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs, fields = list(objs), list(fields)
+        if 'pet' in fields or 'pet_id' in fields:
+            fill_owner(objs)
+            if 'owner' not in fields:
+                fields.append('owner')
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
+class PetOwnedModel(models.Model):
+    """
+    Копия владельца питомца: списки фильтруются по владельцу, и составные
+    индексы (owner, ...) обслуживают их без соединения с таблицей питомцев.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, editable=False, verbose_name='Владелец')
+
+    objects = PetOwnedQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'pet', 'pet_id'} & set(update_fields):
+            if type(self).pet.is_cached(self) or self.owner_id is None:
+                self.owner_id = self.pet.owner_id
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'owner'}
+        super().save(*args, **kwargs)
+
+class MedicalRecord(PetOwnedModel):
     RECORD_TYPES = [
         ('vaccination', 'Вакцинация'),
         ('examination', 'Осмотр'),
@@ -63,16 +147,21 @@ class MedicalRecord(models.Model):
     veterinarian = models.CharField(max_length=100, blank=True, verbose_name='Ветеринар')
     cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name='Стоимость')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
 
     class Meta:
         verbose_name = 'Медицинская запись'
         verbose_name_plural = 'Медицинские записи'
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['pet', '-date'], name='medrec_pet_date_idx'),
+            models.Index(fields=['owner', '-date', '-id'], name='medrec_owner_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.pet.name} - {self.title} ({self.date})"
 
-class Reminder(models.Model):
+class Reminder(PetOwnedModel):
     REMINDER_TYPES = [
         ('vaccination', 'Вакцинация'),
         ('deworming', 'Дегельминтизация'),
@@ -87,16 +176,145 @@ class Reminder(models.Model):
     description = models.TextField(blank=True, verbose_name='Описание')
     due_date = models.DateField(verbose_name='Дата напоминания')
     is_completed = models.BooleanField(default=False, verbose_name='Выполнено')
+    rule = models.ForeignKey(
+        'ReminderRule', on_delete=models.SET_NULL, null=True, blank=True, related_name='occurrences',
+        verbose_name='Правило повторения',
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
 
     class Meta:
         verbose_name = 'Напоминание'
         verbose_name_plural = 'Напоминания'
         ordering = ['due_date']
+        indexes = [
+            models.Index(fields=['pet', 'due_date'], name='reminder_pet_due_idx'),
+            models.Index(fields=['pet', 'is_completed', 'due_date'], name='reminder_pet_done_due_idx'),
+            models.Index(fields=['due_date', 'id'], name='reminder_due_id_idx'),
+            models.Index(fields=['owner', 'due_date', 'id'], name='reminder_owner_due_idx'),
+            models.Index(fields=['owner', 'is_completed', 'due_date'], name='reminder_owner_done_due_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['rule', 'due_date'], name='reminder_rule_due_uniq'),
+        ]
 
     def __str__(self):
         return f"{self.pet.name} - {self.title} ({self.due_date})"
 
+class ReminderRule(models.Model):
+    """
+    Повторяющееся напоминание: хранится правило, а строки Reminder создаются
+    только на скользящее окно вперед (pets.reminders.materialize_rules).
+    """
+    UNITS = [
+        ('day', 'Дни'),
+        ('month', 'Месяцы'),
+        ('year', 'Годы'),
+    ]
+
+    pet = models.ForeignKey(Pet, on_delete=models.CASCADE, related_name='reminder_rules', verbose_name='Питомец')
+    reminder_type = models.CharField(max_length=20, choices=Reminder.REMINDER_TYPES, verbose_name='Тип напоминания')
+    title = models.CharField(max_length=200, verbose_name='Название')
+    description = models.TextField(blank=True, verbose_name='Описание')
+    start_date = models.DateField(verbose_name='Первая дата')
+    interval = models.PositiveIntegerField(default=1, verbose_name='Интервал')
+    unit = models.CharField(max_length=10, choices=UNITS, verbose_name='Единица интервала')
+    end_date = models.DateField(null=True, blank=True, verbose_name='Последняя дата')
+    materialized_until = models.DateField(null=True, blank=True, verbose_name='Напоминания созданы до')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+
+    class Meta:
+        verbose_name = 'Правило повторения'
+        verbose_name_plural = 'Правила повторения'
+        ordering = ['start_date', 'id']
+        indexes = [
+            models.Index(fields=['materialized_until'], name='reminder_rule_window_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.pet.name} - {self.title} (каждые {self.interval} {self.get_unit_display().lower()})"
+
+class DocumentBlob(models.Model):
+    """Содержимое файла, общее для всех документов с одинаковыми байтами"""
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name='SHA-256')
+    file = models.FileField(upload_to=blob_upload_path, max_length=255, verbose_name='Файл')
+    size = models.BigIntegerField(verbose_name='Размер (байт)')
+    ref_count = models.PositiveIntegerField(default=0, verbose_name='Число ссылок')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+
+    class Meta:
+        verbose_name = 'Файл документа'
+        verbose_name_plural = 'Файлы документов'
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count})"
+
+class ReminderScanState(models.Model):
+    """Отметка, до которой обработчик напоминаний уже просканировал таблицу"""
+    name = models.CharField(max_length=50, unique=True, verbose_name='Обработчик')
+    last_due_date = models.DateField(null=True, blank=True, verbose_name='Последняя дата')
+    last_id = models.BigIntegerField(default=0, verbose_name='Последний ID')
+    last_seen_id = models.BigIntegerField(default=0, verbose_name='Наибольший просмотренный ID')
+    processed = models.BigIntegerField(default=0, verbose_name='Обработано напоминаний')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+
+    class Meta:
+        verbose_name = 'Состояние обработки напоминаний'
+        verbose_name_plural = 'Состояния обработки напоминаний'
+
+    def __str__(self):
+        return f"{self.name}: {self.last_due_date} #{self.last_id}"
+
+class ImportCheckpoint(models.Model):
+    """Позиция в файле импорта, до которой данные уже зафиксированы в базе"""
+    source = models.CharField(max_length=255, unique=True, verbose_name='Источник')
+    offset = models.BigIntegerField(default=0, verbose_name='Смещение (байт)')
+    rows_imported = models.BigIntegerField(default=0, verbose_name='Импортировано строк')
+    rows_skipped = models.BigIntegerField(default=0, verbose_name='Пропущено строк')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+
+    class Meta:
+        verbose_name = 'Контрольная точка импорта'
+        verbose_name_plural = 'Контрольные точки импорта'
+
+    def __str__(self):
+        return f"{self.source} @ {self.offset}"
+
+class SyncChange(models.Model):
+    """
+    Последнее изменение объекта для дельта-синхронизации. На объект хранится
+    одна строка: при каждом изменении она пересоздается с новым id, поэтому
+    id служит порядковым номером изменения. deleted — признак удаления.
+    """
+    KINDS = [
+        ('pet', 'Питомец'),
+        ('record', 'Медицинская запись'),
+        ('reminder', 'Напоминание'),
+        ('document', 'Документ'),
+    ]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Владелец')
+    kind = models.CharField(max_length=10, choices=KINDS, verbose_name='Тип объекта')
+    object_id = models.BigIntegerField(verbose_name='ID объекта')
+    pet_id = models.BigIntegerField(verbose_name='ID питомца')
+    deleted = models.BooleanField(default=False, verbose_name='Удален')
+    changed_at = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
+
+    class Meta:
+        verbose_name = 'Изменение для синхронизации'
+        verbose_name_plural = 'Изменения для синхронизации'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='syncchange_kind_object_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', 'id'], name='syncchange_owner_seq_idx'),
+            models.Index(fields=['pet_id'], name='syncchange_pet_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} ({'удален' if self.deleted else 'изменен'})"
+
 class PetDocument(models.Model):
     DOCUMENT_TYPES = [
         ('medical', 'Медицинский документ'),
@@ -117,12 +335,17 @@ class PetDocument(models.Model):
         verbose_name='Файл'
     )
     file_size = models.IntegerField(null=True, blank=True, verbose_name='Размер файла (байт)')
+    blob = models.ForeignKey(DocumentBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='documents', verbose_name='Содержимое')
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата загрузки')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
 
     class Meta:
         verbose_name = 'Документ питомца'
         verbose_name_plural = 'Документы питомцев'
         ordering = ['-uploaded_at']
+        indexes = [
+            models.Index(fields=['owner', '-uploaded_at'], name='petdoc_owner_uploaded_idx'),
+        ]
 
     def __str__(self):
         return f"{self.pet.name} - {self.title}"
@@ -133,8 +356,8 @@ class PetDocument(models.Model):
         super().save(*args, **kwargs)
 
     def delete(self, *args, **kwargs):
-        # Удаляем файл при удалении записи
-        if self.file:
+        # Удаляем файл при удалении записи; общие файлы освобождает сигнал post_delete
+        if self.file and self.blob_id is None:
             if os.path.isfile(self.file.path):
                 os.remove(self.file.path)
         super().delete(*args, **kwargs)
@@ -157,6 +380,7 @@ class Partner(models.Model):
     description = models.TextField(blank=True, verbose_name='Описание')
     rating = models.DecimalField(max_digits=3, decimal_places=1, null=True, blank=True, verbose_name='Рейтинг')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
 
     class Meta:
         verbose_name = 'Партнер'
@@ -184,6 +408,7 @@ class ProductOrService(models.Model):
     image_url = models.URLField(blank=True, verbose_name='URL изображения')
     is_available = models.BooleanField(default=True, verbose_name='Доступно')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
 
     class Meta:
         verbose_name = 'Товар/Услуга'
@@ -0,0 +1,181 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Постраничный вывод по ключу (keyset/seek): вместо OFFSET и COUNT(*)
+    следующая страница выбирается условием по ключу сортировки модели
+    (Meta.ordering) с дополнительным ключом `id`. Стоимость запроса не зависит
+    от глубины страницы.
+
+    Курсор непрозрачен для клиента: это base64 от значений ключа последней
+    (или первой, для предыдущей страницы) записи и направления.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.page_size = api_settings.PAGE_SIZE or 20
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset, view)
+        self.fields = [self._get_field(queryset.model, name) for name, _ in self.ordering]
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor['r'] if cursor else False
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [(name, not desc) for name, desc in ordering]
+        queryset = queryset.order_by(*[('-' if desc else '') + name for name, desc in ordering])
+        if cursor:
+            queryset = queryset.filter(self._seek_filter(ordering, cursor['v']))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        if reverse:
+            self.has_next = cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                value = int(request.query_params[self.page_size_query_param])
+                if value > 0:
+                    return min(value, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_ordering(self, queryset, view):
+        """
+        Возвращает список пар (поле, по убыванию). Берется `ordering` вьюсета
+        или Meta.ordering модели; `id` всегда добавляется последним ключом,
+        чтобы записи с одинаковой датой не терялись и не дублировались.
+        """
+        ordering = getattr(view, 'ordering', None) or queryset.model._meta.ordering or []
+        if isinstance(ordering, str):
+            ordering = [ordering]
+        result = []
+        for item in ordering:
+            desc = item.startswith('-')
+            result.append((item.lstrip('-'), desc))
+        names = {name for name, _ in result}
+        if 'id' not in names and 'pk' not in names:
+            tie_desc = result[-1][1] if result else False
+            result.append(('id', tie_desc))
+        return result
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._build_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._build_link(self.page[0], reverse=True)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            cursor = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            if not isinstance(cursor.get('v'), list) or len(cursor['v']) != len(self.ordering):
+                raise ValueError
+            cursor['r'] = bool(cursor.get('r'))
+            return cursor
+        except (TypeError, ValueError, UnicodeError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, values, reverse):
+        payload = json.dumps({'v': values, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def _build_link(self, instance, reverse):
+        values = [field.value_to_string(instance) for field in self.fields]
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(values, reverse))
+
+    def _get_field(self, model, name):
+        if name == 'pk':
+            return model._meta.pk
+        return model._meta.get_field(name)
+
+    def _seek_filter(self, ordering, values):
+        """
+        Строит условие «строго после курсора» для составного ключа:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        equal = {}
+        for (name, desc), value in zip(ordering, values):
+            lookup = 'lt' if desc else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+
+class PaginationModeMixin:
+    """
+    Позволяет клиенту выбрать режим пагинации параметром `?pagination=cursor`.
+    Вьюсет может также задать `pagination_class = KeysetPagination` напрямую.
+    """
+    pagination_mode_query_param = 'pagination'
+    keyset_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            mode = self.request.query_params.get(self.pagination_mode_query_param) if self.request else None
+            if mode == 'cursor':
+                self._paginator = self.keyset_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
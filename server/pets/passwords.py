@@ -0,0 +1,98 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from rest_framework.exceptions import Throttled
+
+
+class HashPoolBusy(Throttled):
+    default_detail = 'Too many concurrent sign-in attempts, try again shortly.'
+
+    def __init__(self):
+        super().__init__(wait=1)
+
+
+def pool_config():
+    return (
+        getattr(settings, 'AUTH_HASH_WORKERS', 4),
+        getattr(settings, 'AUTH_HASH_QUEUE', 16),
+    )
+
+
+def hash_timeout():
+    return getattr(settings, 'AUTH_HASH_TIMEOUT', 5)
+
+
+class HashPool:
+    """
+    Ограниченный пул для хэширования паролей (PBKDF2 — десятки мс CPU).
+    Одновременно считается не больше AUTH_HASH_WORKERS хэшей и ждет не
+    больше AUTH_HASH_QUEUE; сверх этого запрос сразу получает 429, а не
+    занимает воркер в очереди. Остальные запросы API пулом не затрагиваются.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.config = None
+        self.executor = None
+        self.slots = None
+
+    def start(self):
+        config = pool_config()
+        with self.lock:
+            if config != self.config:
+                if self.executor is not None:
+                    self.executor.shutdown(wait=False)
+                workers, queue = config
+                self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pets-hash')
+                self.slots = threading.BoundedSemaphore(workers + queue)
+                self.config = config
+            return self.executor, self.slots
+
+    def run(self, fn, *args):
+        executor, slots = self.start()
+        if not slots.acquire(blocking=False):
+            raise HashPoolBusy()
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=hash_timeout())
+        except TimeoutError:
+            raise HashPoolBusy()
+
+
+hash_pool = HashPool()
+
+
+def hash_password(password):
+    return hash_pool.run(make_password, password)
+
+
+def check_credentials(username, password):
+    """
+    Проверка логина и пароля как в ModelBackend, но хэш считается в пуле.
+    Запросы к базе остаются в потоке запроса.
+    """
+    UserModel = get_user_model()
+    try:
+        user = UserModel._default_manager.get_by_natural_key(username)
+    except UserModel.DoesNotExist:
+        # Хэшируем и для несуществующего пользователя: время ответа не выдает логин
+        hash_password(password)
+        return None
+    if not hash_pool.run(check_password, password, user.password):
+        return None
+    if getattr(user, 'is_active', True) is False:
+        return None
+    hasher = identify_hasher(user.password)
+    if hasher.algorithm != get_hasher().algorithm or hasher.must_update(user.password):
+        # Пароль с устаревшими параметрами перехэшируется, как в User.check_password
+        user.password = hash_password(password)
+        user.save(update_fields=['password'])
+    return user
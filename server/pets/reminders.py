@@ -0,0 +1,405 @@
+import calendar
+import json
+import logging
+import sys
+from collections import namedtuple
+from datetime import date, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.utils.module_loading import import_string
+
+from .cache import bump_data_version, bump_now_and_on_commit, get_cache
+from .models import Reminder, ReminderRule, ReminderScanState
+from .signals import collect_deletions
+from .sync import record_changes
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SENDER = 'pets.reminders.ConsoleSender'
+WINDOW_KEY = 'pets:reminder-window:{user_id}:{day}'
+
+Digest = namedtuple('Digest', ['owner_id', 'username', 'email', 'items'])
+
+SCAN_FIELDS = (
+    'id', 'due_date', 'title', 'reminder_type', 'pet_id', 'pet__name',
+    'owner_id', 'owner__username', 'owner__email',
+)
+
+
+class ConsoleSender:
+    """Печатает дайджесты в консоль, удобно для локальной проверки"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send(self, digests):
+        for digest in digests:
+            self.stream.write(f'{digest.username} <{digest.email}>: {len(digest.items)} напоминаний\n')
+            for item in digest.items:
+                self.stream.write(f'  {item["due_date"]}  {item["pet"]}: {item["title"]}\n')
+
+
+class FileSender:
+    """Дописывает дайджесты в файл построчно в формате JSON"""
+
+    def __init__(self, path=None):
+        self.path = path or getattr(settings, 'REMINDER_OUTBOX_PATH', 'reminder_outbox.jsonl')
+
+    def send(self, digests):
+        with open(self.path, 'a', encoding='utf-8') as outbox:
+            for digest in digests:
+                outbox.write(json.dumps(digest._asdict(), ensure_ascii=False, default=str) + '\n')
+
+
+class EmailSender:
+    """Отправляет по одному письму на владельца"""
+
+    def send(self, digests):
+        for digest in digests:
+            if not digest.email:
+                continue
+            lines = [f'{item["due_date"]}  {item["pet"]}: {item["title"]}' for item in digest.items]
+            send_mail(
+                subject=f'VetCard: напоминаний — {len(digest.items)}',
+                message='\n'.join(lines),
+                from_email=None,
+                recipient_list=[digest.email],
+                fail_silently=False,
+            )
+
+
+def get_sender(path=None):
+    return import_string(path or getattr(settings, 'REMINDER_SENDER', DEFAULT_SENDER))()
+
+
+class ReminderScanner:
+    """
+    Находит невыполненные напоминания, срок которых наступает в пределах
+    горизонта, и отправляет владельцам по одному дайджесту.
+
+    Таблица читается порциями в порядке (due_date, id) по индексу, начиная
+    с сохраненной отметки, поэтому уже обработанные строки не перечитываются.
+    Вторая отметка — last_seen_id, наибольший id на момент прошлого прохода:
+    строки, вставленные позже со сроком позади отметки (напоминание на
+    сегодня, созданное после прохода до завтра), читаются отдельно по id.
+    Срок, перенесенный правкой назад за отметку, повторно не сканируется.
+    Отметки сдвигаются только после отправки дайджестов (at-least-once).
+    Сроки старше lookback_days не рассылаются: первый проход не отправляет
+    всю историю просроченных напоминаний.
+    """
+
+    def __init__(self, sender, name='default', horizon_days=1, lookback_days=7, chunk_size=1000,
+                 flush_size=10000, today=None):
+        self.sender = sender
+        self.name = name
+        self.horizon_days = horizon_days
+        self.lookback_days = lookback_days
+        self.chunk_size = chunk_size
+        self.flush_size = flush_size
+        self.today = today or date.today()
+
+    def get_state(self):
+        state, _ = ReminderScanState.objects.get_or_create(name=self.name)
+        return state
+
+    def reset(self):
+        ReminderScanState.objects.filter(name=self.name).delete()
+
+    def pending(self, since, ceiling):
+        return Reminder.objects.filter(is_completed=False, due_date__gte=since, id__lte=ceiling)
+
+    def next_chunk(self, last_due_date, last_id, since, until, ceiling):
+        queryset = self.pending(since, ceiling).filter(due_date__lte=until)
+        if last_due_date is not None:
+            queryset = queryset.filter(
+                Q(due_date__gt=last_due_date) | Q(due_date=last_due_date, id__gt=last_id)
+            )
+        return list(queryset.order_by('due_date', 'id').values(*SCAN_FIELDS)[:self.chunk_size])
+
+    def late_chunk(self, state, after_id, since, ceiling):
+        """Вставленные после прошлого прохода строки, срок которых не дальше отметки"""
+        queryset = self.pending(since, ceiling).filter(
+            Q(due_date__lt=state.last_due_date) | Q(due_date=state.last_due_date, id__lte=state.last_id),
+            id__gt=after_id,
+        )
+        return list(queryset.order_by('id').values(*SCAN_FIELDS)[:self.chunk_size])
+
+    def run(self):
+        """Сканирует до горизонта и возвращает число обработанных напоминаний"""
+        state = self.get_state()
+        since = self.today - timedelta(days=self.lookback_days)
+        until = self.today + timedelta(days=self.horizon_days)
+        # Строки с id больше потолка достанутся следующему проходу целиком
+        ceiling = Reminder.objects.aggregate(ceiling=Max('id'))['ceiling'] or 0
+        mark = (state.last_due_date, state.last_id)
+        total = 0
+        if state.last_due_date is not None and ceiling > state.last_seen_id:
+            seen_id = state.last_seen_id
+            total += self.drain(
+                lambda last: self.late_chunk(state, last['id'] if last else seen_id, since, ceiling),
+                lambda last, processed: self.save_state(state, processed, last_seen_id=last['id']),
+            )
+        total += self.drain(
+            lambda last: self.next_chunk(*((last['due_date'], last['id']) if last else mark), since, until, ceiling),
+            lambda last, processed: self.save_state(
+                state, processed, last_due_date=last['due_date'], last_id=last['id'],
+            ),
+        )
+        self.save_state(state, 0, last_seen_id=max(ceiling, state.last_seen_id))
+        return total
+
+    def drain(self, next_chunk, save):
+        """Читает порции next_chunk(последняя строка) и отправляет их, сохраняя отметку после каждой отправки"""
+        buffered, pending, total, last = {}, 0, 0, None
+        while True:
+            rows = next_chunk(last)
+            for row in rows:
+                buffered.setdefault(row['owner_id'], []).append(row)
+            if rows:
+                last = rows[-1]
+                pending += len(rows)
+            if pending and (pending >= self.flush_size or len(rows) < self.chunk_size):
+                self.flush(buffered)
+                save(last, pending)
+                total += pending
+                buffered, pending = {}, 0
+            if len(rows) < self.chunk_size:
+                return total
+
+    def flush(self, buffered):
+        digests = []
+        for owner_id, rows in buffered.items():
+            first = rows[0]
+            digests.append(Digest(
+                owner_id=owner_id,
+                username=first['owner__username'],
+                email=first['owner__email'],
+                items=[{
+                    'id': row['id'],
+                    'pet': row['pet__name'],
+                    'title': row['title'],
+                    'reminder_type': row['reminder_type'],
+                    'due_date': row['due_date'].isoformat(),
+                } for row in rows],
+            ))
+        self.sender.send(digests)
+
+    def save_state(self, state, processed, **marks):
+        with transaction.atomic():
+            for name, value in marks.items():
+                setattr(state, name, value)
+            state.processed += processed
+            state.save()
+        logger.info('Напоминания обработаны до %s #%s, новые до #%s', state.last_due_date, state.last_id, state.last_seen_id)
+
+
+def window_days():
+    """На сколько дней вперед правила повторения превращаются в строки Reminder"""
+    return getattr(settings, 'REMINDER_WINDOW_DAYS', 60)
+
+
+def add_months(start, months):
+    month = start.month - 1 + months
+    year = start.year + month // 12
+    month = month % 12 + 1
+    return start.replace(year=year, month=month, day=min(start.day, calendar.monthrange(year, month)[1]))
+
+
+def occurrence(rule, number):
+    """Дата повторения number (с нуля). Месяцы отсчитываются от первой даты, поэтому 31-е не сползает на 28-е"""
+    if rule.unit == 'day':
+        return rule.start_date + timedelta(days=number * rule.interval)
+    return add_months(rule.start_date, number * rule.interval * (12 if rule.unit == 'year' else 1))
+
+
+def occurrences(rule, start, end):
+    """Даты повторений правила в [start, end], вычисляются без обращения к базе"""
+    start = max(start, rule.start_date)
+    if rule.end_date is not None:
+        end = min(end, rule.end_date)
+    if start > end:
+        return
+    if rule.unit == 'day':
+        number = -(-(start - rule.start_date).days // rule.interval)
+    else:
+        step = rule.interval * (12 if rule.unit == 'year' else 1)
+        months = (start.year - rule.start_date.year) * 12 + start.month - rule.start_date.month
+        number = max(0, months // step - 1)
+    while True:
+        try:
+            day = occurrence(rule, number)
+        except (OverflowError, ValueError):
+            # За пределами date.max повторений нет
+            return
+        if day > end:
+            return
+        if day >= start:
+            yield day
+        number += 1
+
+
+def build_occurrence(rule, day):
+    return Reminder(
+        pet=rule.pet, rule=rule, reminder_type=rule.reminder_type,
+        title=rule.title, description=rule.description, due_date=day,
+    )
+
+
+def pending_rules(today=None, owner_id=None):
+    """Правила, у которых созданные строки не покрывают окно до today + window_days"""
+    horizon = (today or date.today()) + timedelta(days=window_days())
+    rules = ReminderRule.objects.filter(
+        Q(materialized_until=None) | Q(materialized_until__lt=horizon)
+    ).exclude(end_date__lte=F('materialized_until'))
+    if owner_id is not None:
+        rules = rules.filter(pet__owner_id=owner_id)
+    return rules.select_related('pet')
+
+
+def keep_overdue_days():
+    """Сколько дней хранятся невыполненные прошедшие повторения правил"""
+    return getattr(settings, 'REMINDER_KEEP_OVERDUE_DAYS', 30)
+
+
+def delete_occurrences(owner_id, queryset):
+    """
+    Удаляет строки одним DELETE: обработчики сигналов не пишут журнал по
+    каждой строке, отметки удаления пишутся пакетом. Версию данных
+    повышает вызывающий код, один раз на операцию.
+    """
+    with collect_deletions() as rows:
+        queryset.delete()
+    if rows:
+        record_changes(owner_id, rows, deleted=True)
+    return len(rows)
+
+
+def materialize_rule(rule, today):
+    """
+    Сдвигает окно одного правила: создает даты с сегодняшнего дня до
+    today + window_days и удаляет невыполненные повторения старше
+    keep_overdue_days, поэтому строк на правило не больше константы.
+    Прошедшие пропущенные даты не создаются. Отметка materialized_until
+    сдвигается условным UPDATE: параллельные вызовы не создают дубликатов.
+    Возвращает число созданных и удаленных строк; версию данных не трогает.
+    """
+    horizon = today + timedelta(days=window_days())
+    since = today if rule.materialized_until is None else max(rule.materialized_until + timedelta(days=1), today)
+    claimed = ReminderRule.objects.filter(
+        pk=rule.pk, materialized_until=rule.materialized_until,
+    ).update(materialized_until=horizon)
+    if not claimed:
+        return 0
+    rule.materialized_until = horizon
+    changed = delete_occurrences(rule.pet.owner_id, rule.occurrences.filter(
+        is_completed=False, due_date__lt=today - timedelta(days=keep_overdue_days()),
+    ))
+    days = list(occurrences(rule, since, horizon))
+    if days:
+        # Выполненные даты, оставшиеся после правки правила, не дублируются
+        existing = set(rule.occurrences.filter(due_date__in=days).values_list('due_date', flat=True))
+        rows = Reminder.objects.bulk_create([build_occurrence(rule, day) for day in days if day not in existing])
+        record_changes(rule.pet.owner_id, rows, created=True)
+        changed += len(rows)
+    return changed
+
+
+def materialize_rules(rules, today=None):
+    """materialize_rule для каждого правила, версия данных владельца повышается один раз"""
+    today = today or date.today()
+    rules = list(rules)
+    if not rules:
+        return 0
+    changed_owners, changed = set(), 0
+    with transaction.atomic():
+        for rule in rules:
+            count = materialize_rule(rule, today)
+            if count:
+                changed_owners.add(rule.pet.owner_id)
+                changed += count
+        for owner_id in changed_owners:
+            bump_now_and_on_commit(bump_data_version, owner_id)
+    return changed
+
+
+def extend_windows(owner_id=None, today=None):
+    """Сдвигает окно правил пользователя (или всех правил); без работы — один запрос"""
+    return materialize_rules(pending_rules(today, owner_id), today)
+
+
+def ensure_window(owner_id, today=None):
+    """
+    extend_windows для пользователя не чаще раза в день: окно сдвигается
+    только со сменой даты, а новые и измененные правила создают свои строки сразу.
+    """
+    today = today or date.today()
+    cache = get_cache()
+    key = WINDOW_KEY.format(user_id=owner_id, day=today.isoformat())
+    if cache.get(key):
+        return 0
+    changed = extend_windows(owner_id, today)
+    cache.set(key, True, timeout=86400)
+    return changed
+
+
+async def aensure_window(owner_id, today=None):
+    """ensure_window для асинхронных view: в поток с базой — только в первый запрос дня"""
+    today = today or date.today()
+    if await get_cache().aget(WINDOW_KEY.format(user_id=owner_id, day=today.isoformat())):
+        return 0
+    return await sync_to_async(ensure_window)(owner_id, today)
+
+
+def rematerialize(rule, today=None):
+    """После правки правила: будущие невыполненные даты создаются заново"""
+    today = today or date.today()
+    with transaction.atomic():
+        delete_occurrences(rule.pet.owner_id, rule.occurrences.filter(is_completed=False, due_date__gte=today))
+        ReminderRule.objects.filter(pk=rule.pk).update(materialized_until=None)
+        rule.materialized_until = None
+        materialize_rule(rule, today)
+        bump_now_and_on_commit(bump_data_version, rule.pet.owner_id)
+
+
+def delete_rule(rule, today=None):
+    """Удаляет правило и его будущие невыполненные даты; история остается без ссылки на правило"""
+    today = today or date.today()
+    owner_id = rule.pet.owner_id
+    with transaction.atomic():
+        delete_occurrences(owner_id, rule.occurrences.filter(is_completed=False, due_date__gte=today))
+        kept = list(rule.occurrences.only('id', 'pet_id'))
+        rule.delete()
+        for reminder in kept:
+            reminder.rule = None
+        record_changes(owner_id, kept)
+        bump_now_and_on_commit(bump_data_version, owner_id)
+
+
+def reminders_between(owner_id, start, end, today=None):
+    """
+    Напоминания пользователя со сроком в [start, end]: созданные строки и
+    повторения правил за пределами окна, вычисленные на лету (без id).
+    Даты раньше сегодняшней на лету не вычисляются: за прошлое отдаются
+    только сохраненные строки (выполненные и просроченные не старше
+    keep_overdue_days). Удаленное пользователем повторение не отличить от
+    не созданного, восстановленные даты вернули бы удаленное.
+    """
+    today = today or date.today()
+    reminders = list(
+        Reminder.objects.filter(owner_id=owner_id, due_date__gte=start, due_date__lte=end).select_related('pet')
+    )
+    rules = ReminderRule.objects.filter(
+        pet__owner_id=owner_id, start_date__lte=end,
+    ).exclude(end_date__lt=start).select_related('pet')
+    for rule in rules:
+        materialized = max(rule.materialized_until or today - timedelta(days=1), today - timedelta(days=1))
+        reminders.extend(
+            build_occurrence(rule, day)
+            for day in occurrences(rule, max(start, materialized + timedelta(days=1)), end)
+        )
+    reminders.sort(key=lambda reminder: (reminder.due_date, reminder.pk is None, reminder.pk or 0))
+    return reminders
@@ -0,0 +1,51 @@
+import time
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+from .metrics import record_render
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен: без него работает кодировщик стандартной библиотеки
+    orjson = None
+
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+
+class CompactJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer с тем же выводом, но дешевле: orjson, если установлен,
+    иначе один заранее созданный кодировщик вместо нового на каждый ответ.
+    Decimal, даты и прочие типы кодируются по правилам DRF (encoders.JSONEncoder).
+    Ответы с отступами (?indent в Accept) и нестандартные настройки
+    UNICODE_JSON/COMPACT_JSON/STRICT_JSON идут через обычный JSONRenderer.
+    """
+    encoder = encoders.JSONEncoder(ensure_ascii=False, separators=(',', ':'), allow_nan=False)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        started = time.perf_counter()
+        try:
+            return self.encode(data, accepted_media_type, renderer_context)
+        finally:
+            record_render(time.perf_counter() - started)
+
+    def encode(self, data, accepted_media_type, renderer_context):
+        if data is None:
+            return b''
+        if (
+            self.get_indent(accepted_media_type, renderer_context or {}) is not None
+            or self.ensure_ascii or not self.compact or not self.strict
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        if orjson is not None:
+            try:
+                ret = orjson.dumps(data, default=self.encoder.default, option=ORJSON_OPTIONS)
+            except orjson.JSONEncodeError:
+                # Например, целые больше 64 бит: их умеет только json
+                ret = self.encoder.encode(data).encode('utf-8')
+        else:
+            ret = self.encoder.encode(data).encode('utf-8')
+        # Как в JSONRenderer: U+2028/U+2029 допустимы в JSON, но не в JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
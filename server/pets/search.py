@@ -0,0 +1,113 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+
+SEARCH_TABLE = 'pets_search'
+KINDS = ('record', 'document')
+# Веса bm25 по колонкам: owner, pet, title, body, veterinarian
+WEIGHTS = (0.0, 3.0, 10.0, 4.0, 2.0)
+TEXT_COLUMNS = '{pet title body veterinarian}'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def build_match(query, owner_id=None):
+    """
+    Переводит пользовательский запрос в выражение FTS5: каждое слово ищется
+    как префикс, все слова обязательны. Синтаксис FTS5 из запроса не
+    пропускается, поэтому ошибочный ввод не ломает запрос к базе.
+    """
+    terms = TOKEN_RE.findall(query)
+    if not terms:
+        return None
+    match = f'{TEXT_COLUMNS} : (' + ' '.join(f'"{term}"*' for term in terms) + ')'
+    if owner_id is not None:
+        match = f'owner : "u{int(owner_id)}" AND {match}'
+    return match
+
+
+def search(owner_id, query, kind=None, limit=20):
+    """Ранжированный поиск по записям и документам владельца"""
+    if not is_available():
+        return fallback_search(owner_id, query, kind, limit)
+    match = build_match(query, owner_id)
+    if match is None:
+        return []
+    weights = ', '.join(str(weight) for weight in WEIGHTS)
+    sql = (
+        f'SELECT kind, object_id, pet_id, pet, title, '
+        f"snippet({SEARCH_TABLE}, 3, '', '', '…', 16), bm25({SEARCH_TABLE}, {weights}) AS score "
+        f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s'
+    )
+    params = [match]
+    if kind:
+        sql += ' AND kind = %s'
+        params.append(kind)
+    sql += ' ORDER BY score LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return [
+        {
+            'type': kind_, 'id': object_id, 'pet': pet_id, 'pet_name': pet_name,
+            'title': title, 'snippet': snippet, 'score': round(-score, 4),
+        }
+        for kind_, object_id, pet_id, pet_name, title, snippet, score in rows
+    ]
+
+
+def fallback_search(owner_id, query, kind, limit):
+    """Поиск через LIKE для СУБД без FTS5 (без ранжирования)"""
+    from .models import MedicalRecord, PetDocument
+
+    terms = TOKEN_RE.findall(query)
+    if not terms:
+        return []
+    sources = [
+        ('record', MedicalRecord.objects.filter(owner_id=owner_id), ('title', 'description', 'veterinarian')),
+        ('document', PetDocument.objects.filter(owner_id=owner_id), ('title', 'description')),
+    ]
+    results = []
+    for kind_, queryset, fields in sources:
+        if kind and kind != kind_:
+            continue
+        for term in terms:
+            condition = Q(pet__name__icontains=term)
+            for field in fields:
+                condition |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(condition)
+        for obj in queryset.select_related('pet')[:limit]:
+            results.append({
+                'type': kind_, 'id': obj.id, 'pet': obj.pet_id, 'pet_name': obj.pet.name,
+                'title': obj.title, 'snippet': obj.description[:120], 'score': 0.0,
+            })
+    return results[:limit]
+
+
+def filter_queryset(queryset, kind, query):
+    """Ограничивает queryset записями, найденными в индексе (для админки)"""
+    match = build_match(query)
+    if match is None:
+        return queryset
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT object_id FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND kind = %s',
+        (match, kind),
+    ))
+
+
+class IndexedSearchAdminMixin:
+    """Поиск в админке через полнотекстовый индекс вместо LIKE '%term%'"""
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not is_available():
+            return super().get_search_results(request, queryset, search_term)
+        return filter_queryset(queryset, self.search_kind, search_term), False
@@ -1,9 +1,46 @@
+from datetime import date
+
 from rest_framework import serializers
-from django.contrib.auth.models import User
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, update_last_login
 from django.contrib.auth.password_validation import validate_password
-from .models import Pet, MedicalRecord, Reminder, Partner, ProductOrService, PetDocument
-
-class UserSerializer(serializers.ModelSerializer):
+from django.core.files.storage import default_storage
+from .metrics import TimedSerializerMixin
+from .models import Pet, MedicalRecord, Reminder, ReminderRule, Partner, ProductOrService, PetDocument
+from .passwords import check_credentials
+
+
+# Вычисляемые поля вынесены в функции: их же использует быстрый путь списков (pets.fastlist)
+def pet_age(birth_date, today=None):
+    if birth_date:
+        today = today or date.today()
+        age = today.year - birth_date.year
+        if today.month < birth_date.month or (today.month == birth_date.month and today.day < birth_date.day):
+            age -= 1
+        return age
+    return None
+
+def days_until(due_date, today=None):
+    return (due_date - (today or date.today())).days
+
+def image_variant_urls(variants, request):
+    if not variants:
+        return {}
+    urls = {}
+    for key, name in variants.items():
+        url = default_storage.url(name)
+        urls[key] = request.build_absolute_uri(url) if request else url
+    return urls
+
+def size_in_mb(file_size):
+    if file_size:
+        return round(file_size / (1024 * 1024), 2)
+    return None
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
     password2 = serializers.CharField(write_only=True, required=True)
 
@@ -18,11 +55,31 @@ class UserSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data.pop('password2')
-        user = User.objects.create_user(**validated_data)
+        # Хэш можно посчитать заранее (в пуле хэширования), иначе — здесь
+        password_hash = validated_data.pop('password_hash', None)
+        password = validated_data.pop('password')
+        user = User(**validated_data)
+        user.username = User.normalize_username(user.username)
+        user.email = User.objects.normalize_email(user.email)
+        user.password = password_hash or make_password(password)
+        user.save()
         return user
 
-class PetSerializer(serializers.ModelSerializer):
+class CredentialsTokenSerializer(TokenObtainPairSerializer):
+    """Пара токенов simplejwt, но пароль проверяется через пул хэширования, как в /api/auth/login/"""
+
+    def validate(self, attrs):
+        self.user = check_credentials(attrs[self.username_field], attrs['password'])
+        if not jwt_settings.USER_AUTHENTICATION_RULE(self.user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        refresh = self.get_token(self.user)
+        if jwt_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, self.user)
+        return {'refresh': str(refresh), 'access': str(refresh.access_token)}
+
+class PetSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
     age = serializers.SerializerMethodField()
 
     class Meta:
@@ -38,40 +95,76 @@ class PetSerializer(serializers.ModelSerializer):
             return obj.image.url
         return obj.image_url
 
-    def get_age(self, obj):
-        if obj.birth_date:
-            from datetime import date
-            today = date.today()
-            age = today.year - obj.birth_date.year
-            if today.month < obj.birth_date.month or (today.month == obj.birth_date.month and today.day < obj.birth_date.day):
-                age -= 1
-            return age
-        return None
+    def get_image_variants(self, obj):
+        return image_variant_urls(obj.image_variants, self.context.get('request'))
 
-class MedicalRecordSerializer(serializers.ModelSerializer):
+    def get_age(self, obj):
+        # Списки получают возраст аннотацией из базы (annotations.with_age)
+        if hasattr(obj, 'age'):
+            return obj.age
+        return pet_age(obj.birth_date)
+
+class PetRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Ссылка на питомца. При массовой загрузке питомцы заранее выбираются одним
+    запросом и передаются в context['pets'], чтобы не делать запрос на каждую запись.
+    """
+
+    def to_internal_value(self, data):
+        pets = self.context.get('pets')
+        if pets is None:
+            return super().to_internal_value(data)
+        try:
+            return pets[int(data)]
+        except (KeyError, TypeError, ValueError):
+            self.fail('does_not_exist', pk_value=data)
+
+class MedicalRecordSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    pet = PetRelatedField(queryset=Pet.objects.all())
     pet_name = serializers.CharField(source='pet.name', read_only=True)
 
     class Meta:
         model = MedicalRecord
-        fields = '__all__'
-        read_only_fields = ('created_at',)
+        exclude = ('owner',)
+        read_only_fields = ('created_at', 'updated_at')
 
-class ReminderSerializer(serializers.ModelSerializer):
+class ReminderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    pet = PetRelatedField(queryset=Pet.objects.all())
     pet_name = serializers.CharField(source='pet.name', read_only=True)
     days_until_due = serializers.SerializerMethodField()
 
     class Meta:
         model = Reminder
-        fields = '__all__'
-        read_only_fields = ('created_at',)
+        exclude = ('owner',)
+        read_only_fields = ('rule', 'created_at', 'updated_at')
 
     def get_days_until_due(self, obj):
-        from datetime import date
-        today = date.today()
-        delta = obj.due_date - today
-        return delta.days
+        if hasattr(obj, 'days_until_due'):
+            return obj.days_until_due
+        return days_until(obj.due_date)
+
+class ReminderRuleSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    pet = PetRelatedField(queryset=Pet.objects.all())
+    pet_name = serializers.CharField(source='pet.name', read_only=True)
+
+    class Meta:
+        model = ReminderRule
+        fields = '__all__'
+        read_only_fields = ('materialized_until', 'created_at', 'updated_at')
+
+    def validate_interval(self, value):
+        if value < 1:
+            raise serializers.ValidationError('Interval must be at least 1.')
+        return value
 
-class PetDocumentSerializer(serializers.ModelSerializer):
+    def validate(self, attrs):
+        start_date = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        if end_date is not None and start_date is not None and end_date < start_date:
+            raise serializers.ValidationError({'end_date': "End date can't be before start date."})
+        return attrs
+
+class PetDocumentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     pet_name = serializers.CharField(source='pet.name', read_only=True)
     file_url = serializers.SerializerMethodField()
     file_size_mb = serializers.SerializerMethodField()
@@ -79,7 +172,7 @@ class PetDocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = PetDocument
         fields = '__all__'
-        read_only_fields = ('owner', 'file_size', 'uploaded_at')
+        read_only_fields = ('owner', 'file_size', 'blob', 'uploaded_at', 'updated_at')
 
     def get_file_url(self, obj):
         if obj.file:
@@ -90,20 +183,24 @@ class PetDocumentSerializer(serializers.ModelSerializer):
         return None
 
     def get_file_size_mb(self, obj):
-        if obj.file_size:
-            return round(obj.file_size / (1024 * 1024), 2)
-        return None
+        return size_in_mb(obj.file_size)
+
+class PetOverviewSerializer(PetSerializer):
+    latest_records = MedicalRecordSerializer(many=True, read_only=True)
+    upcoming_reminders = ReminderSerializer(many=True, read_only=True)
+    document_count = serializers.IntegerField(read_only=True)
+    total_cost = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
 
-class PartnerSerializer(serializers.ModelSerializer):
+class PartnerSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Partner
         fields = '__all__'
-        read_only_fields = ('created_at',)
+        read_only_fields = ('created_at', 'updated_at')
 
-class ProductOrServiceSerializer(serializers.ModelSerializer):
+class ProductOrServiceSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     partner_name = serializers.CharField(source='partner.name', read_only=True)
 
     class Meta:
         model = ProductOrService
         fields = '__all__'
-        read_only_fields = ('created_at',) 
\ No newline at end of file
+        read_only_fields = ('created_at', 'updated_at') 
\ No newline at end of file
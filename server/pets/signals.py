@@ -0,0 +1,122 @@
+import contextvars
+import copy
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import bump_user_version, user_cache
+from .blobstore import release_blob
+from .cache import bump_data_version, bump_now_and_on_commit
+from .catalog import bump_catalog_version
+from .models import Pet, MedicalRecord, Reminder, PetDocument, Partner, ProductOrService
+from .sync import forget_pet_children, record_changes
+
+
+# Список, в который post_delete собирает удаленные объекты вместо записи по одному
+deletion_batch = contextvars.ContextVar('pets_deletion_batch', default=None)
+
+
+@contextmanager
+def collect_deletions():
+    """
+    Пакетное удаление через обычный QuerySet.delete(): обработчики post_delete
+    не повышают версию данных и не пишут журнал по каждой строке, а собирают
+    объекты в возвращаемый список. Журнал и версию пишет вызывающий код.
+    """
+    deleted = []
+    token = deletion_batch.set(deleted)
+    try:
+        yield deleted
+    finally:
+        deletion_batch.reset(token)
+
+
+@receiver(post_delete, sender=PetDocument)
+def release_document_blob(sender, instance, **kwargs):
+    # Срабатывает и при каскадном удалении вместе с питомцем
+    if instance.blob_id is not None:
+        release_blob(instance.blob_id)
+
+
+def owner_id_of(instance, origin=None):
+    if isinstance(instance, Pet):
+        return instance.owner_id
+    if isinstance(instance, PetDocument):
+        return instance.owner_id
+    if isinstance(origin, Pet):
+        # Каскадное удаление: владелец известен без запроса к базе
+        return origin.owner_id
+    if 'pet' in instance._state.fields_cache:
+        return instance.pet.owner_id
+    return Pet.objects.filter(pk=instance.pet_id).values_list('owner_id', flat=True).first()
+
+
+@receiver(post_save, sender=Pet)
+@receiver(post_save, sender=MedicalRecord)
+@receiver(post_save, sender=Reminder)
+@receiver(post_save, sender=PetDocument)
+@receiver(post_delete, sender=Pet)
+@receiver(post_delete, sender=MedicalRecord)
+@receiver(post_delete, sender=Reminder)
+@receiver(post_delete, sender=PetDocument)
+def bump_owner_data_version(sender, instance, origin=None, **kwargs):
+    if deletion_batch.get() is not None and kwargs['signal'] is post_delete:
+        return
+    owner_id = owner_id_of(instance, origin)
+    if owner_id is not None:
+        bump_now_and_on_commit(bump_data_version, owner_id)
+
+
+@receiver(post_save, sender=Pet)
+@receiver(post_save, sender=MedicalRecord)
+@receiver(post_save, sender=Reminder)
+@receiver(post_save, sender=PetDocument)
+def record_sync_change(sender, instance, created=False, **kwargs):
+    owner_id = owner_id_of(instance)
+    if owner_id is not None:
+        record_changes(owner_id, [instance], created=created)
+
+
+@receiver(post_delete, sender=Pet)
+@receiver(post_delete, sender=MedicalRecord)
+@receiver(post_delete, sender=Reminder)
+@receiver(post_delete, sender=PetDocument)
+def record_sync_tombstone(sender, instance, origin=None, **kwargs):
+    batch = deletion_batch.get()
+    if batch is not None:
+        # Копия: после удаления Collector обнуляет pk у исходного объекта
+        batch.append(copy.copy(instance))
+        return
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is User:
+        # Удаляется сам пользователь вместе с журналом
+        return
+    if origin_model is Pet and not isinstance(instance, Pet):
+        # Каскад от питомца: клиент удалит дочерние объекты вместе с ним
+        return
+    if isinstance(instance, Pet):
+        forget_pet_children(instance.pk)
+    owner_id = owner_id_of(instance, origin)
+    if owner_id is not None:
+        record_changes(owner_id, [instance], deleted=True)
+
+
+@receiver(post_save, sender=Partner)
+@receiver(post_save, sender=ProductOrService)
+@receiver(post_delete, sender=Partner)
+@receiver(post_delete, sender=ProductOrService)
+def bump_catalog(sender, instance, **kwargs):
+    # Изменение товара применяется к снимкам точечно, партнера — пересборкой
+    kind = 'product' if sender is ProductOrService else 'partner'
+    bump_now_and_on_commit(bump_catalog_version, (kind, instance.pk))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_state(sender, instance, **kwargs):
+    # Деактивация, смена пароля и удаление сразу видны JWT-аутентификации
+    user_cache.invalidate(instance.pk)
+    bump_now_and_on_commit(bump_user_version, instance.pk)
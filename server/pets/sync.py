@@ -0,0 +1,133 @@
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from .models import Pet, MedicalRecord, Reminder, PetDocument, SyncChange
+
+
+TOKEN_SALT = 'pets.sync'
+KIND_BY_MODEL = {
+    Pet: 'pet',
+    MedicalRecord: 'record',
+    Reminder: 'reminder',
+    PetDocument: 'document',
+}
+# Ключи ответа синхронизации по типам объектов
+SECTIONS = {
+    'pet': 'pets',
+    'record': 'medical_records',
+    'reminder': 'reminders',
+    'document': 'documents',
+}
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def tombstone_days():
+    return getattr(settings, 'SYNC_TOMBSTONE_DAYS', 30)
+
+
+def pet_id_of(instance):
+    return instance.pk if isinstance(instance, Pet) else instance.pet_id
+
+
+def record_changes(owner_id, objects, deleted=False, created=False):
+    """
+    Отмечает объекты одного типа как измененные (или удаленные): старая
+    строка журнала удаляется, новая получает следующий id. Для только что
+    созданных объектов (created=True) старых строк нет: id не переиспользуются.
+    """
+    objects = list(objects)
+    if not objects:
+        return
+    kind = KIND_BY_MODEL[type(objects[0])]
+    if not created:
+        SyncChange.objects.filter(kind=kind, object_id__in=[obj.pk for obj in objects]).delete()
+    SyncChange.objects.bulk_create([
+        SyncChange(owner_id=owner_id, kind=kind, object_id=obj.pk, pet_id=pet_id_of(obj), deleted=deleted)
+        for obj in objects
+    ], batch_size=500)
+
+
+def forget_pet_children(pet_id):
+    """
+    При удалении питомца его записи, напоминания и документы удаляются
+    каскадом. Клиент удаляет их вместе с питомцем сам, поэтому вместо
+    отдельных отметок журнал просто забывает их.
+    """
+    SyncChange.objects.filter(pet_id=pet_id).exclude(kind='pet').delete()
+
+
+def make_token(seq):
+    return signing.dumps({'seq': seq, 'at': int(time.time())}, salt=TOKEN_SALT, compress=True)
+
+
+def read_token(token):
+    """Возвращает номер изменения из токена или None, если нужна полная синхронизация"""
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT)
+        seq, issued_at = int(data['seq']), int(data['at'])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidToken('Invalid sync token')
+    # Отметки об удалении хранятся ограниченное время
+    if time.time() - issued_at > tombstone_days() * 86400:
+        return None
+    return seq
+
+
+def prune_tombstones(now=None):
+    cutoff = (now or timezone.now()) - timezone.timedelta(days=tombstone_days())
+    deleted, _ = SyncChange.objects.filter(deleted=True, changed_at__lt=cutoff).delete()
+    return deleted
+
+
+def load_objects(kind, ids):
+    if kind == 'pet':
+        return Pet.objects.filter(id__in=ids)
+    model = {'record': MedicalRecord, 'reminder': Reminder, 'document': PetDocument}[kind]
+    return model.objects.filter(id__in=ids).select_related('pet')
+
+
+def changes_since(user, seq, limit, serializer_context):
+    """
+    Изменения пользователя после seq: не больше limit строк журнала, объекты
+    загружаются одним запросом на тип и сериализуются штатными
+    сериализаторами API.
+    """
+    from .serializers import PetSerializer, MedicalRecordSerializer, ReminderSerializer, PetDocumentSerializer
+
+    serializers_ = {
+        'pet': PetSerializer,
+        'record': MedicalRecordSerializer,
+        'reminder': ReminderSerializer,
+        'document': PetDocumentSerializer,
+    }
+    rows = list(
+        SyncChange.objects.filter(owner=user, id__gt=seq or 0)
+        .order_by('id').values_list('id', 'kind', 'object_id', 'deleted')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    changed = {kind: [] for kind in SECTIONS}
+    payload = {section: [] for section in SECTIONS.values()}
+    payload['deleted'] = {section: [] for section in SECTIONS.values()}
+    for _, kind, object_id, deleted in rows:
+        if deleted:
+            # При полной синхронизации удаленное клиенту не нужно
+            if seq is not None:
+                payload['deleted'][SECTIONS[kind]].append(object_id)
+        else:
+            changed[kind].append(object_id)
+    for kind, ids in changed.items():
+        if ids:
+            objects = load_objects(kind, ids)
+            payload[SECTIONS[kind]] = serializers_[kind](objects, many=True, context=serializer_context).data
+
+    last_seq = rows[-1][0] if rows else (seq or 0)
+    payload.update(token=make_token(last_seq), reset=seq is None, has_more=has_more)
+    return payload
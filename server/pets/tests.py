@@ -1,3 +1,1937 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import (
+    Pet, MedicalRecord, Reminder, PetDocument, Partner, ProductOrService, DocumentBlob, ReminderScanState,
+    ImportCheckpoint, SyncChange, ReminderRule, blob_upload_path,
+)
+from .annotations import filter_pets, filter_reminders, with_age, with_days_until_due, years_ago
+from .blobstore import acquire_blob
+from .export import csv_lines
+from .thumbnails import generate_variants
+from .authentication import bump_user_version, user_cache
+from .metrics import RequestStats, current, registry
+from .passwords import check_credentials, hash_pool
+from .renderers import CompactJSONRenderer
+from .reminders import (
+    ReminderScanner, add_months, delete_rule, ensure_window, extend_windows, occurrence, occurrences, pending_rules,
+)
+from .serializers import PetSerializer, days_until, pet_age
+from .cache import cache_stats, reset_cache_stats
+from .checks import check_shared_cache, report_on_startup
+from .catalog import CatalogSnapshot
+from .management.commands.import_medical_history import Command as ImportCommand
+from .management.commands.load_test import Command as LoadTestCommand, find_regressions
+
+
+class PetsTestCase(TestCase):
+    def setUp(self):
+        # Кэш ответов переживает откат транзакции между тестами
+        cache.clear()
+
+
+class KeysetPaginationTests(PetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.pet = Pet.objects.create(name='Барсик', owner=self.user)
+        start = date(2024, 1, 1)
+        # Несколько записей на одну дату, чтобы проверить ключ `id`
+        for i in range(25):
+            MedicalRecord.objects.create(
+                pet=self.pet, record_type='examination', title=f'Осмотр {i}',
+                description='', date=start + timedelta(days=i // 3),
+            )
+
+    def _walk(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+            pages += 1
+        return ids, pages
+
+    def test_pages_cover_all_rows_in_model_ordering(self):
+        ids, pages = self._walk('/api/medical-records/?pagination=cursor&page_size=4')
+        expected = list(MedicalRecord.objects.order_by('-date', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 7)
+
+    def test_previous_link_returns_preceding_page(self):
+        first = self.client.get('/api/medical-records/?pagination=cursor&page_size=5').data
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(
+            [item['id'] for item in back['results']],
+            [item['id'] for item in first['results']],
+        )
+
+    def test_ascending_ordering_for_reminders(self):
+        for i in range(6):
+            Reminder.objects.create(
+                pet=self.pet, reminder_type='vaccination', title=f'Прививка {i}',
+                due_date=date(2024, 6, 1) + timedelta(days=i % 2),
+            )
+        ids, _ = self._walk('/api/reminders/?pagination=cursor&page_size=2')
+        expected = list(Reminder.objects.order_by('due_date', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/medical-records/?pagination=cursor&cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_number_pagination_is_default(self):
+        response = self.client.get('/api/medical-records/')
+        self.assertEqual(response.data['count'], 25)
+
+
+class QueryCountTests(PetsTestCase):
+    """Число запросов для list/detail не должно расти вместе с числом объектов."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.partner = Partner.objects.create(name='Клиника', partner_type='clinic', address='ул. Ленина, 1')
+
+    def seed(self, n):
+        pets = Pet.objects.bulk_create(
+            [Pet(name=f'Питомец {i}', owner=self.user) for i in range(n)]
+        )
+        MedicalRecord.objects.bulk_create([
+            MedicalRecord(pet=pet, record_type='examination', title='Осмотр',
+                          description='', date=date(2024, 1, 1))
+            for pet in pets
+        ])
+        Reminder.objects.bulk_create([
+            Reminder(pet=pet, reminder_type='vaccination', title='Прививка',
+                     due_date=date(2024, 6, 1))
+            for pet in pets
+        ])
+        PetDocument.objects.bulk_create([
+            PetDocument(pet=pet, owner=self.user, document_type='medical',
+                        title='Справка', file=f'documents/{pet.id}.pdf')
+            for pet in pets
+        ])
+        ProductOrService.objects.bulk_create([
+            ProductOrService(name=f'Корм {i}', category='food', description='',
+                             price='100.00', partner=self.partner)
+            for i in range(n)
+        ])
+
+    def count_queries(self, url):
+        # Меряем путь без кэша ответов: bulk_create не повышает версию данных
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def assertConstantQueries(self, url):
+        self.seed(2)
+        small = self.count_queries(url)
+        self.seed(15)
+        large = self.count_queries(url)
+        self.assertEqual(small, large)
+        return large
+
+    def test_medical_records_list(self):
+        self.assertEqual(self.assertConstantQueries('/api/medical-records/'), 2)
+
+    def test_reminders_list(self):
+        # Третий запрос — проверка окна правил повторения, раз в день на пользователя
+        self.assertEqual(self.assertConstantQueries('/api/reminders/'), 3)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/reminders/?completed=false')
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_documents_list(self):
+        self.assertEqual(self.assertConstantQueries('/api/documents/'), 2)
+
+    def test_products_list(self):
+        self.assertEqual(self.assertConstantQueries('/api/products-services/'), 2)
+
+    def test_cursor_mode_skips_count(self):
+        self.assertEqual(self.assertConstantQueries('/api/medical-records/?pagination=cursor'), 1)
+
+    def test_detail(self):
+        self.seed(1)
+        record = MedicalRecord.objects.get()
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/medical-records/{record.id}/')
+        self.assertEqual(response.data['pet_name'], 'Питомец 0')
+
+
+PNG_BYTES = b'\x89PNG\r\n\x1a\n' + b'\x00' * 200_000
+
+
+class MediaTestCase(PetsTestCase):
+    """Загружаемые файлы пишутся во временный MEDIA_ROOT"""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.pet = Pet.objects.create(name='Барсик', owner=self.user)
+
+
+class StreamingUploadTests(MediaTestCase):
+    def test_upload_image_reports_size_and_hash(self):
+        upload = SimpleUploadedFile('cat.png', PNG_BYTES, content_type='image/png')
+        response = self.client.post(f'/api/pets/{self.pet.id}/upload_image/', {'image': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['size'], len(PNG_BYTES))
+        self.assertEqual(response.data['sha256'], hashlib.sha256(PNG_BYTES).hexdigest())
+        self.pet.refresh_from_db()
+        with self.pet.image.open('rb') as stored:
+            self.assertEqual(stored.read(), PNG_BYTES)
+
+    def test_upload_image_checks_signature_not_header(self):
+        upload = SimpleUploadedFile('cat.png', b'not an image', content_type='image/png')
+        response = self.client.post(f'/api/pets/{self.pet.id}/upload_image/', {'image': upload})
+        self.assertEqual(response.status_code, 400)
+
+    def test_upload_document(self):
+        document = PetDocument.objects.create(
+            pet=self.pet, owner=self.user, document_type='medical', title='Справка',
+            file=SimpleUploadedFile('old.txt', b'old'),
+        )
+        body = b'%PDF-1.4 ' + b'x' * 100_000
+        upload = SimpleUploadedFile('cert.pdf', body, content_type='application/pdf')
+        response = self.client.post(f'/api/documents/{document.id}/upload_file/', {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['content_type'], 'application/pdf')
+        self.assertEqual(response.data['sha256'], hashlib.sha256(body).hexdigest())
+        document.refresh_from_db()
+        self.assertEqual(document.file_size, len(body))
+
+
+class ExportTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        MedicalRecord.objects.bulk_create([
+            MedicalRecord(pet=self.pet, record_type='vaccination', title=f'Прививка, доза {i}', description='',
+                          date=date(2025, 1, 1) + timedelta(days=i), cost='100.00')
+            for i in range(50)
+        ])
+        Reminder.objects.create(pet=self.pet, reminder_type='examination', title='Осмотр', due_date=date(2025, 6, 1))
+
+    def export(self, export_type):
+        response = self.client.get(f'/api/pets/{self.pet.id}/export/', {'type': export_type})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_round_trips_through_importer(self):
+        body = self.export('csv')
+        rows = list(csv.DictReader(io.StringIO(body.decode('utf-8'))))
+        self.assertEqual(len(rows), 51)
+        self.assertEqual(rows[0]['title'], 'Прививка, доза 0')
+        self.assertEqual(rows[-1]['kind'], 'reminder')
+
+        # Выгрузка загружается обратно импортом в аккаунт клиники
+        other = User.objects.create_user(username='clinic', password='secret-pass-123')
+        Pet.objects.create(name='Барсик', owner=other)
+        path = os.path.join(self.media_root, 'export.csv')
+        with open(path, 'wb') as f:
+            f.write(body.replace(b'record,owner,', b'record,clinic,'))
+        call_command('import_medical_history', path, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(MedicalRecord.objects.filter(pet__owner=other).count(), 50)
+
+    def test_jsonl(self):
+        lines = [json.loads(line) for line in self.export('jsonl').decode('utf-8').splitlines()]
+        self.assertEqual(lines[0]['kind'], 'pet')
+        self.assertEqual(lines[0]['name'], 'Барсик')
+        self.assertEqual(sum(line['kind'] == 'record' for line in lines), 50)
+
+    def test_zip_bundles_documents(self):
+        body = b'%PDF-1.4 ' + os.urandom(200_000)
+        document = PetDocument.objects.create(
+            pet=self.pet, owner=self.user, document_type='medical', title='Справка',
+            file=SimpleUploadedFile('cert.pdf', body),
+        )
+        archive = zipfile.ZipFile(io.BytesIO(self.export('zip')))
+        self.assertIsNone(archive.testzip())
+        name = f'documents/{document.id}_{os.path.basename(document.file.name)}'
+        self.assertEqual(archive.read(name), body)
+        self.assertIn('Справка', archive.read('history.jsonl').decode('utf-8'))
+        self.assertEqual(len(archive.read('history.csv').decode('utf-8').splitlines()), 52)
+
+    async def test_asgi_streams_blocks_without_buffering(self):
+        produced = []
+        original = csv_lines
+
+        def counting_lines(pet):
+            for line in original(pet):
+                produced.append(line)
+                yield line
+
+        with mock.patch('pets.export.csv_lines', side_effect=counting_lines):
+            response = await self.async_client.get(f'/api/pets/{self.pet.id}/export/', {'type': 'csv'},
+                                                   AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_async)
+            content = aiter(response.streaming_content)
+            first = await anext(content)
+            self.assertTrue(first.startswith(b'kind,owner,pet'))
+            # Заголовок отдан, а строки из базы еще не прочитаны
+            self.assertEqual(len(produced), 1)
+            rest = b''.join([block async for block in content])
+        self.assertEqual(len((first + rest).decode('utf-8').splitlines()), 52)
+
+    def test_export_is_owner_scoped(self):
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='stranger', password='secret-pass-123'))
+        self.assertEqual(other.get(f'/api/pets/{self.pet.id}/export/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/pets/{self.pet.id}/export/', {'type': 'xml'}).status_code, 400)
+
+
+class DocumentBlobTests(MediaTestCase):
+    body = b'%PDF-1.4 vaccination certificate'
+
+    def create_document(self, pet):
+        upload = SimpleUploadedFile('cert.pdf', self.body, content_type='application/pdf')
+        response = self.client.post('/api/documents/', {
+            'pet': pet.id, 'document_type': 'vaccination', 'title': 'Сертификат', 'file': upload,
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        return PetDocument.objects.get(id=response.data['id'])
+
+    def test_identical_content_is_stored_once(self):
+        other_pet = Pet.objects.create(name='Мурка', owner=self.user)
+        first = self.create_document(self.pet)
+        second = self.create_document(other_pet)
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(first.file.name, second.file.name)
+        blob = DocumentBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(blob.sha256, hashlib.sha256(self.body).hexdigest())
+        self.assertEqual(second.file_size, len(self.body))
+
+    def test_concurrent_insert_reuses_existing_blob(self):
+        sha256 = hashlib.sha256(self.body).hexdigest()
+        winner = DocumentBlob(sha256=sha256, size=len(self.body), ref_count=1)
+        winner.file.name = 'blobs/winner.pdf'
+        winner.save()
+        # Проверка существующего blob проходит до того, как его создал другой запрос
+        real_filter = DocumentBlob.objects.filter
+        calls = []
+
+        def racing_filter(*args, **kwargs):
+            queryset = real_filter(*args, **kwargs)
+            if kwargs.get('sha256') == sha256 and not calls:
+                calls.append(1)
+                return queryset.none()
+            return queryset
+
+        upload = SimpleUploadedFile('cert.pdf', self.body, content_type='application/pdf')
+        with mock.patch.object(DocumentBlob.objects, 'filter', side_effect=racing_filter):
+            blob, created = acquire_blob(upload)
+        self.assertFalse(created)
+        self.assertEqual(blob.pk, winner.pk)
+        self.assertEqual(blob.ref_count, 2)
+        self.assertFalse(default_storage.exists(blob_upload_path(winner, 'cert.pdf')))
+
+    def test_blob_removed_with_last_reference(self):
+        other_pet = Pet.objects.create(name='Мурка', owner=self.user)
+        first = self.create_document(self.pet)
+        self.create_document(other_pet)
+        path = first.file.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/documents/{first.id}/')
+        self.assertEqual(DocumentBlob.objects.get().ref_count, 1)
+        self.assertTrue(os.path.exists(path))
+
+        # Каскадное удаление вместе с питомцем тоже освобождает ссылку
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/pets/{other_pet.id}/')
+        self.assertFalse(DocumentBlob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_upload_file_skips_write_for_known_content(self):
+        first = self.create_document(self.pet)
+        second = PetDocument.objects.create(
+            pet=self.pet, owner=self.user, document_type='medical', title='Справка',
+            file=SimpleUploadedFile('old.txt', b'old'),
+        )
+        upload = SimpleUploadedFile('copy.pdf', self.body, content_type='application/pdf')
+        response = self.client.post(f'/api/documents/{second.id}/upload_file/', {'file': upload})
+        self.assertTrue(response.data['deduplicated'])
+        second.refresh_from_db()
+        self.assertEqual(second.blob_id, first.blob_id)
+        self.assertEqual(DocumentBlob.objects.get().ref_count, 2)
+
+    def test_failed_save_does_not_leak_reference(self):
+        self.create_document(self.pet)
+        upload = SimpleUploadedFile('cert.pdf', self.body, content_type='application/pdf')
+        with mock.patch.object(PetDocument, 'save', side_effect=DatabaseError('disk full')):
+            with self.assertRaises(DatabaseError):
+                self.client.post('/api/documents/', {
+                    'pet': self.pet.id, 'document_type': 'vaccination', 'title': 'Копия', 'file': upload,
+                })
+        self.assertEqual(DocumentBlob.objects.get().ref_count, 1)
+
+    def test_backfill_moves_legacy_files_into_blobs(self):
+        legacy = [
+            PetDocument.objects.create(
+                pet=self.pet, owner=self.user, document_type='medical', title=f'Справка {i}',
+                file=SimpleUploadedFile(f'legacy_{i}.pdf', self.body),
+            )
+            for i in range(2)
+        ]
+        missing = PetDocument.objects.bulk_create([PetDocument(
+            pet=self.pet, owner=self.user, document_type='other', title='Потерян', file='documents/lost.pdf',
+        )])[0]
+        paths = [document.file.path for document in legacy]
+        stderr = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('backfill_document_blobs', batch_size=1, stdout=io.StringIO(), stderr=stderr)
+
+        blob = DocumentBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(blob.sha256, hashlib.sha256(self.body).hexdigest())
+        for document in legacy:
+            document.refresh_from_db()
+            self.assertEqual(document.blob_id, blob.pk)
+            self.assertEqual(document.file.name, blob.file.name)
+        self.assertTrue(all(not os.path.exists(path) for path in paths))
+        self.assertTrue(default_storage.exists(blob.file.name))
+        missing.refresh_from_db()
+        self.assertIsNone(missing.blob_id)
+        self.assertIn(f'Документ {missing.pk}', stderr.getvalue())
+
+
+@override_settings(IMAGE_VARIANTS_ASYNC=False)
+class ImageVariantTests(MediaTestCase):
+    def make_jpeg(self, size=(1600, 1200)):
+        from io import BytesIO
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.new('RGB', size, (200, 120, 40)).save(buffer, 'JPEG')
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_variants_generated_after_upload(self):
+        from PIL import Image
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/pets/{self.pet.id}/upload_image/', {'image': self.make_jpeg()})
+        self.assertEqual(response.status_code, 200)
+
+        self.pet.refresh_from_db()
+        self.assertEqual(set(self.pet.image_variants), {
+            'thumb_webp', 'thumb_jpg', 'small_webp', 'small_jpg', 'medium_webp', 'medium_jpg',
+        })
+        with self.pet.image.storage.open(self.pet.image_variants['thumb_webp']) as variant:
+            image = Image.open(variant)
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (128, 96))
+
+        data = self.client.get(f'/api/pets/{self.pet.id}/').data
+        self.assertTrue(data['image_variants']['small_jpg'].startswith('http://testserver/media/'))
+
+    def test_variants_touch_updated_at(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/pets/{self.pet.id}/upload_image/', {'image': self.make_jpeg((300, 300))})
+        earlier = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+        Pet.objects.filter(pk=self.pet.pk).update(updated_at=earlier)
+        self.pet.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            generate_variants(self.pet.pk, self.pet.image.name)
+        self.assertEqual(len(callbacks), 1)
+        self.pet.refresh_from_db()
+        self.assertGreater(self.pet.updated_at, earlier)
+
+    def test_replacing_image_drops_old_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/pets/{self.pet.id}/upload_image/', {'image': self.make_jpeg()})
+        self.pet.refresh_from_db()
+        old_thumb = self.pet.image.storage.path(self.pet.image_variants['thumb_jpg'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/pets/{self.pet.id}/upload_image/', {'image': self.make_jpeg((300, 300))})
+        self.pet.refresh_from_db()
+        self.assertFalse(os.path.exists(old_thumb))
+        self.assertEqual(len(self.pet.image_variants), 6)
+
+
+class PetOverviewTests(PetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def seed_pet(self, name):
+        pet = Pet.objects.create(name=name, owner=self.user)
+        today = date.today()
+        MedicalRecord.objects.bulk_create([
+            MedicalRecord(pet=pet, record_type='examination', title=f'Осмотр {i}', description='',
+                          date=today - timedelta(days=i), cost='100.50')
+            for i in range(8)
+        ])
+        Reminder.objects.bulk_create([
+            Reminder(pet=pet, reminder_type='vaccination', title='Прошедшее', due_date=today - timedelta(days=3)),
+            Reminder(pet=pet, reminder_type='vaccination', title='Выполненное', due_date=today, is_completed=True),
+        ] + [
+            Reminder(pet=pet, reminder_type='deworming', title=f'Будущее {i}', due_date=today + timedelta(days=i))
+            for i in range(7)
+        ])
+        PetDocument.objects.bulk_create([
+            PetDocument(pet=pet, owner=self.user, document_type='medical', title='Справка', file='documents/x.pdf')
+            for _ in range(3)
+        ])
+        return pet
+
+    def test_detail_overview(self):
+        pet = self.seed_pet('Барсик')
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/pets/{pet.id}/overview/?records=3')
+        data = response.data
+        self.assertEqual(data['name'], 'Барсик')
+        self.assertEqual([r['title'] for r in data['latest_records']], ['Осмотр 0', 'Осмотр 1', 'Осмотр 2'])
+        self.assertEqual(len(data['upcoming_reminders']), 5)
+        self.assertEqual(data['upcoming_reminders'][0]['title'], 'Будущее 0')
+        self.assertEqual(data['document_count'], 3)
+        self.assertEqual(data['total_cost'], '804.00')
+
+    def test_list_overview_query_count_is_constant(self):
+        self.seed_pet('Барсик')
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/api/pets/overview/')
+        for i in range(5):
+            self.seed_pet(f'Питомец {i}')
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get('/api/pets/overview/')
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(response.data['count'], 6)
+        for item in response.data['results']:
+            self.assertEqual(len(item['latest_records']), 5)
+            self.assertEqual(item['document_count'], 3)
+
+    def test_pet_without_history(self):
+        pet = Pet.objects.create(name='Новый', owner=self.user)
+        data = self.client.get(f'/api/pets/{pet.id}/overview/').data
+        self.assertEqual(data['latest_records'], [])
+        self.assertEqual(data['document_count'], 0)
+        self.assertEqual(data['total_cost'], '0.00')
+
+
+class CollectingSender:
+    def __init__(self):
+        self.batches = []
+
+    def send(self, digests):
+        self.batches.append(digests)
+
+
+class ReminderScannerTests(PetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = date(2025, 3, 1)
+        self.owners = [
+            User.objects.create_user(username=f'owner{i}', email=f'owner{i}@example.com')
+            for i in range(3)
+        ]
+        self.pets = [Pet.objects.create(name=f'Питомец {i}', owner=owner) for i, owner in enumerate(self.owners)]
+
+    def add(self, pet, days, completed=False):
+        return Reminder.objects.create(
+            pet=pet, reminder_type='vaccination', title='Прививка',
+            due_date=self.today + timedelta(days=days), is_completed=completed,
+        )
+
+    def scanner(self, sender, **kwargs):
+        return ReminderScanner(sender, today=self.today, horizon_days=2, chunk_size=2, **kwargs)
+
+    def test_groups_due_reminders_per_owner(self):
+        for pet in self.pets:
+            self.add(pet, 0)
+            self.add(pet, 1)
+        self.add(self.pets[0], 5)
+        self.add(self.pets[1], 0, completed=True)
+
+        sender = CollectingSender()
+        self.assertEqual(self.scanner(sender).run(), 6)
+        self.assertEqual(len(sender.batches), 1)
+        digests = {d.username: d for d in sender.batches[0]}
+        self.assertEqual(set(digests), {'owner0', 'owner1', 'owner2'})
+        self.assertEqual(len(digests['owner0'].items), 2)
+
+    def test_does_not_rescan_processed_rows(self):
+        self.add(self.pets[0], 0)
+        sender = CollectingSender()
+        self.scanner(sender).run()
+        self.assertEqual(self.scanner(sender).run(), 0)
+
+        later = self.add(self.pets[1], 1)
+        self.assertEqual(self.scanner(sender).run(), 1)
+        self.assertEqual(sender.batches[-1][0].items[0]['id'], later.id)
+        state = ReminderScanState.objects.get(name='default')
+        self.assertEqual((state.last_due_date, state.last_id, state.processed), (later.due_date, later.id, 2))
+
+    def test_flushes_in_bounded_batches(self):
+        for _ in range(5):
+            self.add(self.pets[0], 0)
+        sender = CollectingSender()
+        self.assertEqual(self.scanner(sender, flush_size=2).run(), 5)
+        self.assertEqual([sum(len(d.items) for d in batch) for batch in sender.batches], [2, 2, 1])
+
+    def test_late_inserts_behind_the_mark_are_sent_once(self):
+        self.add(self.pets[0], 2)
+        sender = CollectingSender()
+        self.assertEqual(self.scanner(sender).run(), 1)
+        # Создано после прохода до today+2, но со сроком раньше отметки
+        late = [self.add(self.pets[1], 0), self.add(self.pets[2], -1), self.add(self.pets[0], 2)]
+        ahead = self.add(self.pets[1], 3)
+        sent = len(sender.batches)
+        self.assertEqual(self.scanner(sender).run(), 3)
+        ids = [item['id'] for batch in sender.batches[sent:] for digest in batch for item in digest.items]
+        self.assertEqual(sorted(ids), [r.id for r in late])
+        self.assertEqual(self.scanner(sender).run(), 0)
+        scanner = ReminderScanner(sender, today=self.today + timedelta(days=1), horizon_days=2, chunk_size=2)
+        self.assertEqual(scanner.run(), 1)
+        self.assertEqual(sender.batches[-1][0].items[0]['id'], ahead.id)
+        self.assertEqual(scanner.run(), 0)
+
+    def test_first_run_skips_old_history(self):
+        self.add(self.pets[0], -400)
+        recent = self.add(self.pets[0], -3)
+        sender = CollectingSender()
+        self.assertEqual(self.scanner(sender, lookback_days=7).run(), 1)
+        self.assertEqual(sender.batches[0][0].items[0]['id'], recent.id)
+        self.add(self.pets[1], -30)
+        self.assertEqual(self.scanner(sender, lookback_days=7).run(), 0)
+
+
+class ResponseCacheTests(PetsTestCase):
+    def setUp(self):
+        super().setUp()
+        reset_cache_stats()
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.pet = Pet.objects.create(name='Барсик', owner=self.user)
+
+    @override_settings(PETS_SINGLE_PROCESS=False)
+    def test_process_local_cache_disables_response_cache(self):
+        self.assertEqual([message.id for message in check_shared_cache()], ['pets.E001'])
+        with self.assertLogs('pets', 'ERROR'):
+            report_on_startup()
+        for _ in range(2):
+            response = self.client.get('/api/pets/')
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('X-Cache', response)
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_shared_cache(), [])
+
+    def test_repeated_list_is_served_from_cache(self):
+        first = self.client.get('/api/pets/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/pets/')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_child_change_invalidates_owner_responses(self):
+        self.client.get(f'/api/pets/{self.pet.id}/overview/')
+        self.client.get('/api/reminders/')
+        self.client.post('/api/reminders/', {
+            'pet': self.pet.id, 'reminder_type': 'vaccination', 'title': 'Прививка',
+            'due_date': (date.today() + timedelta(days=3)).isoformat(),
+        })
+        reminders = self.client.get('/api/reminders/')
+        self.assertEqual(reminders['X-Cache'], 'MISS')
+        self.assertEqual(reminders.data['count'], 1)
+        overview = self.client.get(f'/api/pets/{self.pet.id}/overview/')
+        self.assertEqual(len(overview.data['upcoming_reminders']), 1)
+
+    def test_cascade_delete_invalidates(self):
+        MedicalRecord.objects.create(pet=self.pet, record_type='examination', title='Осмотр',
+                                     description='', date=date(2024, 1, 1))
+        self.assertEqual(self.client.get('/api/medical-records/').data['count'], 1)
+        self.pet.delete()
+        self.assertEqual(self.client.get('/api/medical-records/').data['count'], 0)
+
+    def test_users_do_not_share_entries(self):
+        self.client.get('/api/pets/')
+        other = User.objects.create_user(username='other', password='secret-pass-123')
+        client = APIClient()
+        client.force_authenticate(other)
+        response = client.get('/api/pets/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 0)
+
+
+class CatalogSnapshotTests(PetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.clinic = Partner.objects.create(name='Клиника', partner_type='clinic', address='ул. Ленина, 1')
+        self.pharmacy = Partner.objects.create(name='Аптека', partner_type='pharmacy', address='ул. Мира, 2')
+        ProductOrService.objects.create(name='Корм', category='food', description='', price='10.00', partner=self.clinic)
+        ProductOrService.objects.create(name='Таблетки', category='medicine', description='', price='5.50', partner=self.pharmacy)
+        ProductOrService.objects.create(name='Игрушка', category='toys', description='', price='3.00',
+                                        partner=self.pharmacy, is_available=False)
+
+    def test_filters_match_database_and_skip_queries(self):
+        self.client.get('/api/products-services/')
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/api/products-services/?partner={self.pharmacy.id}')
+        self.assertEqual([item['name'] for item in response.data['results']], ['Таблетки'])
+        self.assertEqual(response.data['results'][0]['partner_name'], 'Аптека')
+        self.assertEqual(response.data['results'][0]['price'], '5.50')
+
+        names = [item['name'] for item in self.client.get('/api/partners/?category=clinic').data['results']]
+        self.assertEqual(names, ['Клиника'])
+        self.assertEqual(self.client.get('/api/products-services/?category=toys').data['count'], 0)
+
+    def test_categories(self):
+        response = self.client.get('/api/products-services/categories/')
+        self.assertEqual(response.data, {'categories': ['food', 'medicine', 'toys']})
+
+    def test_etag_not_modified(self):
+        first = self.client.get('/api/products-services/')
+        response = self.client.get('/api/products-services/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        other = self.client.get('/api/products-services/?category=food')
+        self.assertNotEqual(other['ETag'], first['ETag'])
+
+    def test_change_rebuilds_snapshot(self):
+        first = self.client.get('/api/products-services/')
+        ProductOrService.objects.create(name='Шампунь', category='care', description='', price='7.00', partner=self.clinic)
+        response = self.client.get('/api/products-services/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+
+    def test_retrieve_hides_unavailable(self):
+        hidden = ProductOrService.objects.get(name='Игрушка')
+        self.assertEqual(self.client.get(f'/api/products-services/{hidden.id}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/partners/{self.clinic.id}/').data['name'], 'Клиника')
+
+
+class CatalogSearchTests(PetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.clinic = Partner.objects.create(name='Клиника', partner_type='clinic', address='ул. Ленина, 1')
+        self.pharmacy = Partner.objects.create(name='Аптека', partner_type='pharmacy', address='ул. Мира, 2')
+        self.food = ProductOrService.objects.create(name='Корм для кошек', category='food',
+                                                    description='Сухой корм', price='450.00', partner=self.clinic)
+        ProductOrService.objects.create(name='Витамины', category='medicine', description='Добавка к корму',
+                                        price='1200.00', partner=self.pharmacy)
+        ProductOrService.objects.create(name='Капли от блох', category='medicine', description='',
+                                        price='800.00', partner=self.pharmacy)
+        ProductOrService.objects.create(name='Корм старый', category='food', description='',
+                                        price='100.00', partner=self.clinic, is_available=False)
+
+    def search(self, **params):
+        response = self.client.get('/api/products-services/search/', params)
+        self.assertEqual(response.status_code, 200, getattr(response, 'data', None))
+        return response.data
+
+    def test_results_and_facets_in_one_call(self):
+        data = self.search(q='корм')
+        # Совпадение в названии выше совпадения в описании, недоступные скрыты
+        self.assertEqual([item['name'] for item in data['results']], ['Корм для кошек', 'Витамины'])
+        self.assertEqual(data['facets']['category'], {'food': 1, 'medicine': 1})
+        self.assertEqual(data['facets']['price'], {'0-500': 1, '1000-2500': 1})
+
+        data = self.search()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(data['facets']['partner_type'], {'clinic': 1, 'pharmacy': 2})
+
+    def test_filters_keep_alternatives_in_own_facet(self):
+        data = self.search(category='medicine', max_price='1000')
+        self.assertEqual([item['name'] for item in data['results']], ['Капли от блох'])
+        self.assertEqual(data['facets']['category'], {'food': 1, 'medicine': 1})
+        self.assertEqual(data['facets']['partner_type'], {'pharmacy': 1})
+        self.assertEqual(self.client.get('/api/products-services/search/', {'min_price': 'abc'}).status_code, 400)
+
+    def test_search_visits_only_index_candidates(self):
+        self.search()
+        facet_values = CatalogSnapshot.facet_values
+        with mock.patch.object(CatalogSnapshot, 'facet_values', autospec=True, side_effect=facet_values) as visited:
+            data = self.search(q='кошек')
+            self.assertEqual(visited.call_count, 1)
+            self.assertEqual(data['facets']['category'], {'food': 1})
+            data = self.search(q='кошек блох')
+        self.assertEqual(visited.call_count, 1)
+        self.assertEqual(data['results'], [])
+        self.assertEqual(data['facets'], {'category': {}, 'partner_type': {}, 'price': {}})
+
+    def test_product_change_updates_snapshot_incrementally(self):
+        self.search()
+        with mock.patch.object(CatalogSnapshot, 'build', side_effect=AssertionError('full rebuild')):
+            self.food.name = 'Паштет'
+            self.food.price = '3000.00'
+            self.food.save()
+            with self.assertNumQueries(1):
+                data = self.search(q='паштет')
+            self.assertEqual(data['count'], 1)
+            self.assertEqual(data['facets']['price'], {'2500-5000': 1})
+            self.assertEqual(self.search(q='кошек')['count'], 0)
+            self.food.delete()
+            self.assertEqual(self.search()['facets']['category'], {'medicine': 2})
+
+    def test_partner_change_rebuilds_snapshot(self):
+        self.search()
+        self.pharmacy.partner_type = 'clinic'
+        self.pharmacy.save()
+        self.assertEqual(self.search()['facets']['partner_type'], {'clinic': 3})
+
+
+class ConditionalGetTests(PetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.pet = Pet.objects.create(name='Барсик', owner=self.user)
+        self.record = MedicalRecord.objects.create(
+            pet=self.pet, record_type='examination', title='Осмотр', description='', date=date(2024, 1, 1),
+        )
+
+    def test_models_track_updates(self):
+        for model in (Pet, MedicalRecord, Reminder, PetDocument, Partner, ProductOrService):
+            self.assertTrue(model._meta.get_field('updated_at').auto_now, model.__name__)
+        data = self.client.get(f'/api/medical-records/{self.record.id}/').data
+        self.assertIn('updated_at', data)
+
+    def test_if_none_match(self):
+        first = self.client.get('/api/medical-records/')
+        self.assertTrue(first['ETag'].startswith('W/'))
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/medical-records/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        detail = self.client.get(f'/api/pets/{self.pet.id}/')
+        response = self.client.get(f'/api/pets/{self.pet.id}/', HTTP_IF_NONE_MATCH=detail['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_wildcard_requires_existing_object(self):
+        response = self.client.get(f'/api/pets/{self.pet.id + 100}/', HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(f'/api/pets/{self.pet.id}/', HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('ETag', response)
+
+    @override_settings(PETS_SINGLE_PROCESS=False)
+    def test_row_validators_without_shared_cache(self):
+        first = self.client.get('/api/medical-records/')
+        self.assertNotIn('Last-Modified', first)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/medical-records/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        # Изменение в другом воркере: версия этого процесса о нем не знает
+        later = self.record.updated_at + timedelta(seconds=1)
+        MedicalRecord.objects.filter(pk=self.record.pk).update(title='Повторный осмотр', updated_at=later)
+        with mock.patch('pets.conditional.get_data_version', side_effect=AssertionError('process version')):
+            response = self.client.get('/api/medical-records/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['title'], 'Повторный осмотр')
+
+        second = response['ETag']
+        Pet.objects.filter(pk=self.pet.pk).update(name='Мурзик', updated_at=later)
+        response = self.client.get('/api/medical-records/', HTTP_IF_NONE_MATCH=second)
+        self.assertEqual(response.status_code, 200)
+        detail = self.client.get(f'/api/medical-records/{self.record.id}/')
+        MedicalRecord.objects.filter(pk=self.record.pk).delete()
+        response = self.client.get('/api/medical-records/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.data['count'], 0)
+        response = self.client.get(f'/api/medical-records/{self.record.id}/', HTTP_IF_NONE_MATCH=detail['ETag'])
+        self.assertEqual(response.status_code, 404)
+
+    def test_delete_changes_validators(self):
+        first = self.client.get('/api/medical-records/')
+        self.record.delete()
+        response = self.client.get('/api/medical-records/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 0)
+
+    def test_if_modified_since(self):
+        first = self.client.get('/api/reminders/')
+        response = self.client.get('/api/reminders/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get('/api/reminders/', HTTP_IF_MODIFIED_SINCE='Mon, 01 Jan 2001 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+
+class BulkWriteTests(PetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='clinic', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.pets = [Pet.objects.create(name=f'Питомец {i}', owner=self.user) for i in range(3)]
+        stranger = User.objects.create_user(username='stranger', password='secret-pass-123')
+        self.foreign_pet = Pet.objects.create(name='Чужой', owner=stranger)
+
+    def record(self, pet, i):
+        return {'pet': pet.id, 'record_type': 'treatment', 'title': f'Процедура {i}',
+                'description': 'Визит', 'date': '2025-02-01', 'cost': '150.00'}
+
+    def test_bulk_create_uses_fixed_number_of_queries(self):
+        items = [self.record(self.pets[i % 3], i) for i in range(30)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/medical-records/bulk/', items, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(response.data), 30)
+        self.assertEqual(response.data[0]['pet_name'], 'Питомец 0')
+        self.assertEqual(MedicalRecord.objects.count(), 30)
+        self.assertLessEqual(len(ctx.captured_queries), 5)
+
+    def test_bulk_create_reports_errors_per_item(self):
+        items = [self.record(self.pets[0], 0), self.record(self.foreign_pet, 1), {'pet': self.pets[1].id}]
+        response = self.client.post('/api/medical-records/bulk/', items, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['errors']
+        self.assertEqual(errors[0], {})
+        self.assertIn('pet', errors[1])
+        self.assertIn('title', errors[2])
+        self.assertFalse(MedicalRecord.objects.exists())
+
+    def test_bulk_update(self):
+        reminders = Reminder.objects.bulk_create([
+            Reminder(pet=pet, reminder_type='vaccination', title='Прививка', due_date=date(2025, 5, 1))
+            for pet in self.pets
+        ])
+        self.client.get('/api/reminders/')
+        payload = [{'id': reminder.id, 'is_completed': True} for reminder in reminders]
+        response = self.client.patch('/api/reminders/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(Reminder.objects.filter(is_completed=True).count(), 3)
+        # Кэш ответов сброшен, хотя bulk_update не отправляет сигналов
+        listed = self.client.get('/api/reminders/').data['results']
+        self.assertTrue(all(item['is_completed'] for item in listed))
+
+    def test_bulk_update_rejects_foreign_rows(self):
+        foreign = Reminder.objects.create(pet=self.foreign_pet, reminder_type='other', title='Чужое',
+                                          due_date=date(2025, 5, 1))
+        response = self.client.patch('/api/reminders/bulk/', [{'id': foreign.id, 'title': 'Взлом'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0], {'id': ['Not found.']})
+
+
+class OwnerCopyTests(PetsTestCase):
+    """Копия владельца у записей и напоминаний и индексы (owner, ...) под списки."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.pet = Pet.objects.create(name='Барсик', owner=self.user)
+
+    def test_owner_is_copied_on_every_write_path(self):
+        response = self.client.post('/api/medical-records/', {
+            'pet': self.pet.id, 'record_type': 'examination', 'title': 'Осмотр',
+            'description': 'Плановый', 'date': '2025-01-10',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertNotIn('owner', response.data)
+        self.assertEqual(MedicalRecord.objects.get(pk=response.data['id']).owner_id, self.user.id)
+
+        # Питомец не загружен: владелец берется одним запросом
+        with CaptureQueriesContext(connection) as ctx:
+            reminders = Reminder.objects.bulk_create([
+                Reminder(pet_id=self.pet.id, reminder_type='other', title=f'Напоминание {i}',
+                         due_date=date(2025, 5, 1))
+                for i in range(3)
+            ])
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual({reminder.owner_id for reminder in reminders}, {self.user.id})
+
+    def test_pet_owner_change_moves_rows(self):
+        MedicalRecord.objects.create(pet=self.pet, record_type='other', title='Запись',
+                                     description='', date=date(2025, 1, 1))
+        Reminder.objects.create(pet=self.pet, reminder_type='other', title='Напоминание', due_date=date(2025, 1, 1))
+        other = User.objects.create_user(username='other', password='secret-pass-123')
+        pet = Pet.objects.get(pk=self.pet.pk)
+        pet.owner = other
+        pet.save()
+        self.assertEqual(MedicalRecord.objects.get().owner_id, other.id)
+        self.assertEqual(Reminder.objects.get().owner_id, other.id)
+        self.assertEqual(self.client.get('/api/medical-records/').data['results'], [])
+
+    def test_lists_use_owner_indexes(self):
+        queryset = MedicalRecord.objects.filter(owner=self.user).order_by('-date', '-id')
+        self.assertRegex(queryset.explain(), r'USING (COVERING )?INDEX medrec_owner_date_idx')
+        self.assertNotIn('TEMP B-TREE', queryset.explain())
+        queryset = Reminder.objects.filter(owner=self.user).order_by('due_date', 'id')
+        self.assertRegex(queryset.explain(), r'USING (COVERING )?INDEX reminder_owner_due_idx')
+        self.assertNotIn('TEMP B-TREE', queryset.explain())
+        queryset = filter_reminders(Reminder.objects.filter(owner=self.user), {'overdue': 'true'})
+        self.assertRegex(queryset.explain(), r'USING (COVERING )?INDEX reminder_owner_(done_)?due_idx')
+
+
+class MedicalHistoryImportTests(PetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='clinic', password='secret-pass-123')
+        self.pet = Pet.objects.create(name='Мурка', owner=self.user)
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def csv_file(self, rows=25):
+        lines = ['kind,owner,pet,species,type,title,description,date,cost,is_completed']
+        for i in range(rows):
+            lines.append(f'record,clinic,Мурка,,vaccination,"Прививка, доза {i}",,2025-01-{i % 28 + 1:02d},100.50,')
+        lines.append('reminder,clinic,Рекс,dog,examination,Осмотр,,2025-06-01,,yes')
+        lines.append('record,nobody,Мурка,,other,Потерянная,,2025-01-01,,')
+        return self.write('history.csv', '\n'.join(lines) + '\n')
+
+    def run_import(self, path, *args):
+        call_command('import_medical_history', path, *args, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_import_csv(self):
+        path = self.csv_file()
+        self.run_import(path, '--chunk-size', '10', '--create-pets')
+        self.assertEqual(MedicalRecord.objects.filter(pet=self.pet).count(), 25)
+        self.assertEqual(MedicalRecord.objects.get(title='Прививка, доза 3').date, date(2025, 1, 4))
+        reminder = Reminder.objects.get(pet__name='Рекс')
+        self.assertTrue(reminder.is_completed)
+        self.assertEqual(reminder.pet.species, 'dog')
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual((checkpoint.rows_imported, checkpoint.rows_skipped), (26, 1))
+        self.assertEqual(checkpoint.offset, os.path.getsize(path))
+
+        # Повторный запуск ничего не дублирует
+        self.run_import(path, '--create-pets')
+        self.assertEqual(MedicalRecord.objects.count(), 25)
+
+    def test_resume_after_interruption(self):
+        path = self.csv_file()
+        original = ImportCommand.commit_chunk
+        calls = []
+
+        def crash_on_third(command, *args):
+            calls.append(1)
+            if len(calls) == 3:
+                raise KeyboardInterrupt
+            return original(command, *args)
+
+        with mock.patch.object(ImportCommand, 'commit_chunk', crash_on_third):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_import(path, '--chunk-size', '10')
+        self.assertEqual(MedicalRecord.objects.count(), 20)
+
+        self.run_import(path, '--chunk-size', '10')
+        titles = list(MedicalRecord.objects.values_list('title', flat=True))
+        self.assertEqual(len(titles), 25)
+        self.assertEqual(len(set(titles)), 25)
+        # Без --create-pets строка с неизвестным питомцем пропущена
+        self.assertEqual(ImportCheckpoint.objects.get().rows_skipped, 2)
+
+    def test_import_jsonl_invalidates_cached_responses(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/api/medical-records/').data['count'], 0)
+        rows = [
+            {'owner': 'clinic', 'pet': 'Мурка', 'type': 'treatment', 'title': 'Лечение', 'date': '2025-03-01'},
+            {'owner': 'clinic', 'pet': 'Мурка', 'type': 'treatment', 'title': 'Без даты'},
+        ]
+        path = self.write('history.jsonl', '\n'.join(json.dumps(row, ensure_ascii=False) for row in rows) + '\nnot json\n')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_import(path)
+        self.assertEqual(client.get('/api/medical-records/').data['count'], 1)
+        self.assertEqual(ImportCheckpoint.objects.get().rows_skipped, 2)
+
+    def test_malformed_rows_are_skipped(self):
+        base = {'owner': 'clinic', 'pet': 'Мурка', 'type': 'treatment', 'title': 'Лечение', 'date': '2025-03-01'}
+        rows = [
+            [1, 2], 'строка', None,
+            {**base, 'pet': 5}, {**base, 'title': ['a']}, {**base, 'type': {'x': 1}}, {**base, 'owner': ['clinic']},
+            {**base, 'cost': 'NaN'}, {**base, 'cost': 'Infinity'}, {**base, 'cost': '-sNaN'}, {**base, 'cost': '1e20'},
+            {**base, 'cost': True},
+            {**base, 'cost': '99.999'},
+        ]
+        path = self.write('broken.jsonl', '\n'.join(json.dumps(row, ensure_ascii=False) for row in rows) + '\n')
+        self.run_import(path, '--chunk-size', '4')
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual((checkpoint.rows_imported, checkpoint.rows_skipped), (1, 12))
+        self.assertEqual(checkpoint.offset, os.path.getsize(path))
+        self.assertEqual(MedicalRecord.objects.get().cost, Decimal('100.00'))
+
+    def test_long_pet_names_are_created_once(self):
+        name = 'Очень длинное имя ' * 10
+        rows = [{'owner': 'clinic', 'pet': name, 'title': f'Осмотр {i}', 'date': '2025-03-01'} for i in range(5)]
+        path = self.write('long.jsonl', '\n'.join(json.dumps(row, ensure_ascii=False) for row in rows) + '\n')
+        self.run_import(path, '--chunk-size', '2', '--create-pets')
+        pet = Pet.objects.get(owner=self.user, name__startswith='Очень')
+        self.assertEqual(len(pet.name), 100)
+        self.assertEqual(pet.medical_records.count(), 5)
+
+    def test_empty_csv(self):
+        with self.assertRaisesMessage(CommandError, 'Пустой CSV-файл'):
+            self.run_import(self.write('empty.csv', ''))
+
+
+class SearchIndexTests(PetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.pet = Pet.objects.create(name='Мурка', owner=self.user)
+        stranger = User.objects.create_user(username='stranger', password='secret-pass-123')
+        self.foreign_pet = Pet.objects.create(name='Барсик', owner=stranger)
+
+    def add_record(self, pet, title, description='', **kwargs):
+        return MedicalRecord.objects.create(pet=pet, record_type='treatment', title=title,
+                                            description=description, date=date(2025, 3, 1), **kwargs)
+
+    def search(self, query, **params):
+        response = self.client.get('/api/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['results']
+
+    def test_ranked_and_owner_scoped(self):
+        in_description = self.add_record(self.pet, 'Осмотр', 'Назначена вакцинация через месяц')
+        in_title = self.add_record(self.pet, 'Вакцинация от бешенства')
+        self.add_record(self.foreign_pet, 'Вакцинация')
+        results = self.search('вакцин')
+        self.assertEqual([item['id'] for item in results], [in_title.id, in_description.id])
+        self.assertEqual(results[0]['pet_name'], 'Мурка')
+        self.assertIn('вакцинация', results[1]['snippet'])
+
+    def test_index_follows_writes(self):
+        record = self.add_record(self.pet, 'Чистка зубов', veterinarian='Петров')
+        self.assertEqual(len(self.search('петров')), 1)
+        record.title = 'Удаление зуба'
+        record.save()
+        self.assertEqual(self.search('чистка'), [])
+        self.assertEqual(len(self.search('удаление')), 1)
+        # bulk_create и update() не отправляют сигналов, индекс ведут триггеры
+        MedicalRecord.objects.bulk_create([
+            MedicalRecord(pet=self.pet, record_type='other', title='Анализ крови', description='', date=date(2025, 3, 2))
+        ])
+        self.assertEqual(len(self.search('анализ')), 1)
+        self.pet.name = 'Мурена'
+        self.pet.save()
+        self.assertEqual(len(self.search('мурена зуба')), 1)
+        record.delete()
+        self.assertEqual(self.search('удаление'), [])
+
+    def test_documents_and_type_filter(self):
+        PetDocument.objects.bulk_create([PetDocument(pet=self.pet, owner=self.user, document_type='insurance',
+                                                     title='Полис страхования', file='documents/policy.pdf')])
+        self.add_record(self.pet, 'Страхование оформлено')
+        self.assertEqual(len(self.search('страхов')), 2)
+        self.assertEqual([item['type'] for item in self.search('страхов', type='document')], ['document'])
+        self.assertEqual(self.client.get('/api/search/', {'q': 'x', 'type': 'bad'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/search/').status_code, 400)
+        # Синтаксис FTS5 в запросе не ломает поиск
+        self.assertEqual(self.search('"страхов* OR NOT ('), [])
+
+    def test_admin_search_uses_index(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'secret-pass-123')
+        self.client.force_login(admin_user)
+        self.add_record(self.pet, 'Рентген лапы')
+        self.add_record(self.foreign_pet, 'Стрижка когтей')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/admin/pets/medicalrecord/', {'q': 'рентген'})
+        self.assertContains(response, 'Рентген лапы')
+        self.assertNotContains(response, 'Стрижка когтей')
+        self.assertTrue(any('MATCH' in query['sql'] for query in ctx.captured_queries))
+
+
+class SyncTests(PetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.pet = Pet.objects.create(name='Мурка', owner=self.user)
+        self.record = MedicalRecord.objects.create(pet=self.pet, record_type='treatment', title='Лечение',
+                                                   description='', date=date(2025, 3, 1))
+        stranger = User.objects.create_user(username='stranger', password='secret-pass-123')
+        Pet.objects.create(name='Чужой', owner=stranger)
+
+    def sync(self, token=None, **params):
+        if token:
+            params['token'] = token
+        response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_full_then_delta(self):
+        data = self.sync()
+        self.assertTrue(data['reset'])
+        self.assertEqual([pet['name'] for pet in data['pets']], ['Мурка'])
+        self.assertEqual(len(data['medical_records']), 1)
+
+        empty = self.sync(data['token'])
+        self.assertFalse(empty['reset'])
+        self.assertEqual((empty['pets'], empty['medical_records']), ([], []))
+
+        reminder = Reminder.objects.create(pet=self.pet, reminder_type='other', title='Осмотр', due_date=date(2025, 5, 1))
+        record_id = self.record.id
+        self.record.delete()
+        delta = self.sync(empty['token'])
+        self.assertEqual([item['id'] for item in delta['reminders']], [reminder.id])
+        self.assertEqual(delta['pets'], [])
+        self.assertEqual(delta['deleted']['medical_records'], [record_id])
+
+    def test_bulk_writes_are_tracked(self):
+        token = self.sync()['token']
+        response = self.client.post('/api/reminders/bulk/', [
+            {'pet': self.pet.id, 'reminder_type': 'other', 'title': f'Напоминание {i}', 'due_date': '2025-05-01'}
+            for i in range(3)
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        delta = self.sync(token)
+        self.assertEqual(len(delta['reminders']), 3)
+
+        ids = [item['id'] for item in delta['reminders']]
+        self.client.patch('/api/reminders/bulk/', [{'id': ids[0], 'is_completed': True}], format='json')
+        delta = self.sync(delta['token'])
+        self.assertEqual([item['is_completed'] for item in delta['reminders']], [True])
+
+    def test_pet_delete_sends_single_tombstone(self):
+        token = self.sync()['token']
+        pet_id = self.pet.id
+        self.pet.delete()
+        delta = self.sync(token)
+        self.assertEqual(delta['deleted']['pets'], [pet_id])
+        self.assertEqual(delta['deleted']['medical_records'], [])
+        self.assertFalse(SyncChange.objects.filter(pet_id=pet_id, kind='record').exists())
+
+    def test_paging_and_tokens(self):
+        MedicalRecord.objects.bulk_create([
+            MedicalRecord(pet=self.pet, record_type='other', title=f'Запись {i}', description='', date=date(2025, 1, 1))
+            for i in range(4)
+        ])
+        response = self.client.post('/api/medical-records/bulk/', [
+            {'pet': self.pet.id, 'record_type': 'other', 'title': f'Новая {i}', 'description': 'Визит', 'date': '2025-01-02'}
+            for i in range(4)
+        ], format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        first = self.sync(limit=3)
+        self.assertTrue(first['has_more'])
+        second = self.sync(first['token'], limit=10)
+        self.assertFalse(second['has_more'])
+        self.assertEqual(len(first['pets']) + len(first['medical_records']) + len(second['medical_records']), 6)
+
+        self.assertEqual(self.client.get('/api/sync/', {'token': 'forged'}).status_code, 400)
+        with override_settings(SYNC_TOMBSTONE_DAYS=0), mock.patch('pets.sync.time.time', return_value=time.time() + 10):
+            self.assertTrue(self.sync(second['token'])['reset'])
+
+
+class AsyncReadPathTests(PetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.auth = f'Bearer {AccessToken.for_user(self.user)}'
+        self.pets = [Pet.objects.create(name=f'Питомец {i}', owner=self.user, birth_date=date(2020, 1, 1))
+                     for i in range(25)]
+        Reminder.objects.create(pet=self.pets[0], reminder_type='other', title='Осмотр',
+                                due_date=date.today() + timedelta(days=3))
+        stranger = User.objects.create_user(username='stranger', password='secret-pass-123')
+        self.foreign_pet = Pet.objects.create(name='Чужой', owner=stranger)
+        partner = Partner.objects.create(name='Клиника', partner_type='clinic', address='ул. Ленина, 1')
+        ProductOrService.objects.create(name='Корм', category='food', description='', price='10.00', partner=partner)
+
+    def sync_json(self, path):
+        response = self.client.get(path, HTTP_AUTHORIZATION=self.auth)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    async def test_responses_match_drf(self):
+        for path in ('/api/pets/', '/api/pets/?page=2', f'/api/pets/{self.pets[0].id}/',
+                     '/api/reminders/', '/api/partners/', '/api/products-services/?category=food'):
+            expected = await sync_to_async(self.sync_json)(path)
+            response = await self.async_client.get(path.replace('/api/', '/api/async/'), AUTHORIZATION=self.auth)
+            self.assertEqual(response.status_code, 200, path)
+            data = response.json()
+            for key in ('next', 'previous'):
+                if data.get(key):
+                    data[key] = data[key].replace('/api/async/', '/api/')
+            self.assertEqual(data, expected, path)
+
+    async def test_auth_and_not_found(self):
+        response = await self.async_client.get('/api/async/pets/')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/api/async/pets/', AUTHORIZATION='Bearer broken')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(f'/api/async/pets/{self.foreign_pet.id}/', AUTHORIZATION=self.auth)
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get('/api/async/pets/?page=9', AUTHORIZATION=self.auth)
+        self.assertEqual(response.json(), {'detail': 'Invalid page.'})
+
+    async def test_wildcard_for_missing_pet_is_not_found(self):
+        response = await self.async_client.get(f'/api/async/pets/{self.foreign_pet.id}/', AUTHORIZATION=self.auth,
+                                               IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get(f'/api/async/pets/{self.pets[0].id}/', AUTHORIZATION=self.auth,
+                                               IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(PETS_SINGLE_PROCESS=False)
+    async def test_row_validators_without_shared_cache(self):
+        first = await self.async_client.get('/api/async/pets/', AUTHORIZATION=self.auth)
+        self.assertNotIn('X-Cache', first)
+        response = await self.async_client.get('/api/async/pets/', AUTHORIZATION=self.auth, IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        await Pet.objects.filter(pk=self.pets[0].pk).aupdate(name='Другое имя', updated_at=timezone.now())
+        response = await self.async_client.get('/api/async/pets/', AUTHORIZATION=self.auth, IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    async def test_conditional_and_cached(self):
+        first = await self.async_client.get('/api/async/pets/', AUTHORIZATION=self.auth)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        second = await self.async_client.get('/api/async/pets/', AUTHORIZATION=self.auth)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        response = await self.async_client.get('/api/async/pets/', AUTHORIZATION=self.auth,
+                                               IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        await Pet.objects.acreate(name='Новый', owner=self.user)
+        response = await self.async_client.get('/api/async/pets/', AUTHORIZATION=self.auth,
+                                               IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 26)
+
+
+    async def test_reminder_window_is_checked_before_etag(self):
+        first = await self.async_client.get('/api/async/reminders/', AUTHORIZATION=self.auth)
+        with mock.patch('pets.async_views.aensure_window') as ensured:
+            response = await self.async_client.get('/api/async/reminders/', AUTHORIZATION=self.auth,
+                                                   IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        ensured.assert_awaited_once_with(self.user.pk)
+
+class CachedJWTAuthenticationTests(PetsTestCase):
+    def setUp(self):
+        super().setUp()
+        user_cache.clear()
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.auth = f'Bearer {AccessToken.for_user(self.user)}'
+        Pet.objects.create(name='Барсик', owner=self.user)
+
+    def get(self, path='/api/pets/'):
+        return self.client.get(path, HTTP_AUTHORIZATION=self.auth)
+
+    def test_cached_user_skips_query(self):
+        self.assertEqual(self.get().status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get('/api/pets/?page=1').status_code, 200)
+        self.assertFalse(any('auth_user' in query['sql'] for query in queries.captured_queries))
+
+    def test_deactivation_and_deletion_apply_immediately(self):
+        self.assertEqual(self.get().status_code, 200)
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        self.assertEqual(self.get().status_code, 401)
+        self.user.is_active = True
+        self.user.save(update_fields=['is_active'])
+        self.assertEqual(self.get().status_code, 200)
+        self.user.delete()
+        self.assertEqual(self.get().status_code, 401)
+
+    def test_version_bump_invalidates_other_processes(self):
+        self.assertEqual(self.get().status_code, 200)
+        # Изменение в другом процессе: строка в базе и версия в общем кэше
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.get().status_code, 200)
+        bump_user_version(self.user.pk)
+        self.assertEqual(self.get().status_code, 401)
+
+    @override_settings(PETS_SINGLE_PROCESS=False)
+    def test_process_local_cache_checks_database_every_time(self):
+        self.assertEqual(self.get().status_code, 200)
+        self.assertEqual(user_cache.entries, {})
+        # Деактивация в другом воркере: ни сигнала, ни общей версии здесь нет
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.get().status_code, 401)
+
+    @override_settings(AUTH_USER_CACHE_TTL=0)
+    def test_ttl_bounds_staleness(self):
+        self.assertEqual(self.get().status_code, 200)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.get().status_code, 401)
+
+    @override_settings(AUTH_USER_CACHE_SIZE=2)
+    def test_lru_eviction(self):
+        users = [User.objects.create_user(username=f'user{i}') for i in range(3)]
+        for user in users:
+            user_cache.get(user.pk)
+        self.assertEqual(list(user_cache.entries), [users[1].pk, users[2].pk])
+        self.assertIsNone(user_cache.peek(users[0].pk))
+        self.assertEqual(user_cache.peek(users[2].pk).username, 'user2')
+
+    async def test_async_path_uses_cache(self):
+        response = await self.async_client.get('/api/async/pets/', AUTHORIZATION=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.user.is_active = False
+        await self.user.asave(update_fields=['is_active'])
+        response = await self.async_client.get('/api/async/pets/', AUTHORIZATION=self.auth)
+        self.assertEqual(response.status_code, 401)
+
+
+class AuthTokenTests(PetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.client = APIClient()
+
+    def login(self, password='secret-pass-123', **extra):
+        return self.client.post('/api/auth/login/', {'username': 'owner', 'password': password}, format='json', **extra)
+
+    def test_register_issues_working_tokens(self):
+        response = self.client.post('/api/auth/register/', {
+            'username': 'newcomer', 'email': 'New@Example.COM',
+            'password': 'Kx9-long-password', 'password2': 'Kx9-long-password',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        user = User.objects.get(username='newcomer')
+        self.assertTrue(user.check_password('Kx9-long-password'))
+        self.assertEqual(user.email, 'New@example.com')
+        me = self.client.get('/api/auth/me/', HTTP_AUTHORIZATION=f'Bearer {response.data["access_token"]}')
+        self.assertEqual(me.data['username'], 'newcomer')
+        refreshed = self.client.post('/api/token/refresh/', {'refresh': response.data['refresh_token']}, format='json')
+        self.assertEqual(refreshed.status_code, 200)
+
+    def test_login(self):
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user']['username'], 'owner')
+        me = self.client.get('/api/auth/me/', HTTP_AUTHORIZATION=f'Bearer {response.data["access_token"]}')
+        self.assertEqual(me.status_code, 200)
+        self.assertEqual(self.login('wrong-password').status_code, 401)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.login().status_code, 401)
+        response = self.client.post('/api/auth/login/', {'username': 'ghost', 'password': 'x'}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_token_endpoint_uses_pool_and_throttles(self):
+        with mock.patch('pets.serializers.check_credentials', wraps=check_credentials) as checked:
+            response = self.client.post('/api/token/', {'username': 'owner', 'password': 'secret-pass-123'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        checked.assert_called_once_with('owner', 'secret-pass-123')
+        me = self.client.get('/api/auth/me/', HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.assertEqual(me.status_code, 200)
+        rates = {'auth_ip': '100/min', 'auth_username': '2/min'}
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}):
+            wrong = {'username': 'owner', 'password': 'wrong'}
+            self.assertEqual(self.client.post('/api/token/', wrong, format='json').status_code, 401)
+            self.assertEqual(self.client.post('/api/token/', wrong, format='json').status_code, 429)
+
+    def test_username_throttle_spans_addresses(self):
+        rates = {'auth_ip': '100/min', 'auth_username': '2/min'}
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}):
+            self.assertEqual(self.login('wrong', REMOTE_ADDR='10.0.0.1').status_code, 401)
+            self.assertEqual(self.login('wrong', REMOTE_ADDR='10.0.0.2').status_code, 401)
+            response = self.login(REMOTE_ADDR='10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    @override_settings(AUTH_HASH_WORKERS=1, AUTH_HASH_QUEUE=0)
+    def test_busy_hash_pool_fails_fast(self):
+        started, release = threading.Event(), threading.Event()
+
+        def occupy():
+            started.set()
+            release.wait(5)
+
+        worker = threading.Thread(target=hash_pool.run, args=(occupy,))
+        worker.start()
+        try:
+            started.wait(5)
+            began = time.perf_counter()
+            response = self.login()
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '1')
+            self.assertLess(time.perf_counter() - began, 0.5)
+        finally:
+            release.set()
+            worker.join()
+        self.assertEqual(self.login().status_code, 200)
+
+
+class MetricsTests(PetsTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.auth = f'Bearer {AccessToken.for_user(self.user)}'
+        for i in range(3):
+            Pet.objects.create(name=f'Питомец {i}', owner=self.user)
+
+    def metrics(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return {
+            line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+            for line in response.content.decode().splitlines() if not line.startswith('#')
+        }
+
+    def test_per_route_metrics(self):
+        self.client.get('/api/pets/', HTTP_AUTHORIZATION=self.auth)
+        self.client.get('/api/pets/', HTTP_AUTHORIZATION=self.auth)
+        self.client.get('/api/pets/')
+        metrics = self.metrics()
+        route = 'route="pet-list",method="GET"'
+        self.assertEqual(metrics[f'pets_http_requests_total{{{route},status="200"}}'], 2)
+        self.assertEqual(metrics[f'pets_http_requests_total{{{route},status="401"}}'], 1)
+        self.assertEqual(metrics[f'pets_http_request_duration_seconds_count{{{route}}}'], 3)
+        self.assertEqual(metrics[f'pets_http_request_duration_seconds_bucket{{{route},le="+Inf"}}'], 3)
+        self.assertGreater(metrics[f'pets_db_queries_per_request_sum{{{route}}}'], 0)
+        self.assertGreater(metrics[f'pets_serializer_seconds_total{{{route}}}'], 0)
+        self.assertGreater(metrics[f'pets_render_seconds_total{{{route}}}'], 0)
+        self.assertGreater(metrics[f'pets_http_response_bytes_sum{{{route}}}'], 0)
+        self.assertIn('pets_response_cache_requests_total{result="miss"}', metrics)
+
+    async def test_async_queries_counted(self):
+        await self.async_client.get('/api/async/pets/', AUTHORIZATION=self.auth)
+        metrics = await sync_to_async(self.metrics)()
+        self.assertGreater(metrics['pets_db_queries_per_request_sum{route="async-pet-list",method="GET"}'], 0)
+
+    @override_settings(PETS_SLOW_REQUEST_MS=0)
+    def test_slow_request_log_includes_sql(self):
+        with self.assertLogs('pets.metrics', 'WARNING') as logs:
+            self.client.get('/api/pets/', HTTP_AUTHORIZATION=self.auth)
+        self.assertIn('(pet-list)', logs.output[0])
+        self.assertIn('pets_pet', logs.output[0])
+
+    def test_internal_clients_only_without_token(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.5').status_code, 403)
+        with override_settings(PETS_METRICS_ALLOWED_IPS=('10.0.0.2',)):
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    def test_serializer_time_counts_outer_call_once_without_sql(self):
+        pets = Pet.objects.filter(owner=self.user)
+        stats = RequestStats(capture_sql=False)
+        token = current.set(stats)
+        # Каждый вызов perf_counter — одна «секунда»
+        ticks = iter(range(1000))
+        try:
+            with mock.patch('pets.metrics.time.perf_counter', side_effect=lambda: next(ticks)):
+                data = PetSerializer(pets, many=True).data
+        finally:
+            current.reset(token)
+        self.assertEqual(len(data), 3)
+        # Ленивый запрос к питомцам (1 с) вычитается из 3 с внутри .data
+        self.assertEqual(stats.queries, 1)
+        self.assertEqual(stats.db_seconds, 1)
+        self.assertEqual(stats.serializer_seconds, 2)
+        self.assertFalse(stats.serializing)
+
+    def test_serializers_are_not_patched(self):
+        from rest_framework.serializers import BaseSerializer
+        self.assertFalse(hasattr(BaseSerializer.data.fget, 'metrics_original'))
+
+    @override_settings(PETS_METRICS_TOKEN='scrape-token')
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+
+
+class LoadTestCommandTests(PetsTestCase):
+    """Команда прогоняется в одном потоке через тестовый клиент, без сокетов и сервера."""
+
+    def setUp(self):
+        super().setUp()
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+
+    def send_in_process(self, command, request):
+        path = request.full_url[len(command.base_url):]
+        headers = {key: value for key, value in request.header_items() if key.lower() != 'content-type'}
+        if request.data is None:
+            response = self.client.get(path, headers=headers)
+        else:
+            response = self.client.post(path, request.data, content_type='application/json', headers=headers)
+        return response.status_code, response.getvalue()
+
+    def test_seed_and_load(self):
+        call_command('seed_data', users=2, pets_per_user=2, records_per_pet=3, reminders_per_pet=2,
+                     documents_per_pet=1, partners=3, products_per_partner=3, stdout=io.StringIO())
+        user = User.objects.get(username='seed_user_0')
+        self.assertTrue(user.check_password('seed-password'))
+        self.assertEqual(SyncChange.objects.filter(owner=user, kind='pet').count(), user.pet_set.count())
+        with self.assertRaises(CommandError):
+            call_command('seed_data', users=1, stdout=io.StringIO())
+
+        output = os.path.join(self.workdir, 'run.json')
+        with mock.patch.object(LoadTestCommand, 'send', autospec=True, side_effect=self.send_in_process):
+            call_command('load_test', base_url='http://testserver', users=2, requests=6, concurrency=1,
+                         warmup=0, timeout=2, output=output, stdout=io.StringIO())
+        with open(output, encoding='utf-8') as stream:
+            results = json.load(stream)
+        endpoints = results['endpoints']
+        for name in ('pet-list', 'pet-detail', 'pet-overview', 'medical-record-list', 'search-list',
+                     'product-service-search', 'sync-list'):
+            self.assertEqual(endpoints[name]['requests'], 6, name)
+            self.assertEqual(endpoints[name]['errors'], 0, name)
+            self.assertLessEqual(endpoints[name]['p50_ms'], endpoints[name]['p99_ms'])
+
+        # Сравнение с «быстрым» прошлым прогоном находит регрессию
+        baseline = json.loads(json.dumps(results))
+        baseline['endpoints']['pet-list']['p95_ms'] = 0.01
+        self.assertEqual(len(find_regressions(results, results, 0.2)), 0)
+        results['endpoints']['pet-list']['p95_ms'] = 50.0
+        self.assertEqual(len(find_regressions(results, baseline, 0.2)), 1)
+
+
+class FastListTests(PetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        today = date.today()
+        pets = [
+            Pet.objects.create(name='Барсик', owner=self.user, birth_date=date(2019, today.month, today.day),
+                               weight_kg=Decimal('4.50'), notes='Строка\u2028с разделителем',
+                               image='pets/1/1/photo.jpg', image_variants={'thumb': 'pets/1/1/photo_thumb.webp'}),
+            Pet.objects.create(name='Рекс', owner=self.user, species='dog', image_url='https://example.com/rex.png'),
+        ]
+        Pet.objects.bulk_create([Pet(name=f'Питомец {i}', owner=self.user) for i in range(20)])
+        for i in range(25):
+            pet = pets[i % 2]
+            MedicalRecord.objects.create(pet=pet, record_type='examination', title=f'Осмотр {i}', description='"Кавычки" и \\',
+                                         date=today - timedelta(days=i % 7), cost=Decimal('1250.5') if i % 3 else None)
+            Reminder.objects.create(pet=pet, reminder_type='other', title=f'Напоминание {i}',
+                                    due_date=today + timedelta(days=i - 10), is_completed=bool(i % 2))
+        PetDocument.objects.bulk_create([
+            PetDocument(pet=pets[i % 2], owner=self.user, document_type='medical', title=f'Документ {i}',
+                        file=f'documents/1/1/doc_{i}.pdf' if i % 4 else '', file_size=(i * 70000) or None)
+            for i in range(25)
+        ])
+
+    def get(self, path, fast):
+        cache.clear()
+        renderers = ['pets.renderers.CompactJSONRenderer'] if fast else ['rest_framework.renderers.JSONRenderer']
+        with override_settings(PETS_FAST_LIST=fast,
+                               REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_RENDERER_CLASSES': renderers}):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, path)
+        return response
+
+    def test_output_matches_serializers(self):
+        for name in ('pets', 'medical-records', 'reminders', 'documents'):
+            paths = [f'/api/{name}/', f'/api/{name}/?page=2', f'/api/{name}/?pagination=cursor&page_size=7']
+            while paths:
+                path = paths.pop(0)
+                expected = self.get(path, fast=False)
+                response = self.get(path, fast=True)
+                self.assertEqual(response.content, expected.content, path)
+                cursor = response.json().get('next') if 'cursor' in path else None
+                if cursor:
+                    paths.append(cursor.replace('http://testserver', ''))
+
+    def test_fast_path_skips_model_instances(self):
+        with mock.patch.object(Reminder, 'from_db', side_effect=AssertionError('instance built')):
+            self.get('/api/reminders/', fast=True)
+        with self.assertRaises(AssertionError):
+            with mock.patch.object(Reminder, 'from_db', side_effect=AssertionError('instance built')):
+                self.get('/api/reminders/', fast=False)
+
+    def test_renderer_matches_drf(self):
+        data = {
+            'decimal': Decimal('12.50'), 'date': date(2024, 2, 29), 'text': 'Юникод \u2028 "и" \\',
+            'when': datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc), 'none': None,
+            'nested': [{'id': 1, 'flag': True}, (2, 3.25)], 'big': 2 ** 70, 'lazy': gettext_lazy('Not found.'),
+            1: 'числовой ключ',
+        }
+        expected = JSONRenderer().render(data)
+        self.assertEqual(CompactJSONRenderer().render(data), expected)
+        with mock.patch('pets.renderers.orjson', None):
+            self.assertEqual(CompactJSONRenderer().render(data), expected)
+        self.assertEqual(CompactJSONRenderer().render(data, 'application/json; indent=2'),
+                         JSONRenderer().render(data, 'application/json; indent=2'))
+
+
+class DateAnnotationTests(PetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = date.today()
+        self.pet = Pet.objects.create(name='Барсик', owner=self.user, birth_date=years_ago(3, self.today))
+        Pet.objects.create(name='Котенок', owner=self.user, birth_date=self.today - timedelta(days=30))
+        Pet.objects.create(name='Старик', owner=self.user, birth_date=years_ago(12, self.today) + timedelta(days=1))
+        Pet.objects.create(name='Найденыш', owner=self.user)
+        for offset, completed in ((-5, False), (-1, True), (0, False), (3, False), (7, True), (8, False)):
+            Reminder.objects.create(pet=self.pet, reminder_type='other', title=f'Через {offset}',
+                                    due_date=self.today + timedelta(days=offset), is_completed=completed)
+
+    def titles(self, path, key='title'):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.data)
+        return sorted(item[key] for item in response.data['results'])
+
+    def test_annotations_match_python(self):
+        births = [date(2020, 2, 29), date(2019, 3, 1), date(2019, 2, 28), date(2018, 12, 31), date(2018, 1, 1)]
+        Pet.objects.bulk_create([Pet(name=str(birth), owner=self.user, birth_date=birth) for birth in births])
+        for today in (date(2024, 2, 28), date(2024, 2, 29), date(2025, 2, 28), date(2025, 3, 1), date(2025, 12, 31)):
+            for birth, age in with_age(Pet.objects.filter(owner=self.user), today).values_list('birth_date', 'age'):
+                self.assertEqual(age, pet_age(birth, today), (birth, today))
+            for due, days in with_days_until_due(Reminder.objects.all(), today).values_list('due_date', 'days_until_due'):
+                self.assertEqual(days, days_until(due, today))
+
+    def test_list_values_come_from_database(self):
+        with mock.patch('pets.serializers.pet_age') as pet_age_mock, \
+                mock.patch('pets.serializers.days_until') as days_until_mock:
+            for fast in (True, False):
+                with override_settings(PETS_FAST_LIST=fast):
+                    cache.clear()
+                    ages = {item['name']: item['age'] for item in self.client.get('/api/pets/').data['results']}
+                    self.assertEqual(ages, {'Барсик': 3, 'Котенок': 0, 'Старик': 11, 'Найденыш': None})
+                    days = self.titles('/api/reminders/', 'days_until_due')
+                    self.assertEqual(days, [-5, -1, 0, 3, 7, 8])
+        pet_age_mock.assert_not_called()
+        days_until_mock.assert_not_called()
+
+    def test_reminder_filters(self):
+        self.assertEqual(self.titles('/api/reminders/?overdue=true'), ['Через -5'])
+        self.assertEqual(len(self.titles('/api/reminders/?overdue=false')), 5)
+        self.assertEqual(self.titles('/api/reminders/?completed=true'), ['Через -1', 'Через 7'])
+        self.assertEqual(self.titles('/api/reminders/?due_within=7'), ['Через 0', 'Через 3', 'Через 7'])
+        self.assertEqual(self.titles('/api/reminders/?due_within=7&completed=false&pagination=cursor'),
+                         ['Через 0', 'Через 3'])
+        self.assertEqual(self.titles('/api/reminders/?due_within=0'), ['Через 0'])
+        for query in ('overdue=maybe', 'due_within=-1', 'due_within=week'):
+            self.assertEqual(self.client.get(f'/api/reminders/?{query}').status_code, 400, query)
+
+    def test_pet_age_filters(self):
+        self.assertEqual(self.titles('/api/pets/?age_min=3', 'name'), ['Барсик', 'Старик'])
+        self.assertEqual(self.titles('/api/pets/?age_max=3', 'name'), ['Барсик', 'Котенок'])
+        self.assertEqual(self.titles('/api/pets/?age_min=1&age_max=11', 'name'), ['Барсик', 'Старик'])
+        self.assertEqual(self.titles('/api/pets/overview/?age_max=0', 'name'), ['Котенок'])
+        self.assertEqual(self.client.get('/api/pets/?age_min=old').status_code, 400)
+        # Детальный запрос фильтры не трогают
+        self.assertEqual(self.client.get(f'/api/pets/{self.pet.id}/?age_max=0').status_code, 200)
+
+    async def test_async_filters(self):
+        auth = f'Bearer {AccessToken.for_user(self.user)}'
+        response = await self.async_client.get('/api/async/reminders/?overdue=true', AUTHORIZATION=auth)
+        self.assertEqual([item['title'] for item in response.json()['results']], ['Через -5'])
+        response = await self.async_client.get('/api/async/pets/?age_min=11', AUTHORIZATION=auth)
+        self.assertEqual([item['age'] for item in response.json()['results']], [11])
+        response = await self.async_client.get('/api/async/reminders/?due_within=x', AUTHORIZATION=auth)
+        self.assertEqual(response.status_code, 400)
+
+    def test_filters_use_indexes(self):
+        queryset = filter_pets(Pet.objects.filter(owner=self.user), {'age_min': '2'})
+        self.assertRegex(queryset.explain(), r'USING (COVERING )?INDEX pet_owner_birth_idx')
+        queryset = filter_reminders(Reminder.objects.filter(pet=self.pet), {'overdue': 'true'})
+        self.assertRegex(queryset.explain(), r'USING (COVERING )?INDEX reminder_pet_(done_)?due_idx')
+
+
+@override_settings(REMINDER_WINDOW_DAYS=10)
+class ReminderRuleTests(PetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='owner', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.pet = Pet.objects.create(name='Барсик', owner=self.user)
+        self.today = date.today()
+
+    def create_rule(self, **data):
+        payload = {'pet': self.pet.id, 'reminder_type': 'deworming', 'title': 'Глистогонное',
+                   'start_date': self.today.isoformat(), 'interval': 1, 'unit': 'day', **data}
+        response = self.client.post('/api/reminder-rules/', payload, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return ReminderRule.objects.get(pk=response.data['id'])
+
+    def due_dates(self, rule):
+        return list(rule.occurrences.order_by('due_date').values_list('due_date', flat=True))
+
+    def test_occurrence_dates(self):
+        monthly = ReminderRule(start_date=date(2024, 1, 31), interval=1, unit='month')
+        self.assertEqual(list(occurrences(monthly, date(2024, 1, 1), date(2024, 5, 1))),
+                         [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)])
+        yearly = ReminderRule(start_date=date(2020, 2, 29), interval=1, unit='year', end_date=date(2024, 3, 1))
+        self.assertEqual(list(occurrences(yearly, date(2022, 6, 1), date(2030, 1, 1))),
+                         [date(2023, 2, 28), date(2024, 2, 29)])
+        every_ten = ReminderRule(start_date=date(2024, 1, 1), interval=10, unit='day')
+        self.assertEqual(list(occurrences(every_ten, date(2024, 1, 5), date(2024, 2, 1))),
+                         [date(2024, 1, 11), date(2024, 1, 21), date(2024, 1, 31)])
+        quarterly = ReminderRule(start_date=date(2023, 11, 15), interval=3, unit='month')
+        self.assertEqual(list(occurrences(quarterly, date(2025, 1, 1), date(2025, 12, 31))),
+                         [date(2025, 2, 15), date(2025, 5, 15), date(2025, 8, 15), date(2025, 11, 15)])
+        self.assertEqual(list(occurrences(ReminderRule(start_date=date(9999, 6, 1), interval=1, unit='year'),
+                                          date(9999, 1, 1), date.max)), [date(9999, 6, 1)])
+
+    def test_only_window_is_stored(self):
+        rule = self.create_rule(start_date=(self.today - timedelta(days=400)).isoformat())
+        self.assertEqual(self.due_dates(rule), [self.today + timedelta(days=i) for i in range(11)])
+        self.assertEqual(SyncChange.objects.filter(kind='reminder').count(), 11)
+        results = self.client.get('/api/reminders/?pagination=cursor&page_size=50').data['results']
+        self.assertEqual([item['due_date'] for item in results][:2],
+                         [self.today.isoformat(), (self.today + timedelta(days=1)).isoformat()])
+        self.assertEqual({item['rule'] for item in results}, {rule.id})
+
+        # Окно сдвигается лениво и без дубликатов
+        tomorrow = self.today + timedelta(days=1)
+        self.assertEqual(ensure_window(self.user.pk, tomorrow), 1)
+        self.assertEqual(ensure_window(self.user.pk, tomorrow), 0)
+        self.assertEqual(extend_windows(self.user.pk, tomorrow), 0)
+        self.assertEqual(self.due_dates(rule)[-1], self.today + timedelta(days=11))
+
+    def test_inactive_rules_catch_up_on_list(self):
+        rule = self.create_rule(interval=2)
+        ReminderRule.objects.filter(pk=rule.pk).update(materialized_until=self.today - timedelta(days=3))
+        rule.occurrences.all().delete()
+        cache.clear()
+        self.client.get('/api/reminders/')
+        self.assertEqual(self.due_dates(rule), [self.today + timedelta(days=i) for i in range(0, 11, 2)])
+        ended = self.create_rule(end_date=(self.today + timedelta(days=2)).isoformat())
+        self.assertEqual(len(self.due_dates(ended)), 3)
+        self.assertFalse(pending_rules(self.today + timedelta(days=30)).filter(pk=ended.pk).exists())
+
+    def test_past_occurrences_are_pruned_not_backfilled(self):
+        rule = self.create_rule(interval=1, unit='day')
+        rule.occurrences.filter(due_date=self.today).update(is_completed=True)
+        later = self.today + timedelta(days=45)
+        with mock.patch('pets.reminders.bump_data_version') as bump, \
+                self.captureOnCommitCallbacks(execute=True):
+            # Пользователь не заходил полтора месяца: пропущенные даты не создаются,
+            # невыполненные старше REMINDER_KEEP_OVERDUE_DAYS удаляются
+            self.assertEqual(extend_windows(self.user.pk, later), 10 + 11)
+        self.assertEqual(bump.call_count, 2)
+        self.assertEqual(self.due_dates(rule), [self.today] + [later + timedelta(days=i) for i in range(11)])
+        self.assertEqual(SyncChange.objects.filter(kind='reminder', deleted=True).count(), 10)
+
+    def test_occurrences_range_returns_only_stored_rows_for_past_dates(self):
+        rule = self.create_rule(interval=1, unit='day', start_date=(self.today - timedelta(days=20)).isoformat())
+        done = Reminder.objects.create(pet=self.pet, rule=rule, reminder_type='deworming', title='Глистогонное',
+                                       due_date=self.today - timedelta(days=5), is_completed=True)
+        start, end = self.today - timedelta(days=20), self.today + timedelta(days=15)
+        response = self.client.get(f'/api/reminders/occurrences/?start={start}&end={end}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['due_date'] for item in response.data],
+            [done.due_date.isoformat()] + [(self.today + timedelta(days=i)).isoformat() for i in range(16)],
+        )
+        self.assertEqual(response.data[0]['id'], done.id)
+
+    def test_rule_changes_delete_in_one_statement(self):
+        rule = self.create_rule(interval=1)
+        with mock.patch('pets.reminders.bump_data_version') as bump, \
+                mock.patch('pets.signals.bump_now_and_on_commit') as bump_per_row, \
+                CaptureQueriesContext(connection) as ctx:
+            delete_rule(ReminderRule.objects.select_related('pet').get(pk=rule.pk))
+        self.assertEqual(bump.call_count, 1)
+        bump_per_row.assert_not_called()
+        self.assertFalse(Reminder.objects.exists())
+        self.assertEqual(sum(query['sql'].startswith('DELETE FROM "pets_reminder"') for query in ctx.captured_queries), 1)
+        # Отметки удаления пишутся одним INSERT, а не по строке из обработчика сигнала
+        self.assertEqual(sum(query['sql'].startswith('INSERT INTO "pets_syncchange"') for query in ctx.captured_queries), 1)
+        self.assertEqual(SyncChange.objects.filter(kind='reminder', deleted=True).count(), 11)
+
+    def test_deleting_a_reminder_outside_batches_still_signals(self):
+        reminder = Reminder.objects.create(pet=self.pet, reminder_type='other', title='Разовое', due_date=self.today)
+        pk = reminder.pk
+        reminder.delete()
+        self.assertTrue(SyncChange.objects.filter(kind='reminder', object_id=pk, deleted=True).exists())
+
+    def test_occurrences_range_is_computed_on_the_fly(self):
+        rule = self.create_rule(interval=1, unit='month')
+        Reminder.objects.create(pet=self.pet, reminder_type='other', title='Разовое',
+                                due_date=self.today + timedelta(days=5))
+        start, end = self.today, add_months(self.today, 12)
+        stored = Reminder.objects.count()
+        response = self.client.get(f'/api/reminders/occurrences/?start={start}&end={end}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Reminder.objects.count(), stored)
+        monthly = [item for item in response.data if item['rule'] == rule.id]
+        self.assertEqual([item['due_date'] for item in monthly],
+                         [occurrence(rule, i).isoformat() for i in range(13)])
+        self.assertIsNotNone(monthly[0]['id'])
+        self.assertIsNone(monthly[1]['id'])
+        self.assertEqual(monthly[1]['pet_name'], 'Барсик')
+        self.assertIn('Разовое', [item['title'] for item in response.data])
+        self.assertEqual([item['due_date'] for item in response.data],
+                         sorted(item['due_date'] for item in response.data))
+        for query in ('start=2025-13-01', f'start={start}&end={start - timedelta(days=1)}',
+                      f'start={start}&end={start + timedelta(days=5000)}'):
+            self.assertEqual(self.client.get(f'/api/reminders/occurrences/?{query}').status_code, 400, query)
+
+    def test_update_and_delete_keep_history(self):
+        rule = self.create_rule(interval=5)
+        first = rule.occurrences.get(due_date=self.today)
+        self.client.patch(f'/api/reminders/{first.id}/', {'is_completed': True}, format='json')
+        response = self.client.patch(f'/api/reminder-rules/{rule.id}/', {'interval': 2}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.due_dates(rule), [self.today + timedelta(days=i) for i in range(0, 11, 2)])
+        self.assertTrue(Reminder.objects.get(pk=first.pk).is_completed)
+
+        response = self.client.delete(f'/api/reminder-rules/{rule.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(list(Reminder.objects.values_list('id', 'rule')), [(first.id, None)])
+
+    def test_validation_and_ownership(self):
+        stranger = User.objects.create_user(username='stranger', password='secret-pass-123')
+        foreign = Pet.objects.create(name='Чужой', owner=stranger)
+        base = {'pet': self.pet.id, 'reminder_type': 'other', 'title': 'Осмотр',
+                'start_date': '2025-01-10', 'unit': 'month'}
+        for data in ({'pet': foreign.id}, {'interval': 0}, {'unit': 'week'}, {'end_date': '2025-01-01'}):
+            response = self.client.post('/api/reminder-rules/', {**base, **data}, format='json')
+            self.assertEqual(response.status_code, 400, data)
+        self.assertFalse(ReminderRule.objects.exists())
+        rule = self.create_rule()
+        self.client.force_authenticate(stranger)
+        self.assertEqual(self.client.get('/api/reminder-rules/').data['count'], 0)
+        self.assertEqual(self.client.get(f'/api/reminder-rules/{rule.id}/').status_code, 404)
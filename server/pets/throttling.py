@@ -0,0 +1,30 @@
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class AuthThrottle(SimpleRateThrottle):
+    """Лимиты берутся из DEFAULT_THROTTLE_RATES при каждом запросе, иначе — default_rate"""
+    default_rate = None
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope, self.default_rate)
+
+
+class AuthIPThrottle(AuthThrottle):
+    scope = 'auth_ip'
+    default_rate = '30/min'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class AuthUsernameThrottle(AuthThrottle):
+    """Подбор пароля к одному логину с разных адресов"""
+    scope = 'auth_username'
+    default_rate = '10/min'
+
+    def get_cache_key(self, request, view):
+        username = request.data.get('username')
+        if not isinstance(username, str) or not username:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': username.strip().lower()}
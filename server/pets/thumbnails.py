@@ -0,0 +1,128 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .cache import bump_data_version, bump_now_and_on_commit
+
+logger = logging.getLogger(__name__)
+
+# Размеры вписываются в квадрат, пропорции сохраняются
+VARIANT_SIZES = {
+    'thumb': 128,
+    'small': 320,
+    'medium': 800,
+}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+            thread_name_prefix='pet-image-variants',
+        )
+    return _executor
+
+
+def variant_name(image_name, label, ext):
+    directory, filename = os.path.split(image_name)
+    stem = os.path.splitext(filename)[0]
+    return f'{directory}/variants/{stem}_{label}.{ext}'
+
+
+def render_variants(source):
+    """Возвращает {ключ: (размер, расширение, байты)} для всех вариантов изображения"""
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        rendered = {}
+        for label, size in VARIANT_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            for ext, (fmt, options) in VARIANT_FORMATS.items():
+                frame = resized.convert('RGB') if fmt == 'JPEG' else resized
+                buffer = BytesIO()
+                frame.save(buffer, fmt, **options)
+                rendered[f'{label}_{ext}'] = (label, ext, buffer.getvalue())
+        return rendered
+
+
+def delete_variants(variants, storage=default_storage):
+    for name in (variants or {}).values():
+        if storage.exists(name):
+            storage.delete(name)
+
+
+def generate_variants(pet_id, image_name, storage=default_storage):
+    """
+    Строит уменьшенные копии фото питомца и записывает их в image_variants.
+    Если фото успели заменить, результат отбрасывается.
+    """
+    from .models import Pet
+    from .sync import record_changes
+
+    try:
+        with storage.open(image_name, 'rb') as source:
+            rendered = render_variants(source)
+    except Exception:
+        logger.exception('Не удалось построить варианты изображения %s', image_name)
+        return None
+
+    variants = {}
+    for key, (label, ext, data) in rendered.items():
+        name = variant_name(image_name, label, ext)
+        if storage.exists(name):
+            storage.delete(name)
+        variants[key] = storage.save(name, ContentFile(data))
+
+    with transaction.atomic():
+        pet = Pet.objects.select_for_update().filter(pk=pet_id).first()
+        stale = pet is None or pet.image.name != image_name
+        if not stale:
+            # update() не меняет auto_now и не отправляет post_save: updated_at
+            # (Last-Modified, журнал синхронизации) и версия кэша обновляются явно
+            Pet.objects.filter(pk=pet_id).update(image_variants=variants, updated_at=timezone.now())
+            bump_now_and_on_commit(bump_data_version, pet.owner_id)
+            record_changes(pet.owner_id, [pet])
+    if stale:
+        delete_variants(variants, storage)
+        return None
+    return variants
+
+
+def _run_in_worker(pet_id, image_name):
+    close_old_connections()
+    try:
+        generate_variants(pet_id, image_name)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(pet):
+    """
+    Ставит построение вариантов в очередь после фиксации транзакции, чтобы
+    запрос загрузки не ждал кодирования изображений.
+    """
+    image_name = pet.image.name
+    if not image_name:
+        return
+    if getattr(settings, 'IMAGE_VARIANTS_ASYNC', True):
+        transaction.on_commit(lambda: get_executor().submit(_run_in_worker, pet.pk, image_name))
+    else:
+        transaction.on_commit(lambda: generate_variants(pet.pk, image_name))
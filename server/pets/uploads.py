@@ -0,0 +1,91 @@
+import hashlib
+from collections import namedtuple
+
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+
+
+SNIFF_BYTES = 512
+
+# Сигнатуры (magic bytes) поддерживаемых форматов
+SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'%PDF-', 'application/pdf'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/msword'),
+    (b'PK\x03\x04', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+]
+
+StoredUpload = namedtuple('StoredUpload', ['name', 'size', 'sha256', 'content_type'])
+
+
+def sniff_content_type(head):
+    """Определяет MIME-тип по первым байтам файла, не доверяя заголовку клиента"""
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError as exc:
+        # Чанк мог оборвать многобайтовый символ на конце
+        if exc.start < len(head) - 3:
+            return 'application/octet-stream'
+    return 'text/plain' if head else 'application/octet-stream'
+
+
+def peek_content_type(upload):
+    """Читает только заголовок загруженного файла и возвращает указатель в начало"""
+    upload.seek(0)
+    head = upload.read(SNIFF_BYTES)
+    upload.seek(0)
+    return sniff_content_type(head)
+
+
+class HashingFile(File):
+    """
+    Обертка над загруженным файлом для передачи в storage.save(): файл
+    отдается хранилищу чанками, а размер, SHA-256 и MIME-тип считаются по
+    ходу записи. В памяти одновременно находится только один чанк.
+    """
+
+    def __init__(self, upload):
+        super().__init__(upload, name=upload.name)
+        self.upload = upload
+        self.digest = hashlib.sha256()
+        self.bytes_written = 0
+        self.content_type = None
+
+    def chunks(self, chunk_size=None):
+        self.upload.seek(0)
+        for chunk in self.upload.chunks(chunk_size):
+            if self.content_type is None:
+                self.content_type = sniff_content_type(chunk[:SNIFF_BYTES])
+            self.digest.update(chunk)
+            self.bytes_written += len(chunk)
+            yield chunk
+
+    def read(self, size=-1):
+        # Некоторые хранилища читают файл через read(), а не chunks()
+        chunk = self.upload.read(size)
+        if chunk:
+            if self.content_type is None:
+                self.content_type = sniff_content_type(chunk[:SNIFF_BYTES])
+            self.digest.update(chunk)
+            self.bytes_written += len(chunk)
+        return chunk
+
+
+def save_upload(upload, path, storage=default_storage):
+    """Потоково сохраняет загруженный файл в хранилище за один проход"""
+    wrapped = HashingFile(upload)
+    name = storage.save(path, wrapped)
+    return StoredUpload(
+        name=name,
+        size=wrapped.bytes_written,
+        sha256=wrapped.digest.hexdigest(),
+        content_type=wrapped.content_type or 'application/octet-stream',
+    )
@@ -2,38 +2,76 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework_simplejwt.views import TokenObtainPairView
-from django.contrib.auth import authenticate
-from django.contrib.auth.models import User
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.contrib.auth.models import User, update_last_login
 from django.conf import settings
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Count, DecimalField, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from datetime import date, timedelta
+from decimal import Decimal
 import os
 import uuid
 
-from .models import Pet, MedicalRecord, Reminder, Partner, ProductOrService, PetDocument
+from .models import Pet, MedicalRecord, Reminder, ReminderRule, Partner, ProductOrService, PetDocument
 from .serializers import (
-    UserSerializer, PetSerializer, MedicalRecordSerializer, 
-    ReminderSerializer, PartnerSerializer, ProductOrServiceSerializer,
-    PetDocumentSerializer
+    CredentialsTokenSerializer, UserSerializer, PetSerializer, MedicalRecordSerializer, 
+    ReminderSerializer, ReminderRuleSerializer, PartnerSerializer, ProductOrServiceSerializer,
+    PetDocumentSerializer, PetOverviewSerializer
 )
+from .pagination import PaginationModeMixin
+from .mixins import BulkWriteMixin, RelatedQuerySetMixin
+from .uploads import peek_content_type, save_upload
+from .blobstore import acquire_blob, release_blob
+from .thumbnails import delete_variants, schedule_variants
+from .cache import CachedResponseMixin
+from .conditional import ConditionalGetMixin
+from . import fastlist
+from .fastlist import FastListMixin
+from .catalog import CatalogSnapshotMixin, get_snapshot, parse_id, parse_price
+from . import search
+from .export import EXPORT_FORMATS, export_response
+from .sync import InvalidToken, changes_since, read_token
+from .passwords import check_credentials, hash_password
+from .throttling import AuthIPThrottle, AuthUsernameThrottle
+from .annotations import MAX_WINDOW_DAYS, filter_pets, filter_reminders, with_age, with_days_until_due
+from .reminders import (
+    delete_rule, ensure_window, materialize_rules, reminders_between, rematerialize, window_days,
+)
+
+def issue_tokens(user):
+    """Ответ входа и регистрации: пользователь и пара токенов simplejwt"""
+    refresh = RefreshToken.for_user(user)
+    if jwt_settings.UPDATE_LAST_LOGIN:
+        update_last_login(None, user)
+    return {
+        'user': UserSerializer(user).data,
+        'access_token': str(refresh.access_token),
+        'refresh_token': str(refresh),
+    }
 
 class AuthViewSet(viewsets.ViewSet):
+    """
+    Регистрация и вход сразу выдают access/refresh токены. Хэширование
+    пароля идет в ограниченном пуле (pets.passwords), попытки ограничены
+    по IP и логину; при перегрузке — быстрый 429 с Retry-After.
+    """
     permission_classes = [IsAuthenticated]
+    auth_throttles = [AuthIPThrottle, AuthUsernameThrottle]
 
-    @action(detail=False, methods=['post'], permission_classes=[])
+    @action(detail=False, methods=['post'], permission_classes=[], throttle_classes=auth_throttles)
     def register(self, request):
         serializer = UserSerializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
-            return Response({
-                'user': UserSerializer(user).data,
-                'access_token': user.auth_token.key if hasattr(user, 'auth_token') else None,
-                'refresh_token': None
-            })
+            user = serializer.save(password_hash=hash_password(serializer.validated_data['password']))
+            return Response(issue_tokens(user))
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=False, methods=['post'], permission_classes=[])
+    @action(detail=False, methods=['post'], permission_classes=[], throttle_classes=auth_throttles)
     def login(self, request):
         username = request.data.get('username')
         password = request.data.get('password')
@@ -41,29 +79,144 @@ class AuthViewSet(viewsets.ViewSet):
         if not username or not password:
             return Response({'error': 'Username and password required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        user = authenticate(username=username, password=password)
+        user = check_credentials(username, password)
         if user:
-            return Response({
-                'user': UserSerializer(user).data,
-                'access_token': user.auth_token.key if hasattr(user, 'auth_token') else None,
-                'refresh_token': None
-            })
+            return Response(issue_tokens(user))
         return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
 
     @action(detail=False, methods=['get'])
     def me(self, request):
         return Response(UserSerializer(request.user).data)
 
-class PetViewSet(viewsets.ModelViewSet):
+class TokenObtainView(TokenObtainPairView):
+    """/api/token/ с теми же пулом хэширования и лимитами попыток, что и вход"""
+    serializer_class = CredentialsTokenSerializer
+    throttle_classes = AuthViewSet.auth_throttles
+
+class SearchViewSet(viewsets.ViewSet):
+    """Полнотекстовый поиск по медицинским записям и документам пользователя"""
+    permission_classes = [IsAuthenticated]
+    max_limit = 100
+
+    def list(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Query parameter q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        kind = request.query_params.get('type')
+        if kind and kind not in search.KINDS:
+            return Response({'error': f'type must be one of: {", ".join(search.KINDS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = parse_id(request.query_params.get('limit')) or 20
+        results = search.search(request.user.pk, query, kind=kind, limit=min(max(limit, 1), self.max_limit))
+        return Response({'query': query, 'count': len(results), 'results': results})
+
+class SyncViewSet(viewsets.ViewSet):
+    """
+    Дельта-синхронизация для офлайн-клиента. Без токена (или с устаревшим)
+    отдается полный набор данных и reset=true; дальше — только изменения
+    после токена и id удаленных объектов. При has_more=true запрос повторяют
+    с новым токеном.
+    """
+    permission_classes = [IsAuthenticated]
+    default_limit = 500
+    max_limit = 2000
+
+    def list(self, request):
+        token = request.query_params.get('token')
+        seq = None
+        if token:
+            try:
+                seq = read_token(token)
+            except InvalidToken as exc:
+                return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        limit = parse_id(request.query_params.get('limit')) or self.default_limit
+        limit = min(max(limit, 1), self.max_limit)
+        return Response(changes_since(request.user, seq, limit, {'request': request}))
+
+class PetViewSet(ConditionalGetMixin, CachedResponseMixin, FastListMixin, viewsets.ModelViewSet):
     serializer_class = PetSerializer
+    fast_serializer = fastlist.PET
     permission_classes = [IsAuthenticated]
+    cached_actions = ('list', 'retrieve', 'overview', 'overview_list')
+    conditional_actions = cached_actions
+    overview_actions = ('overview', 'overview_list')
+    overview_default_limit = 5
+    overview_max_limit = 50
 
     def get_queryset(self):
-        return Pet.objects.filter(owner=self.request.user)
+        queryset = Pet.objects.filter(owner=self.request.user)
+        if self.action in self.overview_actions:
+            queryset = self.with_overview(queryset)
+        if self.action in self.cached_actions:
+            # Только чтение: после записи аннотация была бы вычислена по старой дате
+            queryset = with_age(queryset)
+        return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in ('list', 'overview_list'):
+            queryset = filter_pets(queryset, self.request.query_params)
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action in self.overview_actions:
+            return PetOverviewSerializer
+        return super().get_serializer_class()
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
+    def _limit_param(self, name):
+        try:
+            value = int(self.request.query_params.get(name, self.overview_default_limit))
+        except ValueError:
+            value = self.overview_default_limit
+        return max(0, min(value, self.overview_max_limit))
+
+    def with_overview(self, queryset):
+        """
+        Добавляет к питомцам последние записи, ближайшие напоминания и агрегаты.
+        Срезы в Prefetch выполняются одной выборкой на все питомцы страницы,
+        поэтому число запросов не зависит от их количества.
+        """
+        records = MedicalRecord.objects.order_by('-date', '-id')[:self._limit_param('records')]
+        reminders = with_days_until_due(Reminder.objects.filter(
+            is_completed=False, due_date__gte=date.today()
+        )).order_by('due_date', 'id')[:self._limit_param('reminders')]
+        documents = PetDocument.objects.filter(pet=OuterRef('pk')).order_by().values('pet')
+        costs = MedicalRecord.objects.filter(pet=OuterRef('pk')).order_by().values('pet')
+        return queryset.annotate(
+            document_count=Coalesce(Subquery(documents.annotate(n=Count('id')).values('n')), 0),
+            total_cost=Coalesce(
+                Subquery(costs.annotate(total=Sum('cost')).values('total')),
+                Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        ).prefetch_related(
+            Prefetch('medical_records', queryset=records, to_attr='latest_records'),
+            Prefetch('reminders', queryset=reminders, to_attr='upcoming_reminders'),
+        )
+
+    @action(detail=True, methods=['get'])
+    def overview(self, request, pk=None):
+        """Питомец вместе с последними записями, напоминаниями и агрегатами"""
+        return self.conditional_response(request, lambda: self.cached_response(
+            request, lambda: Response(self.get_serializer(self.get_object()).data)
+        ))
+
+    @action(detail=False, methods=['get'], url_path='overview', url_name='overview-list')
+    def overview_list(self, request):
+        return self.list(request)
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        """Полная медицинская история питомца потоком: ?type=csv|jsonl|zip"""
+        export_format = request.query_params.get('type', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': f'type must be one of: {", ".join(EXPORT_FORMATS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        pet = self.get_object()
+        pet.owner = request.user
+        return export_response(pet, export_format, request._request)
+
     @action(detail=True, methods=['post'])
     def upload_image(self, request, pk=None):
         pet = self.get_object()
@@ -72,57 +225,150 @@ class PetViewSet(viewsets.ModelViewSet):
         if not image_file:
             return Response({'error': 'No image file provided'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Проверяем тип файла
-        if image_file.content_type not in settings.ALLOWED_IMAGE_TYPES:
-            return Response({'error': 'Invalid file type'}, status=status.HTTP_400_BAD_REQUEST)
-        
         # Проверяем размер файла
         if image_file.size > settings.MAX_UPLOAD_SIZE:
             return Response({'error': 'File too large'}, status=status.HTTP_400_BAD_REQUEST)
         
+        # Проверяем тип файла по сигнатуре, а не по заголовку клиента
+        if peek_content_type(image_file) not in settings.ALLOWED_IMAGE_TYPES:
+            return Response({'error': 'Invalid file type'}, status=status.HTTP_400_BAD_REQUEST)
+        
         # Генерируем уникальное имя файла
         file_extension = os.path.splitext(image_file.name)[1]
         filename = f"{uuid.uuid4()}{file_extension}"
         
-        # Сохраняем файл
-        file_path = f"pets/{pet.owner.id}/{pet.id}/{filename}"
-        saved_path = default_storage.save(file_path, ContentFile(image_file.read()))
+        # Сохраняем файл потоково, без чтения целиком в память
+        file_path = f"pets/{pet.owner_id}/{pet.id}/{filename}"
+        stored = save_upload(image_file, file_path)
+        saved_path = stored.name
         
-        # Обновляем модель питомца
+        # Обновляем модель питомца; уменьшенные копии строятся в фоне
+        old_variants = pet.image_variants
         pet.image = saved_path
+        pet.image_variants = {}
         pet.save()
+        transaction.on_commit(lambda: delete_variants(old_variants))
+        schedule_variants(pet)
         
         return Response({
             'image_url': request.build_absolute_uri(default_storage.url(saved_path)),
+            'size': stored.size,
+            'sha256': stored.sha256,
             'message': 'Image uploaded successfully'
         })
 
-class MedicalRecordViewSet(viewsets.ModelViewSet):
+class MedicalRecordViewSet(
+    PaginationModeMixin, RelatedQuerySetMixin, BulkWriteMixin,
+    ConditionalGetMixin, CachedResponseMixin, FastListMixin, viewsets.ModelViewSet,
+):
+    select_related_fields = ('pet',)
     serializer_class = MedicalRecordSerializer
+    fast_serializer = fastlist.MEDICAL_RECORD
+    validator_fields = ('updated_at', 'pet__updated_at')
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return MedicalRecord.objects.filter(pet__owner=self.request.user)
+        return MedicalRecord.objects.filter(owner=self.request.user)
 
     def perform_create(self, serializer):
         pet_id = self.request.data.get('pet')
         pet = Pet.objects.get(id=pet_id, owner=self.request.user)
         serializer.save(pet=pet)
 
-class ReminderViewSet(viewsets.ModelViewSet):
+class ReminderViewSet(
+    PaginationModeMixin, RelatedQuerySetMixin, BulkWriteMixin,
+    ConditionalGetMixin, CachedResponseMixin, FastListMixin, viewsets.ModelViewSet,
+):
+    select_related_fields = ('pet',)
     serializer_class = ReminderSerializer
+    fast_serializer = fastlist.REMINDER
+    validator_fields = ('updated_at', 'pet__updated_at')
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Reminder.objects.filter(pet__owner=self.request.user)
+        queryset = Reminder.objects.filter(owner=self.request.user)
+        if self.action in ('list', 'retrieve'):
+            queryset = with_days_until_due(queryset)
+        return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list':
+            queryset = filter_reminders(queryset, self.request.query_params)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        # Окно повторяющихся напоминаний сдвигается до проверки ETag и кэша
+        # (так же в ReminderListView.prepare асинхронного пути)
+        ensure_window(request.user.pk)
+        return super().list(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         pet_id = self.request.data.get('pet')
         pet = Pet.objects.get(id=pet_id, owner=self.request.user)
         serializer.save(pet=pet)
 
-class PetDocumentViewSet(viewsets.ModelViewSet):
+    def _date_param(self, name, default):
+        value = self.request.query_params.get(name)
+        if not value:
+            return default
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise ValidationError({name: ['Date has wrong format. Use YYYY-MM-DD.']})
+
+    @action(detail=False, methods=['get'])
+    def occurrences(self, request):
+        """
+        Напоминания со сроком в [start, end] (по умолчанию — окно правил от
+        сегодня): созданные строки и повторения правил дальше окна, вычисленные
+        на лету; у последних id равен null. За прошедшие даты — только
+        сохраненные строки.
+        """
+        start = self._date_param('start', date.today())
+        end = self._date_param('end', start + timedelta(days=window_days()))
+        if end < start or (end - start).days > MAX_WINDOW_DAYS:
+            raise ValidationError({'end': [f'Must be within {MAX_WINDOW_DAYS} days after start.']})
+        reminders = reminders_between(request.user.pk, start, end)
+        return Response(ReminderSerializer(reminders, many=True, context=self.get_serializer_context()).data)
+
+class ReminderRuleViewSet(viewsets.ModelViewSet):
+    """
+    Правила повторяющихся напоминаний. Хранятся только правила: строки
+    Reminder создаются на окно REMINDER_WINDOW_DAYS вперед и пересоздаются
+    при правке правила.
+    """
+    serializer_class = ReminderRuleSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ReminderRule.objects.filter(pet__owner=self.request.user).select_related('pet')
+
+    def check_pet(self, serializer):
+        pet = serializer.validated_data.get('pet')
+        if pet is not None and pet.owner_id != self.request.user.pk:
+            raise ValidationError({'pet': ['Pet not found.']})
+
+    def perform_create(self, serializer):
+        self.check_pet(serializer)
+        rule = serializer.save()
+        materialize_rules([rule])
+
+    def perform_update(self, serializer):
+        self.check_pet(serializer)
+        rematerialize(serializer.save())
+
+    def perform_destroy(self, instance):
+        delete_rule(instance)
+
+class PetDocumentViewSet(
+    PaginationModeMixin, RelatedQuerySetMixin, ConditionalGetMixin,
+    FastListMixin, viewsets.ModelViewSet,
+):
+    select_related_fields = ('pet',)
     serializer_class = PetDocumentSerializer
+    fast_serializer = fastlist.PET_DOCUMENT
+    validator_fields = ('updated_at', 'pet__updated_at')
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -131,7 +377,31 @@ class PetDocumentViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         pet_id = self.request.data.get('pet')
         pet = Pet.objects.get(id=pet_id, owner=self.request.user)
-        serializer.save(owner=self.request.user, pet=pet)
+        upload = serializer.validated_data.get('file')
+        if upload is None:
+            serializer.save(owner=self.request.user, pet=pet)
+            return
+        # Ссылка на blob и документ фиксируются вместе: при ошибке сохранения счетчик не растет
+        with transaction.atomic():
+            blob, _ = acquire_blob(upload)
+            serializer.save(owner=self.request.user, pet=pet, blob=blob, file=blob.file.name)
+
+    def perform_update(self, serializer):
+        upload = serializer.validated_data.get('file')
+        if upload is None:
+            serializer.save()
+            return
+        with transaction.atomic():
+            old_blob_id = serializer.instance.blob_id
+            blob, _ = acquire_blob(upload)
+            serializer.save(blob=blob, file=blob.file.name)
+            if old_blob_id is not None:
+                release_blob(old_blob_id)
+
+    def perform_destroy(self, instance):
+        # Ссылку освобождает сигнал post_delete, в той же транзакции
+        with transaction.atomic():
+            instance.delete()
 
     @action(detail=True, methods=['post'])
     def upload_file(self, request, pk=None):
@@ -145,24 +415,28 @@ class PetDocumentViewSet(viewsets.ModelViewSet):
         if file_obj.size > settings.MAX_UPLOAD_SIZE:
             return Response({'error': 'File too large'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Генерируем уникальное имя файла
-        file_extension = os.path.splitext(file_obj.name)[1]
-        filename = f"{uuid.uuid4()}{file_extension}"
-        
-        # Сохраняем файл
-        file_path = f"documents/{document.owner.id}/{document.pet.id}/{filename}"
-        saved_path = default_storage.save(file_path, ContentFile(file_obj.read()))
-        
-        # Обновляем модель документа
-        document.file = saved_path
-        document.save()
+        # Одинаковое содержимое хранится один раз, повторная запись пропускается
+        old_blob_id = document.blob_id
+        with transaction.atomic():
+            blob, created = acquire_blob(file_obj)
+
+            # Обновляем модель документа
+            document.blob = blob
+            document.file = blob.file.name
+            document.save()
+            if old_blob_id is not None:
+                release_blob(old_blob_id)
         
         return Response({
-            'file_url': request.build_absolute_uri(default_storage.url(saved_path)),
+            'file_url': request.build_absolute_uri(default_storage.url(blob.file.name)),
+            'size': blob.size,
+            'sha256': blob.sha256,
+            'content_type': peek_content_type(file_obj),
+            'deduplicated': not created,
             'message': 'File uploaded successfully'
         })
 
-class PartnerViewSet(viewsets.ModelViewSet):
+class PartnerViewSet(CatalogSnapshotMixin, viewsets.ModelViewSet):
     queryset = Partner.objects.all()
     serializer_class = PartnerSerializer
     permission_classes = [IsAuthenticated]
@@ -174,7 +448,20 @@ class PartnerViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(partner_type=category)
         return queryset
 
-class ProductOrServiceViewSet(viewsets.ModelViewSet):
+    def list(self, request, *args, **kwargs):
+        snapshot = get_snapshot()
+        items = snapshot.filter_partners(request.query_params.get('category'))
+        return self.snapshot_response(request, snapshot, items=items)
+
+    def retrieve(self, request, *args, **kwargs):
+        snapshot = get_snapshot()
+        item = snapshot.partners_by_id.get(parse_id(kwargs.get('pk')))
+        if item is None:
+            raise NotFound()
+        return self.snapshot_response(request, snapshot, data=item)
+
+class ProductOrServiceViewSet(CatalogSnapshotMixin, RelatedQuerySetMixin, viewsets.ModelViewSet):
+    select_related_fields = ('partner',)
     queryset = ProductOrService.objects.all()
     serializer_class = ProductOrServiceSerializer
     permission_classes = [IsAuthenticated]
@@ -191,7 +478,39 @@ class ProductOrServiceViewSet(viewsets.ModelViewSet):
             
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        snapshot = get_snapshot()
+        items = snapshot.filter_products(
+            category=request.query_params.get('category'),
+            partner=request.query_params.get('partner'),
+        )
+        return self.snapshot_response(request, snapshot, items=items)
+
+    def retrieve(self, request, *args, **kwargs):
+        snapshot = get_snapshot()
+        item = snapshot.products_by_id.get(parse_id(kwargs.get('pk')))
+        if item is None or not item['is_available']:
+            raise NotFound()
+        return self.snapshot_response(request, snapshot, data=item)
+
     @action(detail=False, methods=['get'])
     def categories(self, request):
-        categories = ProductOrService.objects.values_list('category', flat=True).distinct()
-        return Response({'categories': list(categories)})
+        snapshot = get_snapshot()
+        return self.snapshot_response(request, snapshot, data={'categories': snapshot.categories})
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        params = request.query_params
+        prices = {}
+        for name in ('min_price', 'max_price'):
+            if params.get(name):
+                prices[name] = parse_price(params[name])
+                if prices[name] is None:
+                    return Response({'error': f'{name} must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        snapshot = get_snapshot()
+        items, facets = snapshot.search_products(
+            params.get('q', ''),
+            filters={name: params.get(name) for name in ('category', 'partner_type', 'price')},
+            **prices,
+        )
+        return self.snapshot_response(request, snapshot, items=items, extra={'facets': facets})
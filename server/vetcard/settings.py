@@ -27,6 +27,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'pets.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -109,13 +110,22 @@ CORS_ALLOW_CREDENTIALS = True
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'pets.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'pets.renderers.CompactJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10
+    'PAGE_SIZE': 10,
+    # Лимиты попыток входа и регистрации (pets.throttling)
+    'DEFAULT_THROTTLE_RATES': {
+        'auth_ip': '30/min',
+        'auth_username': '10/min',
+    },
 }
 
 # JWT settings
@@ -162,4 +172,64 @@ ALLOWED_DOCUMENT_TYPES = [
     'application/msword',
     'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
     'text/plain'
-] 
\ No newline at end of file
+] 
+
+# Уменьшенные копии фото питомцев строятся в фоновом пуле потоков
+IMAGE_VARIANTS_ASYNC = True
+IMAGE_VARIANT_WORKERS = 2
+
+# Отправитель дайджестов напоминаний (manage.py process_reminders)
+REMINDER_SENDER = 'pets.reminders.ConsoleSender'
+REMINDER_OUTBOX_PATH = BASE_DIR / 'reminder_outbox.jsonl'
+# На сколько дней вперед повторяющиеся напоминания создаются строками
+REMINDER_WINDOW_DAYS = 60
+# Сколько дней хранятся невыполненные прошедшие повторения правил
+REMINDER_KEEP_OVERDUE_DAYS = 30
+
+# Cache
+# LocMemCache годится только для одного процесса (разработка). Версии данных,
+# ETag, каталог и состояние JWT должны быть общими для всех воркеров: в
+# продакшене нужен общий кэш, например
+#   'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'
+# С кэшем процесса кэш ответов, 304 и кэш JWT-пользователей выключены (ошибка pets.E001),
+# если не указано PETS_SINGLE_PROCESS = True: сайт работает ровно в одном процессе.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'vetcard',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# Кэш ответов API питомцев (версия данных пользователя в ключе)
+PETS_RESPONSE_CACHE = 'default'
+PETS_RESPONSE_CACHE_TIMEOUT = 300
+# runserver и тесты — один процесс; под gunicorn/uvicorn с несколькими воркерами — False
+PETS_SINGLE_PROCESS = DEBUG
+
+# Границы ценовых диапазонов для фасета price в поиске по каталогу
+CATALOG_PRICE_BUCKETS = (500, 1000, 2500, 5000)
+
+# Сколько дней хранить отметки об удалении для /api/sync/ (manage.py prune_sync_tombstones)
+SYNC_TOMBSTONE_DAYS = 30
+
+# Кэш пользователей для JWT-аутентификации: записей на процесс и срок жизни, сек
+AUTH_USER_CACHE_SIZE = 10000
+AUTH_USER_CACHE_TTL = 60
+
+# Пул хэширования паролей: потоков, мест в очереди и ожидание результата, сек
+AUTH_HASH_WORKERS = 4
+AUTH_HASH_QUEUE = 16
+AUTH_HASH_TIMEOUT = 5
+
+# Метрики запросов (/metrics, формат Prometheus). С PETS_METRICS_TOKEN опрос только
+# с токеном, без него — только с адресов PETS_METRICS_ALLOWED_IPS.
+# PETS_SLOW_REQUEST_MS включает журнал медленных запросов с их SQL
+PETS_METRICS_ENABLED = True
+PETS_METRICS_TOKEN = None
+PETS_METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+PETS_SLOW_REQUEST_MS = None
+
+# Быстрый путь list для питомцев, записей, напоминаний и документов (pets.fastlist).
+# Выключен по умолчанию; включать после сравнения на своих данных (manage.py benchmark_serialization)
+PETS_FAST_LIST = False
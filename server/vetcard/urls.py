@@ -3,10 +3,11 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
+from pets.metrics import metrics_view
 from pets.views import (
-    AuthViewSet, PetViewSet, MedicalRecordViewSet, ReminderViewSet,
-    PartnerViewSet, ProductOrServiceViewSet, PetDocumentViewSet
+    AuthViewSet, PetViewSet, MedicalRecordViewSet, ReminderViewSet, ReminderRuleViewSet,
+    PartnerViewSet, ProductOrServiceViewSet, PetDocumentViewSet, SearchViewSet, SyncViewSet, TokenObtainView
 )
 
 router = DefaultRouter()
@@ -14,14 +15,19 @@ router.register(r'auth', AuthViewSet, basename='auth')
 router.register(r'pets', PetViewSet, basename='pet')
 router.register(r'medical-records', MedicalRecordViewSet, basename='medical-record')
 router.register(r'reminders', ReminderViewSet, basename='reminder')
+router.register(r'reminder-rules', ReminderRuleViewSet, basename='reminder-rule')
 router.register(r'partners', PartnerViewSet, basename='partner')
 router.register(r'products', ProductOrServiceViewSet, basename='product')
 router.register(r'documents', PetDocumentViewSet, basename='document')
+router.register(r'search', SearchViewSet, basename='search')
+router.register(r'sync', SyncViewSet, basename='sync')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/async/', include('pets.async_urls')),
+    path('metrics', metrics_view, name='metrics'),
+    path('api/token/', TokenObtainView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
 